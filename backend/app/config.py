@@ -15,6 +15,237 @@ class Settings:
     # Application settings
     APP_NAME: str = "AI Writing Assistant"
 
+    # JSON file of styles and their prompts, models and limits ("" for the
+    # built-in styles), checked for changes every STYLE_RELOAD_INTERVAL
+    STYLE_CONFIG_PATH: str = os.getenv("STYLE_CONFIG_PATH", "")
+    STYLE_RELOAD_INTERVAL: float = float(
+        os.getenv("STYLE_RELOAD_INTERVAL", "5")
+    )
+
+    # Maximum number of styles generated concurrently for one request
+    MAX_STYLE_CONCURRENCY: int = int(os.getenv("MAX_STYLE_CONCURRENCY", "4"))
+
+    # Generate all styles of a request with a single upstream call
+    MULTI_STYLE_SINGLE_CALL: bool = (
+        os.getenv("MULTI_STYLE_SINGLE_CALL", "false").lower() == "true"
+    )
+
+    # How prompts are assembled: "structured" puts everything in one user
+    # message; "prefix" sends the static instructions first, as a system
+    # message identical across styles and inputs, so the provider can cache it
+    PROMPT_LAYOUT: str = os.getenv("PROMPT_LAYOUT", "structured")
+
+    # Cap each response at OUTPUT_TOKEN_EXPANSION output tokens per
+    # estimated input token plus OUTPUT_TOKEN_OVERHEAD, clamped between
+    # OUTPUT_TOKEN_MIN and OUTPUT_TOKEN_MAX (0 = no upper clamp). Styles can
+    # set their own expansion; an expansion of 0 disables the cap.
+    OUTPUT_TOKEN_EXPANSION: float = float(
+        os.getenv("OUTPUT_TOKEN_EXPANSION", "2.0")
+    )
+    OUTPUT_TOKEN_OVERHEAD: int = int(os.getenv("OUTPUT_TOKEN_OVERHEAD", "64"))
+    OUTPUT_TOKEN_MIN: int = int(os.getenv("OUTPUT_TOKEN_MIN", "128"))
+    OUTPUT_TOKEN_MAX: int = int(os.getenv("OUTPUT_TOKEN_MAX", "4096"))
+
+    # Seconds a request may take end to end, from POST /v1/rephrase. Clients
+    # may ask for a different deadline, up to REQUEST_DEADLINE_MAX.
+    REQUEST_DEADLINE: float = float(os.getenv("REQUEST_DEADLINE", "120"))
+    REQUEST_DEADLINE_MAX: float = float(os.getenv("REQUEST_DEADLINE_MAX", "300"))
+
+    # Abandon an upstream stream when its first text delta takes longer than
+    # UPSTREAM_FIRST_TOKEN_TIMEOUT seconds, or when it then goes quiet for
+    # UPSTREAM_IDLE_TIMEOUT seconds (0 = no limit)
+    UPSTREAM_FIRST_TOKEN_TIMEOUT: float = float(
+        os.getenv("UPSTREAM_FIRST_TOKEN_TIMEOUT", "30")
+    )
+    UPSTREAM_IDLE_TIMEOUT: float = float(
+        os.getenv("UPSTREAM_IDLE_TIMEOUT", "15")
+    )
+
+    # Upstream admission control (per process, optionally per host)
+    UPSTREAM_MAX_CONCURRENCY: int = int(
+        os.getenv("UPSTREAM_MAX_CONCURRENCY", "32")
+    )
+    UPSTREAM_MAX_QUEUE: int = int(os.getenv("UPSTREAM_MAX_QUEUE", "128"))
+    UPSTREAM_QUEUE_TIMEOUT: float = float(
+        os.getenv("UPSTREAM_QUEUE_TIMEOUT", "30")
+    )
+    # 0 disables the host-wide limit shared by all workers
+    UPSTREAM_HOST_MAX_CONCURRENCY: int = int(
+        os.getenv("UPSTREAM_HOST_MAX_CONCURRENCY", "0")
+    )
+    UPSTREAM_HOST_LOCK_DIR: str = os.getenv(
+        "UPSTREAM_HOST_LOCK_DIR", "/tmp/ai-writing-assistant/upstream-slots"
+    )
+
+    # Adaptive admission limit driven by upstream time-to-first-token
+    ADAPTIVE_CONCURRENCY: bool = (
+        os.getenv("ADAPTIVE_CONCURRENCY", "false").lower() == "true"
+    )
+    ADAPTIVE_MIN_LIMIT: int = int(os.getenv("ADAPTIVE_MIN_LIMIT", "4"))
+    ADAPTIVE_MAX_LIMIT: int = int(os.getenv("ADAPTIVE_MAX_LIMIT", "128"))
+    ADAPTIVE_LATENCY_TOLERANCE: float = float(
+        os.getenv("ADAPTIVE_LATENCY_TOLERANCE", "2.0")
+    )
+
+    # Hedge single-style upstream requests: when no token arrives within
+    # HEDGE_DELAY seconds (0 = the rolling p95 time-to-first-token), send a
+    # duplicate and stream whichever answers first. HEDGE_BUDGET caps the
+    # duplicates at a fraction of requests.
+    HEDGE_REQUESTS: bool = os.getenv("HEDGE_REQUESTS", "false").lower() == "true"
+    HEDGE_DELAY: float = float(os.getenv("HEDGE_DELAY", "0"))
+    HEDGE_BUDGET: float = float(os.getenv("HEDGE_BUDGET", "0.05"))
+
+    # uvicorn worker processes. uvicorn reads WEB_CONCURRENCY as the default
+    # for --workers, so set it instead of passing the flag
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    # Where pending requests live: "memory" (single worker), "sqlite"
+    # (shared by workers on a host) or "redis" (shared across hosts)
+    REQUEST_STORE: str = os.getenv("REQUEST_STORE", "memory")
+    REQUEST_STORE_PATH: str = os.getenv(
+        "REQUEST_STORE_PATH", "/tmp/ai-writing-assistant/requests.db"
+    )
+    REQUEST_STORE_URL: str = os.getenv(
+        "REQUEST_STORE_URL", "redis://localhost:6379/0"
+    )
+
+    # Pending requests: seconds a created request may wait for its stream,
+    # reaper interval, and hard cap before POST returns 503
+    REQUEST_TTL: float = float(os.getenv("REQUEST_TTL", "60"))
+    REQUEST_REAP_INTERVAL: float = float(
+        os.getenv("REQUEST_REAP_INTERVAL", "10")
+    )
+    MAX_PENDING_REQUESTS: int = int(
+        os.getenv("MAX_PENDING_REQUESTS", "10000")
+    )
+    # Seconds after creation when a "processing" request is presumed left
+    # behind by a worker that died mid-stream; a minute past any deadline
+    REQUEST_PROCESSING_TTL: float = float(
+        os.getenv("REQUEST_PROCESSING_TTL", str(REQUEST_DEADLINE_MAX + 60))
+    )
+
+    # Start generation at POST time instead of when the stream attaches;
+    # unattached generations are cancelled after EAGER_ATTACH_TIMEOUT
+    EAGER_GENERATION: bool = (
+        os.getenv("EAGER_GENERATION", "false").lower() == "true"
+    )
+    EAGER_ATTACH_TIMEOUT: float = float(os.getenv("EAGER_ATTACH_TIMEOUT", "5"))
+    # Events buffered before an unattached generation pauses
+    EAGER_BUFFER_EVENTS: int = int(os.getenv("EAGER_BUFFER_EVENTS", "1000"))
+
+    # Exact-match result cache (0 entries disables it). Hits are replayed in
+    # chunks of RESULT_CACHE_REPLAY_CHUNK characters (0 = one delta), with
+    # RESULT_CACHE_REPLAY_DELAY seconds between chunks
+    RESULT_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000")
+    )
+    RESULT_CACHE_TTL: float = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+    RESULT_CACHE_REPLAY_CHUNK: int = int(
+        os.getenv("RESULT_CACHE_REPLAY_CHUNK", "0")
+    )
+    RESULT_CACHE_REPLAY_DELAY: float = float(
+        os.getenv("RESULT_CACHE_REPLAY_DELAY", "0")
+    )
+
+    # Let identical (text, style, model) generations running at the same
+    # time share one upstream stream
+    COALESCE_INFLIGHT: bool = (
+        os.getenv("COALESCE_INFLIGHT", "true").lower() == "true"
+    )
+
+    # Rephrase multi-sentence text segment by segment, caching each segment,
+    # so resubmitting an edited text only regenerates the changed sentences
+    INCREMENTAL_REPHRASE: bool = (
+        os.getenv("INCREMENTAL_REPHRASE", "false").lower() == "true"
+    )
+    INCREMENTAL_SEGMENT_CONCURRENCY: int = int(
+        os.getenv("INCREMENTAL_SEGMENT_CONCURRENCY", "4")
+    )
+
+    # Text longer than LONG_DOCUMENT_CHARS (and always text past the 10,000
+    # character input cap) is split at paragraphs into chunks rephrased in
+    # parallel, LONG_DOCUMENT_CONCURRENCY at a time per style. Requests with
+    # more than LONG_DOCUMENT_MAX_CHARS characters are rejected
+    LONG_DOCUMENT_CHARS: int = int(os.getenv("LONG_DOCUMENT_CHARS", "4000"))
+    LONG_DOCUMENT_MAX_CHARS: int = int(
+        os.getenv("LONG_DOCUMENT_MAX_CHARS", "100000")
+    )
+    LONG_DOCUMENT_CHUNK_CHARS: int = int(
+        os.getenv("LONG_DOCUMENT_CHUNK_CHARS", "2000")
+    )
+    LONG_DOCUMENT_CONCURRENCY: int = int(
+        os.getenv("LONG_DOCUMENT_CONCURRENCY", "4")
+    )
+
+    # Persistent result store behind the cache: "memory" (none) or "sqlite"
+    # (a file shared by every worker on the host). RESULT_STORE_SNAPSHOT is
+    # imported at startup to pre-warm a fresh container.
+    RESULT_STORE: str = os.getenv("RESULT_STORE", "memory")
+    RESULT_STORE_PATH: str = os.getenv(
+        "RESULT_STORE_PATH", "/tmp/ai-writing-assistant/results.db"
+    )
+    RESULT_STORE_MAX_BYTES: int = int(
+        os.getenv("RESULT_STORE_MAX_BYTES", str(256 * 1024 * 1024))
+    )
+    RESULT_STORE_COMPACT_INTERVAL: float = float(
+        os.getenv("RESULT_STORE_COMPACT_INTERVAL", "3600")
+    )
+    RESULT_STORE_SNAPSHOT: str = os.getenv("RESULT_STORE_SNAPSHOT", "")
+
+    # Inputs longer than this are security-scanned in a pool instead of on
+    # the event loop; SECURITY_SCAN_EXECUTOR is "process" or "thread" (scans
+    # hold the GIL, so threads free little loop time), and
+    # SECURITY_SCAN_WORKERS=0 scans everything inline
+    SECURITY_SCAN_INLINE_CHARS: int = int(
+        os.getenv("SECURITY_SCAN_INLINE_CHARS", "2000")
+    )
+    SECURITY_SCAN_EXECUTOR: str = os.getenv(
+        "SECURITY_SCAN_EXECUTOR", "process"
+    )
+    SECURITY_SCAN_WORKERS: int = int(os.getenv("SECURITY_SCAN_WORKERS", "2"))
+
+    # Inputs whose security verdict is memoized (0 disables the memo)
+    SECURITY_VERDICT_CACHE_SIZE: int = int(
+        os.getenv("SECURITY_VERDICT_CACHE_SIZE", "1024")
+    )
+
+    # Seconds between polls for cancellations sent by other workers
+    CANCEL_POLL_INTERVAL: float = float(
+        os.getenv("CANCEL_POLL_INTERVAL", "0.02")
+    )
+
+    # File of extra words, one per line, whose scrambled-middle variants
+    # are flagged as prompt injection in addition to the built-in ones
+    PROMPT_INJECTION_KEYWORDS_FILE: str = os.getenv(
+        "PROMPT_INJECTION_KEYWORDS_FILE", ""
+    )
+
+    # Most styles one request may ask for; every tier's style_burst must
+    # allow at least this many
+    MAX_STYLES_PER_REQUEST: int = int(os.getenv("MAX_STYLES_PER_REQUEST", "8"))
+
+    # Per-client rate limits on POST /v1/rephrase
+    RATE_LIMIT_ENABLED: bool = (
+        os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    )
+    # JSON object of tier name -> limits; must include a "default" tier
+    RATE_LIMIT_TIERS: str = os.getenv(
+        "RATE_LIMIT_TIERS",
+        '{"default": {"requests_per_minute": 30, "request_burst": 10, '
+        '"styles_per_minute": 120, "style_burst": 40}}',
+    )
+    # Comma separated "api_key:tier" pairs for clients with their own tier
+    RATE_LIMIT_API_KEYS: str = os.getenv("RATE_LIMIT_API_KEYS", "")
+    RATE_LIMIT_API_KEY_HEADER: str = os.getenv(
+        "RATE_LIMIT_API_KEY_HEADER", "X-API-Key"
+    )
+    RATE_LIMIT_MAX_CLIENTS: int = int(
+        os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000")
+    )
+    RATE_LIMIT_IDLE_TTL: float = float(
+        os.getenv("RATE_LIMIT_IDLE_TTL", "600")
+    )
+
     # Frontend serving (for prod)
     # Set SERVE_FRONTEND=true to serve built frontend files from backend
     # In development, leave this false to use Vite dev server
@@ -27,6 +258,11 @@ class Settings:
         """Validate required settings."""
         if not self.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY environment variable is required")
+        if self.WEB_CONCURRENCY > 1 and self.REQUEST_STORE.lower() == "memory":
+            raise ValueError(
+                f"REQUEST_STORE=memory cannot be shared by {self.WEB_CONCURRENCY}"
+                " workers; set REQUEST_STORE to sqlite or redis"
+            )
 
 
 settings = Settings()
@@ -0,0 +1,136 @@
+"""Adaptive concurrency limit for upstream LLM streams.
+
+Implements an AIMD (additive increase, multiplicative decrease) limit driven
+by time-to-first-token. The limiter tracks a slowly drifting latency baseline;
+while samples stay within a tolerance of that baseline and the limit is
+actually being used, it grows by roughly one slot per limit's worth of
+samples. Latency spikes, provider 429s and timeouts shrink it multiplicatively.
+"""
+
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit tuned by observed upstream latency."""
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.9,
+        baseline_drift: float = 0.01,
+        history_size: int = 200,
+        on_change: Optional[Callable[[int], None]] = None,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_limit: Starting concurrency limit
+            min_limit: Lowest limit the limiter backs off to
+            max_limit: Highest limit the limiter grows to
+            latency_tolerance: Samples slower than baseline times this
+                factor count as congestion
+            backoff_ratio: Factor applied to the limit on congestion
+            baseline_drift: How fast the baseline follows slower samples
+            history_size: Number of samples kept for tuning
+            on_change: Called with the new integer limit when it changes
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.baseline_drift = baseline_drift
+        self.on_change = on_change
+
+        self._limit = float(
+            min(self.max_limit, max(self.min_limit, initial_limit))
+        )
+        self.baseline: Optional[float] = None
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        """Current integer concurrency limit."""
+        return int(self._limit)
+
+    def record_latency(self, latency: float, in_flight: int) -> None:
+        """
+        Record a time-to-first-token sample.
+
+        Args:
+            latency: Seconds from request start to first token
+            in_flight: Upstream streams in flight when the sample completed
+        """
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            # Let the baseline follow a genuinely slower provider over time
+            self.baseline += (latency - self.baseline) * self.baseline_drift
+
+        if latency > self.baseline * self.latency_tolerance:
+            self._decrease()
+            reason = "latency"
+        elif in_flight * 2 >= self.limit:
+            # Only grow when the current limit is actually being used
+            self._increase()
+            reason = "healthy"
+        else:
+            reason = "idle"
+        self._record(latency, reason)
+
+    def record_overload(self, reason: str = "overload") -> None:
+        """
+        Record an upstream 429 or timeout.
+
+        Args:
+            reason: Short label stored in the sample history
+        """
+        self._decrease()
+        self._record(None, reason)
+
+    def _increase(self) -> None:
+        """Grow the limit by about one slot per limit's worth of samples."""
+        self._set(min(self.max_limit, self._limit + 1 / self._limit))
+        self.increases += 1
+
+    def _decrease(self) -> None:
+        """Shrink the limit multiplicatively."""
+        self._set(max(self.min_limit, self._limit * self.backoff_ratio))
+        self.decreases += 1
+
+    def _set(self, value: float) -> None:
+        """Update the limit and notify when its integer value changes."""
+        previous = self.limit
+        self._limit = value
+        if self.limit != previous and self.on_change is not None:
+            self.on_change(self.limit)
+
+    def _record(self, latency: Optional[float], reason: str) -> None:
+        """Append a sample to the tuning history."""
+        self.history.append(
+            {
+                "time": time.time(),
+                "latency": latency,
+                "reason": reason,
+                "limit": self.limit,
+            }
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current limit, baseline and sample history."""
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "baseline_latency": self.baseline,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "samples": list(self.history),
+        }
@@ -0,0 +1,339 @@
+"""Admission control for upstream LLM streams.
+
+Bounds how many upstream streams a worker holds open at once. Callers beyond
+the limit wait in a bounded FIFO queue and are told their position as it
+changes; callers that cannot be queued, or wait too long, are rejected so the
+API can shed load instead of hammering the provider. An optional host-wide
+limit shares slots between all workers on the machine through lock files.
+"""
+
+import asyncio
+import fcntl
+import math
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+# How often a waiter retries the host-wide slot files
+HOST_SLOT_POLL_INTERVAL = 0.05
+
+
+class AdmissionRejected(Exception):
+    """Raised when the wait queue is full."""
+
+    def __init__(self, retry_after: int):
+        """Store the suggested Retry-After in seconds."""
+        super().__init__("Upstream capacity exhausted")
+        self.retry_after = retry_after
+
+
+class AdmissionTimeout(Exception):
+    """Raised when a queued caller is not admitted before the queue timeout."""
+
+    def __init__(self, retry_after: int):
+        """Store the suggested Retry-After in seconds."""
+        super().__init__("Timed out waiting for upstream capacity")
+        self.retry_after = retry_after
+
+
+class HostSlotPool:
+    """Host-wide slot pool shared between processes via ``flock`` files."""
+
+    def __init__(self, size: int, lock_dir: str):
+        """
+        Initialize the pool.
+
+        Args:
+            size: Number of slots shared by every process on the host
+            lock_dir: Directory holding one lock file per slot
+        """
+        self.size = size
+        self.lock_dir = lock_dir
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def try_acquire(self) -> Optional[int]:
+        """
+        Try to take a free slot without blocking.
+
+        Returns:
+            File descriptor holding the slot lock, or None if all are taken
+        """
+        for index in range(self.size):
+            path = os.path.join(self.lock_dir, f"slot-{index}.lock")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def release(self, fd: int) -> None:
+        """Release a slot taken with try_acquire."""
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class _Waiter:
+    """A queued caller waiting for a slot."""
+
+    def __init__(self):
+        self.admitted = False
+        self.changed = asyncio.Event()
+
+
+class AdmissionSlot:
+    """A granted slot; release it exactly once when the stream is closed."""
+
+    def __init__(
+        self,
+        controller: "AdmissionController",
+        host_fd: Optional[int] = None,
+    ):
+        self._controller = controller
+        self._host_fd = host_fd
+        self._acquired_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        """Return the slot to the controller."""
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(
+            time.monotonic() - self._acquired_at, self._host_fd
+        )
+
+
+class AdmissionController:
+    """Per-process limit on concurrent upstream streams with a wait queue."""
+
+    def __init__(
+        self,
+        limit: int,
+        max_queue: int,
+        queue_timeout: float,
+        host_pool: Optional[HostSlotPool] = None,
+    ):
+        """
+        Initialize the controller.
+
+        Args:
+            limit: Maximum concurrent upstream streams in this process
+            max_queue: Maximum callers waiting for a slot
+            queue_timeout: Seconds a caller may wait before giving up
+            host_pool: Optional host-wide slot pool checked after admission
+        """
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.host_pool = host_pool
+        self.in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+
+        # Metrics
+        self.admitted_total = 0
+        self.queued_total = 0
+        self.rejected_total = 0
+        self.timeouts_total = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        # Smoothed slot hold time, used to estimate Retry-After
+        self.hold_time_avg = 1.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of callers currently waiting."""
+        return len(self._waiters)
+
+    def is_saturated(self) -> bool:
+        """Return True when new callers would be rejected."""
+        return self.queue_depth >= self.max_queue and (
+            self.in_flight >= self.limit
+        )
+
+    def retry_after(self) -> int:
+        """Estimate in seconds when capacity is likely to free up."""
+        estimate = self.hold_time_avg * (self.queue_depth + 1) / self.limit
+        return min(60, max(1, math.ceil(estimate)))
+
+    def set_limit(self, limit: int) -> None:
+        """
+        Change the concurrency limit, admitting waiters if it grew.
+
+        Args:
+            limit: New maximum concurrent upstream streams
+        """
+        self.limit = max(1, limit)
+        self._admit_waiters()
+
+    async def acquire(
+        self,
+        on_position: Optional[PositionCallback] = None,
+        timeout: Optional[float] = None,
+    ) -> AdmissionSlot:
+        """
+        Wait for an upstream slot.
+
+        Args:
+            on_position: Awaited with the caller's 1-based queue position
+                whenever it changes while waiting
+            timeout: Seconds the caller may wait, if less than queue_timeout
+
+        Returns:
+            The granted slot
+
+        Raises:
+            AdmissionRejected: If the wait queue is full
+            AdmissionTimeout: If no slot frees up within queue_timeout
+        """
+        start = time.monotonic()
+        wait = self.queue_timeout
+        if timeout is not None:
+            wait = min(wait, timeout)
+        deadline = start + wait
+
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+        else:
+            await self._wait_in_queue(deadline, on_position)
+
+        try:
+            host_fd = await self._acquire_host_slot(deadline)
+        except BaseException:
+            self._release(None, None)
+            raise
+
+        waited = time.monotonic() - start
+        self.admitted_total += 1
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+        return AdmissionSlot(self, host_fd)
+
+    def try_acquire(self) -> Optional[AdmissionSlot]:
+        """
+        Take an upstream slot only if one is free right now.
+
+        Never queues, and never takes a slot ahead of waiting callers.
+
+        Returns:
+            The granted slot, or None if none is free in this process or
+            in the host pool
+        """
+        if self.in_flight >= self.limit or self._waiters:
+            return None
+        host_fd: Optional[int] = None
+        if self.host_pool is not None:
+            host_fd = self.host_pool.try_acquire()
+            if host_fd is None:
+                return None
+        self.in_flight += 1
+        self.admitted_total += 1
+        return AdmissionSlot(self, host_fd)
+
+    async def _wait_in_queue(
+        self, deadline: float, on_position: Optional[PositionCallback]
+    ) -> None:
+        """Queue the caller until a slot is handed to it."""
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_total += 1
+            raise AdmissionRejected(self.retry_after())
+
+        waiter = _Waiter()
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        last_position = 0
+        try:
+            while not waiter.admitted:
+                position = self._waiters.index(waiter) + 1
+                if on_position is not None and position != last_position:
+                    last_position = position
+                    await on_position(position)
+                    if waiter.admitted:
+                        break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                waiter.changed.clear()
+                await asyncio.wait_for(waiter.changed.wait(), remaining)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.timeouts_total += 1
+            raise AdmissionTimeout(self.retry_after())
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Remove a waiter that gave up, returning its slot if granted."""
+        if waiter.admitted:
+            self._release(None, None)
+            return
+        self._waiters.remove(waiter)
+        self._notify_waiters()
+
+    async def _acquire_host_slot(self, deadline: float) -> Optional[int]:
+        """Take a host-wide slot if a host pool is configured."""
+        if self.host_pool is None:
+            return None
+        while True:
+            fd = self.host_pool.try_acquire()
+            if fd is not None:
+                return fd
+            if time.monotonic() >= deadline:
+                self.timeouts_total += 1
+                raise AdmissionTimeout(self.retry_after())
+            await asyncio.sleep(HOST_SLOT_POLL_INTERVAL)
+
+    def _release(
+        self, hold_time: Optional[float], host_fd: Optional[int]
+    ) -> None:
+        """Return a slot and hand it to the next waiter."""
+        if host_fd is not None and self.host_pool is not None:
+            self.host_pool.release(host_fd)
+        if hold_time is not None:
+            self.hold_time_avg = 0.9 * self.hold_time_avg + 0.1 * hold_time
+        self.in_flight -= 1
+        self._admit_waiters()
+
+    def _admit_waiters(self) -> None:
+        """Grant free slots to waiters in FIFO order."""
+        admitted = False
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            waiter.admitted = True
+            waiter.changed.set()
+            self.in_flight += 1
+            admitted = True
+        if admitted:
+            self._notify_waiters()
+
+    def _notify_waiters(self) -> None:
+        """Wake waiters so they can report their new queue position."""
+        for waiter in self._waiters:
+            waiter.changed.set()
+
+    def stats(self) -> Dict[str, float]:
+        """Return a snapshot of admission metrics."""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "admitted_total": self.admitted_total,
+            "queued_total": self.queued_total,
+            "rejected_total": self.rejected_total,
+            "timeouts_total": self.timeouts_total,
+            "wait_time_avg": (
+                self.wait_time_total / self.admitted_total
+                if self.admitted_total
+                else 0.0
+            ),
+            "wait_time_max": self.wait_time_max,
+        }
@@ -0,0 +1,85 @@
+"""Per-request deadlines for upstream calls.
+
+A request's deadline is fixed when it is created and set in a context
+variable when its generation starts. Tasks inherit a copy of the context
+they are created from, so every style, segment and coalesced flight started
+for the request sees the deadline without it being passed down explicitly.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# time.time() by which the current request must finish, if any. Wall-clock
+# time, because the deadline is stored with requests shared across workers.
+request_deadline: ContextVar[Optional[float]] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+class UpstreamTimeout(Exception):
+    """Raised when an upstream stream is too slow and has been abandoned."""
+
+    def __init__(self, reason: str):
+        """
+        Store why the stream timed out.
+
+        Args:
+            reason: "first_token", "idle" or "deadline"
+        """
+        super().__init__(f"Upstream stream timed out ({reason})")
+        self.reason = reason
+
+
+def time_left(deadline: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds until a deadline.
+
+    Args:
+        deadline: ``time.time()`` deadline, or None for the current
+            request's deadline
+
+    Returns:
+        Seconds left (negative once passed), or None without a deadline
+    """
+    if deadline is None:
+        deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+async def within(
+    awaitable: Awaitable[T],
+    timeout: float,
+    reason: str,
+    deadline: Optional[float] = None,
+) -> T:
+    """
+    Await an upstream step, giving up after its timeout or at a deadline.
+
+    Args:
+        awaitable: The step, such as opening a stream or reading an event
+        timeout: Seconds the step may take (0 for no limit of its own)
+        reason: Reported if the step's own timeout runs out
+        deadline: ``time.time()`` deadline of the request, if any
+
+    Returns:
+        The step's result
+
+    Raises:
+        UpstreamTimeout: If the step did not finish in time
+    """
+    limit = timeout if timeout > 0 else None
+    left = time_left(deadline) if deadline is not None else None
+    if left is not None and (limit is None or left < limit):
+        limit, reason = max(0.0, left), "deadline"
+    if limit is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, limit)
+    except asyncio.TimeoutError:
+        raise UpstreamTimeout(reason) from None
@@ -0,0 +1,316 @@
+"""Hedged upstream requests.
+
+A small fraction of upstream calls are much slower to produce their first
+token than the rest, and they dominate tail latency. When a stream has not
+produced a token after the hedge delay, a duplicate request is sent; whichever
+produces a token first is streamed and the other is cancelled.
+
+The delay is either fixed or the rolling p95 time-to-first-token, so only the
+slowest few percent of calls are hedged. A budget caps hedges at a fraction of
+requests, so an upstream-wide slowdown cannot double the load on the provider:
+every request earns ``budget`` tokens (up to ``burst``) and a hedge spends one.
+"""
+
+import asyncio
+import math
+from collections import deque
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .metered_stream import MeteredStream
+
+# Minimum time-to-first-token samples before a p95 delay is trusted
+MIN_SAMPLES = 20
+
+# A duplicate stream and the callback releasing its admission slot
+Hedge = Tuple[MeteredStream, Callable[[], None]]
+
+
+class HedgePolicy:
+    """Decides when to hedge a request and whether the budget allows it."""
+
+    def __init__(
+        self,
+        delay: float = 0,
+        budget: float = 0.05,
+        burst: float = 10,
+        window: int = 200,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            delay: Seconds without a first token before hedging, or 0 to use
+                the rolling p95 time-to-first-token
+            budget: Extra requests allowed, as a fraction of requests
+            burst: Most hedges that can be saved up for a burst
+            window: Number of time-to-first-token samples kept
+        """
+        self.fixed_delay = delay
+        self.budget = budget
+        self.burst = burst
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.tokens = 0.0
+
+        # Metrics
+        self.requests_total = 0
+        self.hedges_total = 0
+        self.hedge_wins_total = 0
+        self.budget_denied_total = 0
+        self.capacity_denied_total = 0
+
+    def record_latency(self, latency: float) -> None:
+        """
+        Add a time-to-first-token sample.
+
+        Args:
+            latency: Seconds from sending a request to its first text delta
+        """
+        self.samples.append(latency)
+
+    def record_request(self) -> None:
+        """Count a request that may be hedged, earning budget."""
+        self.requests_total += 1
+        self.tokens = min(self.burst, self.tokens + self.budget)
+
+    def delay(self) -> Optional[float]:
+        """
+        Seconds to wait for a first token before hedging.
+
+        Returns:
+            The delay, or None until enough samples were seen for a p95
+        """
+        if self.fixed_delay > 0:
+            return self.fixed_delay
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[math.ceil(0.95 * len(ordered)) - 1]
+
+    def try_spend(self) -> bool:
+        """
+        Take budget for a hedge.
+
+        Returns:
+            True if the hedge may be sent
+        """
+        if self.tokens < 1:
+            self.budget_denied_total += 1
+            return False
+        self.tokens -= 1
+        self.hedges_total += 1
+        return True
+
+    def refund(self) -> None:
+        """Return the budget taken for a hedge that could not be sent."""
+        self.tokens = min(self.burst, self.tokens + 1)
+        self.hedges_total -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hedging metrics."""
+        return {
+            "delay": self.delay(),
+            "budget": self.budget,
+            "tokens": self.tokens,
+            "requests_total": self.requests_total,
+            "hedges_total": self.hedges_total,
+            "hedge_wins_total": self.hedge_wins_total,
+            "hedge_rate": (
+                self.hedges_total / self.requests_total
+                if self.requests_total
+                else 0.0
+            ),
+            "budget_denied_total": self.budget_denied_total,
+            "capacity_denied_total": self.capacity_denied_total,
+        }
+
+
+async def _until_first_token(
+    events: AsyncIterator[Any],
+) -> List[Any]:
+    """Read events up to and including the first text delta or the end."""
+    buffered: List[Any] = []
+    async for event in events:
+        buffered.append(event)
+        if event.type == "response.output_text.delta":
+            break
+    return buffered
+
+
+class HedgedStream:
+    """
+    Stream that races a duplicate request against a slow primary.
+
+    Behaves like MeteredStream. The race starts when iteration does: if the
+    primary has no first token after the policy's delay, open_hedge is
+    started for a duplicate, and the first of the two to produce a token is
+    streamed. The primary keeps racing while the duplicate is being sent.
+    The loser is closed and its admission slot released.
+    """
+
+    def __init__(
+        self,
+        primary: MeteredStream,
+        release_primary: Callable[[], None],
+        policy: HedgePolicy,
+        open_hedge: Callable[[], Awaitable[Optional[Hedge]]],
+    ):
+        """
+        Initialize the stream.
+
+        Args:
+            primary: The original upstream stream
+            release_primary: Releases the primary's admission slot
+            policy: Hedging policy, for the delay and metrics
+            open_hedge: Sends the duplicate request, returning None if it
+                cannot be sent
+        """
+        self.primary = primary
+        self.policy = policy
+        self.hedge: Optional[MeteredStream] = None
+        self.winner = primary
+        self._release_primary = release_primary
+        self._release_hedge: Callable[[], None] = lambda: None
+        self._open_hedge = open_hedge
+        self._opening: Optional[asyncio.Task] = None
+
+    @property
+    def stream(self) -> Any:
+        """The upstream stream being read."""
+        return self.winner.stream
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Any]:
+        """Race for the first token, then yield the winner's events."""
+        primary_events = self.primary.__aiter__()
+        contenders: Dict[asyncio.Task, Tuple[MeteredStream, Any]] = {
+            asyncio.create_task(_until_first_token(primary_events)): (
+                self.primary,
+                primary_events,
+            )
+        }
+        winner: Optional[asyncio.Task] = None
+        try:
+            delay = self.policy.delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(contenders, timeout=delay)
+                if not done:
+                    # Sending the duplicate can take as long as the primary's
+                    # first token, so it races too instead of holding it back
+                    self._opening = asyncio.create_task(self._open_hedge())
+            winner = await self._race(contenders)
+        finally:
+            await self._stop_opening(contenders)
+            for task, (stream, _) in contenders.items():
+                if task is not winner:
+                    await self._drop(task, stream)
+
+        self.winner, events = contenders[winner]
+        if self.winner is self.hedge:
+            self.policy.hedge_wins_total += 1
+        for event in winner.result():
+            yield event
+        async for event in events:
+            yield event
+
+    def _add_hedge(
+        self,
+        opening: asyncio.Task,
+        contenders: Dict[asyncio.Task, Tuple[MeteredStream, Any]],
+    ) -> Optional[asyncio.Task]:
+        """
+        Enter the duplicate request in the race once it has been sent.
+
+        Args:
+            opening: Finished task running open_hedge
+            contenders: First-token tasks with their streams and events
+
+        Returns:
+            The duplicate's first-token task, or None if it was not sent
+        """
+        if opening.cancelled():
+            return None
+        error = opening.exception()
+        if error is not None:
+            # A failed hedge must not fail the primary
+            print(f"Hedged request failed: {str(error)}")
+            return None
+        hedge = opening.result()
+        if hedge is None:
+            return None
+        self.hedge, self._release_hedge = hedge
+        hedge_events = self.hedge.__aiter__()
+        task = asyncio.create_task(_until_first_token(hedge_events))
+        contenders[task] = (self.hedge, hedge_events)
+        return task
+
+    async def _stop_opening(
+        self, contenders: Dict[asyncio.Task, Tuple[MeteredStream, Any]]
+    ) -> None:
+        """Cancel a duplicate still being sent, entering it if it was sent."""
+        opening, self._opening = self._opening, None
+        if opening is None:
+            return
+        if not opening.done():
+            opening.cancel()
+        await asyncio.gather(opening, return_exceptions=True)
+        # Entered so that it is dropped with the other losers
+        self._add_hedge(opening, contenders)
+
+    async def _race(
+        self, contenders: Dict[asyncio.Task, Tuple[MeteredStream, Any]]
+    ) -> asyncio.Task:
+        """Wait for the first contender to produce a token without failing."""
+        pending = set(contenders)
+        if self._opening is not None:
+            pending.add(self._opening)
+        failed: List[asyncio.Task] = []
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task is self._opening:
+                    self._opening = None
+                    hedge_task = self._add_hedge(task, contenders)
+                    if hedge_task is not None:
+                        pending.add(hedge_task)
+                elif task.exception() is None:
+                    return task
+                else:
+                    failed.append(task)
+        # Every contender failed; surface the primary's error if it has one
+        primary = next(iter(contenders))
+        raise (primary if primary in failed else failed[0]).exception()
+
+    async def _drop(self, task: asyncio.Task, stream: MeteredStream) -> None:
+        """Cancel a losing contender, closing its stream and freeing its slot."""
+        if not task.done():
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        try:
+            await stream.close()
+        except Exception as e:
+            print(f"Error closing hedged stream: {str(e)}")
+        if stream is self.primary:
+            self._release_primary()
+        else:
+            self._release_hedge()
+
+    async def close(self) -> None:
+        """Close both streams and release the duplicate's slot."""
+        await self.primary.close()
+        if self.hedge is not None:
+            await self.hedge.close()
+            self._release_hedge()
@@ -0,0 +1,114 @@
+"""Instrumented wrapper around upstream response streams."""
+
+import time
+from typing import Any, AsyncIterator, Callable, Optional
+
+from openai import AsyncStream
+from openai.types.responses.response_stream_event import ResponseStreamEvent
+
+from .deadline import within
+
+# Final events of a response, which carry its token usage
+_USAGE_EVENTS = ("response.completed", "response.incomplete")
+
+
+class MeteredStream:
+    """
+    Async stream wrapper that reports time-to-first-token, usage and errors.
+
+    Behaves like the wrapped ``openai.AsyncStream``: iterate it with
+    ``async for`` and release it with ``await close()``. Iteration raises
+    UpstreamTimeout if the first text delta takes longer than
+    first_token_timeout after the request was sent, if no event arrives
+    for idle_timeout after it, or once the deadline passes.
+    """
+
+    def __init__(
+        self,
+        stream: AsyncStream[ResponseStreamEvent],
+        started_at: float,
+        on_first_token: Optional[Callable[[float], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        on_usage: Optional[Callable[[Any], None]] = None,
+        first_token_timeout: float = 0,
+        idle_timeout: float = 0,
+        deadline: Optional[float] = None,
+    ):
+        """
+        Initialize the wrapper.
+
+        Args:
+            stream: Upstream stream to wrap
+            started_at: ``time.monotonic()`` when the request was sent
+            on_first_token: Called with seconds until the first text delta
+            on_error: Called with any exception raised while iterating
+            on_usage: Called with the response's token usage once it ends
+            first_token_timeout: Seconds allowed until the first text delta
+                (0 for no limit)
+            idle_timeout: Seconds allowed between events after the first
+                text delta (0 for no limit)
+            deadline: ``time.time()`` by which the stream must end, if any
+        """
+        self.stream = stream
+        self.started_at = started_at
+        self.first_token_latency: Optional[float] = None
+        self._on_first_token = on_first_token
+        self._on_error = on_error
+        self._on_usage = on_usage
+        self.first_token_timeout = first_token_timeout
+        self.idle_timeout = idle_timeout
+        self.deadline = deadline
+
+    def __aiter__(self) -> AsyncIterator[ResponseStreamEvent]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[ResponseStreamEvent]:
+        """Yield upstream events, recording the first text delta."""
+        iterator = self.stream.__aiter__()
+        try:
+            while True:
+                try:
+                    event = await self._next(iterator)
+                except StopAsyncIteration:
+                    return
+                if (
+                    self.first_token_latency is None
+                    and event.type == "response.output_text.delta"
+                ):
+                    self.first_token_latency = (
+                        time.monotonic() - self.started_at
+                    )
+                    if self._on_first_token is not None:
+                        self._on_first_token(self.first_token_latency)
+                elif event.type in _USAGE_EVENTS and self._on_usage is not None:
+                    response = getattr(event, "response", None)
+                    usage = getattr(response, "usage", None)
+                    if usage is not None:
+                        self._on_usage(usage)
+                yield event
+        except Exception as e:
+            if self._on_error is not None:
+                self._on_error(e)
+            raise
+
+    async def _next(
+        self, iterator: AsyncIterator[ResponseStreamEvent]
+    ) -> ResponseStreamEvent:
+        """Wait for the next event within the current timeout."""
+        if self.first_token_latency is None:
+            if self.first_token_timeout <= 0:
+                timeout = 0.0
+            else:
+                # Measured from the request, so it never becomes 0 (no limit)
+                elapsed = time.monotonic() - self.started_at
+                timeout = max(1e-3, self.first_token_timeout - elapsed)
+            return await within(
+                iterator.__anext__(), timeout, "first_token", self.deadline
+            )
+        return await within(
+            iterator.__anext__(), self.idle_timeout, "idle", self.deadline
+        )
+
+    async def close(self) -> None:
+        """Close the upstream stream and release its connection."""
+        await self.stream.close()
@@ -0,0 +1,147 @@
+"""Incremental parser for single-call multi-style completions.
+
+When all styles are generated by one upstream call, the model separates the
+styles with section markers. Each marker embeds a random per-request nonce, so
+neither the user's text nor a legitimate rephrasing can contain one by
+accident. Because streamed deltas can split a marker anywhere, the parser keeps
+a small buffer and only releases text once it can no longer be part of a
+marker.
+"""
+
+import secrets
+from typing import Iterable, List, Optional, Tuple
+
+MARKER_OPEN = "<<"
+MARKER_CLOSE = ">>"
+# Longest style name accepted inside a marker; bounds the held-back buffer
+MAX_STYLE_NAME_LENGTH = 64
+
+
+def new_marker_nonce() -> str:
+    """Generate a random nonce for section markers."""
+    return secrets.token_hex(8)
+
+
+def section_marker(nonce: str, style: str) -> str:
+    """
+    Build the section marker that introduces a style's output.
+
+    Args:
+        nonce: Per-request random nonce
+        style: Style name
+
+    Returns:
+        Marker string, e.g. ``<<3f9a...|professional>>``
+    """
+    return f"{MARKER_OPEN}{nonce}|{style}{MARKER_CLOSE}"
+
+
+class MultiStyleStreamParser:
+    """Demultiplex a streamed multi-style completion into per-style text."""
+
+    def __init__(self, nonce: str, styles: Iterable[str]):
+        """
+        Initialize the parser.
+
+        Args:
+            nonce: Nonce used in the section markers
+            styles: Styles that may appear in the output
+        """
+        self.styles = set(styles)
+        self.current_style: Optional[str] = None
+        self._prefix = f"{MARKER_OPEN}{nonce}|"
+        self._buffer = ""
+        # Whitespace directly after a marker is formatting, not output
+        self._at_section_start = False
+        # Trailing whitespace is held until we know the section continues
+        self._pending_whitespace = ""
+
+    def feed(self, delta: str) -> List[Tuple[str, str]]:
+        """
+        Feed a streamed delta into the parser.
+
+        Args:
+            delta: Raw text delta from the upstream stream
+
+        Returns:
+            List of (style, text) pieces that are safe to emit
+        """
+        self._buffer += delta
+        pieces: List[Tuple[str, str]] = []
+
+        while True:
+            start = self._buffer.find(self._prefix)
+            if start == -1:
+                # Hold back any suffix that could still become a marker
+                keep = self._partial_prefix_length(self._buffer)
+                self._emit(self._buffer[: len(self._buffer) - keep], pieces)
+                self._buffer = self._buffer[len(self._buffer) - keep :]
+                return pieces
+
+            end = self._buffer.find(
+                MARKER_CLOSE, start + len(self._prefix)
+            )
+            if end == -1:
+                name_length = len(self._buffer) - start - len(self._prefix)
+                if name_length <= MAX_STYLE_NAME_LENGTH:
+                    # Marker still arriving; emit only what precedes it
+                    self._emit(self._buffer[:start], pieces)
+                    self._buffer = self._buffer[start:]
+                    return pieces
+                # Too long to be a marker; treat the prefix as text
+                self._emit(self._buffer[: start + 1], pieces)
+                self._buffer = self._buffer[start + 1 :]
+                continue
+
+            self._emit(self._buffer[:start], pieces)
+            style = self._buffer[start + len(self._prefix) : end]
+            self._buffer = self._buffer[end + len(MARKER_CLOSE) :]
+            self._start_section(style)
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """
+        Flush any buffered text once the upstream stream has ended.
+
+        Returns:
+            Remaining (style, text) pieces
+        """
+        pieces: List[Tuple[str, str]] = []
+        self._emit(self._buffer, pieces)
+        self._buffer = ""
+        # Trailing whitespace at the end of the output is dropped
+        self._pending_whitespace = ""
+        return pieces
+
+    def _start_section(self, style: str) -> None:
+        """Switch output to a new section, ignoring unknown styles."""
+        self.current_style = style if style in self.styles else None
+        self._at_section_start = True
+        self._pending_whitespace = ""
+
+    def _emit(self, text: str, pieces: List[Tuple[str, str]]) -> None:
+        """Append text for the current section, trimming edge whitespace."""
+        if not text or self.current_style is None:
+            # Text before the first marker or in unknown sections is dropped
+            return
+        if self._at_section_start:
+            text = text.lstrip()
+            if not text:
+                return
+            self._at_section_start = False
+
+        stripped = text.rstrip()
+        if not stripped:
+            self._pending_whitespace += text
+            return
+
+        pieces.append(
+            (self.current_style, self._pending_whitespace + stripped)
+        )
+        self._pending_whitespace = text[len(stripped) :]
+
+    def _partial_prefix_length(self, text: str) -> int:
+        """Length of the longest suffix of text that is a marker prefix."""
+        for length in range(min(len(self._prefix) - 1, len(text)), 0, -1):
+            if self._prefix.startswith(text[-length:]):
+                return length
+        return 0
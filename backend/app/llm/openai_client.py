@@ -1,74 +1,201 @@
 """OpenAI client wrapper."""
 
-from openai import OpenAI
-from openai.types.responses.response_stream_event import ResponseStreamEvent
-from typing import Iterator, Dict
+import time
+
+from openai import APITimeoutError, AsyncOpenAI, RateLimitError
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from ..config import settings
 from ..security.secure_llm_pipeline import (
     SecureLLMPipeline,
+    create_cacheable_messages,
     create_structured_prompt,
     generate_system_prompt,
 )
+from .admission import (
+    AdmissionController,
+    AdmissionSlot,
+    AdmissionTimeout,
+    HostSlotPool,
+    PositionCallback,
+)
+from .adaptive_limiter import AdaptiveConcurrencyLimiter
+from .deadline import UpstreamTimeout, request_deadline, time_left, within
+from .hedging import Hedge, HedgedStream, HedgePolicy
+from .metered_stream import MeteredStream
+from .multi_style_parser import (
+    MultiStyleStreamParser,
+    new_marker_nonce,
+    section_marker,
+)
+from .style_registry import StyleConfig, style_registry
+from .token_budget import estimate_tokens, output_token_budget
+
+# Stream returned to callers, hedged or not
+UpstreamStream = Union[MeteredStream, HedgedStream]
+
+# Key used in active_streams for a single stream carrying several styles
+MULTI_STYLE_STREAM_KEY = "*"
+
+# Ways of assembling prompts (see PROMPT_LAYOUT)
+PROMPT_LAYOUTS = ("structured", "prefix")
+
+# Bump whenever prompt assembly changes, so cached results produced by the
+# old prompts are no longer served; style changes are covered by their
+# StyleConfig.version
+PROMPT_TEMPLATE_VERSION = "1"
+
+MULTI_STYLE_SYSTEM_PROMPT = generate_system_prompt(
+    "a writing assistant",
+    "to rewrite text in several styles while preserving the original meaning. "
+    "Produce one section per style, in the order listed. Start each section "
+    "with its marker exactly as given, on its own line, followed by the "
+    "rewritten text. Output nothing besides the markers and rewritten text",
+)
+
+# System prompt of the "prefix" layout. It is the same for every style and
+# input, so providers can serve it from their prompt cache.
+CACHEABLE_SYSTEM_PROMPT = generate_system_prompt(
+    "a writing assistant",
+    "to rewrite text as described in the TASK while preserving the original "
+    "meaning. You should only output what the TASK asks for, nothing else",
+)
+
+MULTI_STYLE_TASK = (
+    "Rewrite the text once for each of these sections, in the order listed. "
+    "Start each section with its marker exactly as given, on its own line, "
+    "followed by the rewritten text. Output nothing besides the markers and "
+    "rewritten text:"
+)
+
+
+def _user_message(content: str) -> List[Dict[str, str]]:
+    """Wrap a structured prompt as the only message."""
+    return [{"role": "user", "content": content}]
 
 
 class OpenAIClient:
     """Wrapper for OpenAI client."""
 
     def __init__(self):
-        """Initialize OpenAI client with API key from settings."""
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.active_streams: Dict[str, Iterator[ResponseStreamEvent]] = {}
+        """
+        Initialize OpenAI client with API key from settings.
+
+        Raises:
+            ValueError: If PROMPT_LAYOUT is not a known layout
+        """
+        if settings.PROMPT_LAYOUT not in PROMPT_LAYOUTS:
+            raise ValueError(f"Unknown prompt layout: {settings.PROMPT_LAYOUT}")
+        self.prompt_layout = settings.PROMPT_LAYOUT
+        # Async client so reading a stream never blocks the event loop
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        # Active streams keyed by request_id, then by style
+        self.active_streams: Dict[str, Dict[str, UpstreamStream]] = {}
         self.security_pipeline = SecureLLMPipeline()
 
-    def create_completion_stream(
+        # Admission control in front of every upstream stream
+        host_pool = (
+            HostSlotPool(
+                settings.UPSTREAM_HOST_MAX_CONCURRENCY,
+                settings.UPSTREAM_HOST_LOCK_DIR,
+            )
+            if settings.UPSTREAM_HOST_MAX_CONCURRENCY > 0
+            else None
+        )
+        self.admission = AdmissionController(
+            limit=settings.UPSTREAM_MAX_CONCURRENCY,
+            max_queue=settings.UPSTREAM_MAX_QUEUE,
+            queue_timeout=settings.UPSTREAM_QUEUE_TIMEOUT,
+            host_pool=host_pool,
+        )
+        # Admission slots held by active streams, keyed like active_streams
+        self.active_slots: Dict[str, Dict[str, AdmissionSlot]] = {}
+
+        # Optionally let observed upstream latency drive the admission limit
+        self.limiter: Optional[AdaptiveConcurrencyLimiter] = None
+        if settings.ADAPTIVE_CONCURRENCY:
+            self.limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=settings.UPSTREAM_MAX_CONCURRENCY,
+                min_limit=settings.ADAPTIVE_MIN_LIMIT,
+                max_limit=settings.ADAPTIVE_MAX_LIMIT,
+                latency_tolerance=settings.ADAPTIVE_LATENCY_TOLERANCE,
+                on_change=self.admission.set_limit,
+            )
+            self.admission.set_limit(self.limiter.limit)
+
+        # Optionally duplicate single-style requests slow to start streaming
+        self.hedging: Optional[HedgePolicy] = None
+        if settings.HEDGE_REQUESTS:
+            self.hedging = HedgePolicy(
+                delay=settings.HEDGE_DELAY, budget=settings.HEDGE_BUDGET
+            )
+
+        # Token usage reported by the provider, to track prompt cache hits
+        self.responses_total = 0
+        self.input_tokens_total = 0
+        self.cached_input_tokens_total = 0
+        self.output_tokens_total = 0
+
+        # Streams abandoned for being too slow, by (style, model, reason)
+        self.timeouts: Dict[Tuple[str, str, str], int] = {}
+
+    async def create_completion_stream(
         self,
         request_id: str,
         prompt: str,
-        style: str = "",
-        model: str = "gpt-4o-mini",
-    ) -> Iterator[ResponseStreamEvent]:
+        style: str,
+        model: Optional[str] = None,
+        on_queued: Optional[PositionCallback] = None,
+        context: str = "",
+    ) -> UpstreamStream:
         """
         Create a streaming completion using OpenAI API with security measures.
 
+        With HEDGE_REQUESTS, a duplicate request is sent if the first token
+        is slow to arrive, and the faster of the two is streamed.
+
         Args:
             request_id: Unique identifier for the request
             prompt: The prompt to send to the model
-            style: The style for rephrasing (if applicable)
-            model: The model to use for completion
+            style: The style for rephrasing, from the style registry
+            model: The model to use for completion, overriding the style's
+            on_queued: Awaited with the queue position while waiting for
+                upstream capacity
+            context: Text around the prompt, sent read-only so a part of a
+                larger text is rephrased consistently with it
 
         Returns:
-            Iterator yielding response objects from OpenAI API
+            Async iterator yielding response objects from OpenAI API
+
+        Raises:
+            UnknownStyleError: If the style is not registered
+            ValueError: If the input or its context is blocked by the security
+                pipeline
+            AdmissionRejected: If the upstream wait queue is full
+            AdmissionTimeout: If upstream capacity did not free up in time
         """
         try:
-            # Input validation through security pipeline
-            if self.security_pipeline.input_filter.detect_injection(prompt):
-                raise ValueError("Input blocked due to security concerns")
-
-            # Sanitize input
-            clean_input = self.security_pipeline.input_filter.sanitize_input(
-                prompt
-            )
-
-            # Create secure system prompt based on style
-            style_prompts = {
-                "professional": "Rewrite this text in a professional, formal tone suitable for business communications",
-                "casual": "Rewrite this text in a casual, friendly tone suitable for informal conversations",
-                "polite": "Rewrite this text in a polite, respectful tone suitable for courteous communications",
-                "social": "Rewrite this text in a lively, engaging tone suitable for social media",
-            }
-
-            task_prompt = style_prompts.get(style, "Rewrite this text")
-            system_prompt = generate_system_prompt(
-                "a writing assistant",
-                f"to {task_prompt} while preserving the original meaning. You should only output the rewritten text, nothing else.",
-            )
+            config = style_registry.get(style)
+            clean_input = await self._secure_input(prompt)
+            clean_context = await self._secure_input(context) if context else ""
 
-            # Create structured prompt with clear separation
-            user_instruction = f"{task_prompt}: {clean_input}"
-            structured_prompt = create_structured_prompt(
-                system_prompt, user_instruction
-            )
+            if self.prompt_layout == "prefix":
+                # Static instructions first, so the provider can cache them
+                messages = create_cacheable_messages(
+                    CACHEABLE_SYSTEM_PROMPT,
+                    config.prompt,
+                    clean_input,
+                    clean_context,
+                )
+            else:
+                # Create structured prompt with clear separation, around the
+                # style's precomputed system prompt
+                user_instruction = f"{config.prompt}: {clean_input}"
+                messages = _user_message(
+                    create_structured_prompt(
+                        config.system_prompt, user_instruction, clean_context
+                    )
+                )
 
             # Debug:
             # print("=" * 80)
@@ -79,53 +206,444 @@ class OpenAIClient:
             # print(f"Model: {model}")
             # print(f"Original input: {prompt}")
             # print(f"Clean input: {clean_input}")
-            # print(f"User instruction: {user_instruction}")
             # print("-" * 40)
-            # print("FULL STRUCTURED PROMPT:")
+            # print("FULL PROMPT:")
             # print("-" * 40)
-            # print(structured_prompt)
+            # print(messages)
             # print("=" * 80)
 
             # Create the stream with OpenAI API
-            response_stream = self.client.responses.create(
-                model=model,
-                input=[{"role": "user", "content": structured_prompt}],
-                stream=True,
+            return await self._open_stream(
+                request_id,
+                style,
+                messages,
+                model or config.model,
+                on_queued,
+                self._request_options([config], clean_input),
+                hedge=True,
             )
+        except Exception as e:
+            print(f"Error creating completion stream: {str(e)}")
+            raise
+
+    async def create_multi_style_stream(
+        self,
+        request_id: str,
+        prompt: str,
+        styles: List[str],
+        model: Optional[str] = None,
+        on_queued: Optional[PositionCallback] = None,
+    ) -> Tuple[UpstreamStream, MultiStyleStreamParser]:
+        """
+        Create one streaming completion that rewrites the text in every style.
 
-            # Store the stream for potential cancellation
-            self.active_streams[request_id] = response_stream
+        The security preamble is sent once instead of once per style. Each
+        style's output is introduced by a nonce-tagged section marker, and the
+        returned parser splits the streamed deltas back into styles. The
+        model and temperature are those of the first style, and the output
+        cap is the sum of the styles' caps.
 
-            return response_stream
+        Args:
+            request_id: Unique identifier for the request
+            prompt: The prompt to send to the model
+            styles: Styles to generate, in output order
+            model: The model to use for completion, overriding the styles'
+            on_queued: Awaited with the queue position while waiting for
+                upstream capacity
+
+        Returns:
+            Tuple of the upstream stream and a parser for its deltas
+
+        Raises:
+            UnknownStyleError: If a style is not registered
+        """
+        try:
+            configs = [style_registry.get(style) for style in styles]
+            clean_input = await self._secure_input(prompt)
+
+            # The nonce must not be guessable from, or present in, the input
+            nonce = new_marker_nonce()
+            while nonce in clean_input:
+                nonce = new_marker_nonce()
+
+            sections = "\n".join(
+                f"- {section_marker(nonce, config.name)} {config.prompt}"
+                for config in configs
+            )
+            if self.prompt_layout == "prefix":
+                messages = create_cacheable_messages(
+                    CACHEABLE_SYSTEM_PROMPT,
+                    f"{MULTI_STYLE_TASK}\n{sections}",
+                    clean_input,
+                )
+            else:
+                user_instruction = (
+                    f"Rewrite this text once for each of these sections:\n"
+                    f"{sections}\n\nText: {clean_input}"
+                )
+                messages = _user_message(
+                    create_structured_prompt(
+                        MULTI_STYLE_SYSTEM_PROMPT, user_instruction
+                    )
+                )
+
+            response_stream = await self._open_stream(
+                request_id,
+                MULTI_STYLE_STREAM_KEY,
+                messages,
+                model or configs[0].model,
+                on_queued,
+                self._request_options(configs, clean_input),
+                styles,
+            )
+            return response_stream, MultiStyleStreamParser(nonce, styles)
         except Exception as e:
-            print(f"Error creating completion stream: {str(e)}")
+            print(f"Error creating multi-style stream: {str(e)}")
             raise
 
-    def close_stream(self, request_id: str) -> bool:
+    async def _open_stream(
+        self,
+        request_id: str,
+        key: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        on_queued: Optional[PositionCallback],
+        options: Optional[Dict[str, Any]] = None,
+        styles: Optional[List[str]] = None,
+        hedge: bool = False,
+    ) -> UpstreamStream:
         """
-        Close an active stream.
+        Open an upstream stream once admission control grants a slot.
+
+        The slot is held until close_stream is called for the same key. The
+        wait for a slot, the request and the stream are all bounded by the
+        current request's deadline, and the stream by the first-token and
+        idle timeouts.
 
         Args:
             request_id: Unique identifier for the request
+            key: Style (or multi-style key) the stream is registered under
+            messages: Fully assembled prompt messages
+            model: The model to use for completion
+            on_queued: Awaited with the queue position while waiting
+            options: Extra request parameters, such as temperature
+            styles: Styles the stream generates, for timeout metrics
+                (defaults to key)
+            hedge: Race a duplicate request if the first token is slow,
+                when hedging is enabled
 
         Returns:
-            bool: True if stream was closed, False if not found
+            The upstream stream wrapped for latency metering
+
+        Raises:
+            UpstreamTimeout: If the deadline passed or no response started
+                within UPSTREAM_FIRST_TOKEN_TIMEOUT
         """
-        if request_id in self.active_streams:
-            try:
-                # Close the stream
-                self.active_streams[request_id].close()
-                print(f"Stream for request {request_id} closed")
-                # Remove from active streams
+        deadline = request_deadline.get()
+        labels = styles or [key]
+
+        def on_error(error: BaseException) -> None:
+            self._record_upstream_error(error)
+            if isinstance(error, UpstreamTimeout):
+                self._record_timeout(labels, model, error.reason)
+
+        left = time_left(deadline)
+        if left is not None and left <= 0:
+            on_error(UpstreamTimeout("deadline"))
+            raise UpstreamTimeout("deadline")
+        try:
+            slot = await self.admission.acquire(on_queued, timeout=left)
+        except AdmissionTimeout:
+            # Waiting was cut short by the deadline, not by queue_timeout
+            left = time_left(deadline)
+            if left is not None and left <= 0:
+                on_error(UpstreamTimeout("deadline"))
+                raise UpstreamTimeout("deadline") from None
+            raise
+        try:
+            stream: UpstreamStream = await self._start_upstream(
+                messages, model, options, deadline, on_error
+            )
+        except BaseException:
+            slot.release()
+            raise
+
+        if hedge and self.hedging is not None:
+            self.hedging.record_request()
+
+            async def open_hedge() -> Optional[Hedge]:
+                return await self._open_hedge(
+                    messages, model, options, deadline, on_error
+                )
+
+            stream = HedgedStream(stream, slot.release, self.hedging, open_hedge)
+
+        # Store the stream for potential cancellation
+        self.active_streams.setdefault(request_id, {})[key] = stream
+        self.active_slots.setdefault(request_id, {})[key] = slot
+        return stream
+
+    async def _start_upstream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        options: Optional[Dict[str, Any]],
+        deadline: Optional[float],
+        on_error: Callable[[BaseException], None],
+    ) -> MeteredStream:
+        """
+        Send the upstream request, once an admission slot is held.
+
+        Args:
+            messages: Fully assembled prompt messages
+            model: The model to use for completion
+            options: Extra request parameters, such as temperature
+            deadline: ``time.time()`` deadline of the request, if any
+            on_error: Called with any error from the request or stream
+
+        Returns:
+            The upstream stream wrapped for latency metering
+        """
+        started_at = time.monotonic()
+        try:
+            # Create the stream with OpenAI API
+            response_stream = await within(
+                self.client.responses.create(
+                    model=model,
+                    input=messages,
+                    stream=True,
+                    **(options or {}),
+                ),
+                settings.UPSTREAM_FIRST_TOKEN_TIMEOUT,
+                "first_token",
+                deadline,
+            )
+        except BaseException as e:
+            on_error(e)
+            raise
+
+        return MeteredStream(
+            response_stream,
+            started_at,
+            on_first_token=self._record_first_token,
+            on_error=on_error,
+            on_usage=self._record_usage,
+            first_token_timeout=settings.UPSTREAM_FIRST_TOKEN_TIMEOUT,
+            idle_timeout=settings.UPSTREAM_IDLE_TIMEOUT,
+            deadline=deadline,
+        )
+
+    async def _open_hedge(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        options: Optional[Dict[str, Any]],
+        deadline: Optional[float],
+        on_error: Callable[[BaseException], None],
+    ) -> Optional[Hedge]:
+        """
+        Send a duplicate request if there is spare capacity and budget.
+
+        Hedges never wait for admission: with no free slot, the upstream is
+        already busy and a duplicate would only add to its load.
+
+        Returns:
+            The duplicate stream and its slot release, or None if not sent
+        """
+        admission = self.admission
+        if admission.in_flight >= admission.limit or admission.queue_depth:
+            self.hedging.capacity_denied_total += 1
+            return None
+        if not self.hedging.try_spend():
+            return None
+        slot = admission.try_acquire()
+        if slot is None:
+            # The host pool is full
+            self.hedging.refund()
+            self.hedging.capacity_denied_total += 1
+            return None
+        try:
+            stream = await self._start_upstream(
+                messages, model, options, deadline, on_error
+            )
+        except BaseException:
+            slot.release()
+            raise
+        return stream, slot.release
+
+    def _request_options(
+        self, configs: List[StyleConfig], clean_input: str
+    ) -> Dict[str, Any]:
+        """
+        Build upstream request options, capping output from the input size.
+
+        Args:
+            configs: Styles generated by the request
+            clean_input: Sanitized input text
+
+        Returns:
+            Request options, with max_output_tokens summed over the styles
+        """
+        options = dict(configs[0].options)
+        input_tokens = estimate_tokens(clean_input)
+        caps = [self._output_cap(config, input_tokens) for config in configs]
+        if all(cap is not None for cap in caps):
+            options["max_output_tokens"] = sum(caps)
+        else:
+            options.pop("max_output_tokens", None)
+        return options
+
+    def _output_cap(self, config: StyleConfig, input_tokens: int) -> Optional[int]:
+        """
+        Output token cap of one style for an input.
+
+        Args:
+            config: Style to generate
+            input_tokens: Estimated tokens of the input
+
+        Returns:
+            The cap, or None if neither a budget nor the style sets one
+        """
+        expansion = config.expansion or settings.OUTPUT_TOKEN_EXPANSION
+        if expansion <= 0:
+            return config.max_output_tokens
+        budget = output_token_budget(
+            input_tokens,
+            expansion,
+            settings.OUTPUT_TOKEN_OVERHEAD,
+            settings.OUTPUT_TOKEN_MIN,
+            settings.OUTPUT_TOKEN_MAX,
+        )
+        if config.max_output_tokens is not None:
+            return min(budget, config.max_output_tokens)
+        return budget
+
+    def _record_first_token(self, latency: float) -> None:
+        """Feed a time-to-first-token sample to the limiter and hedging."""
+        if self.hedging is not None:
+            self.hedging.record_latency(latency)
+        if self.limiter is not None:
+            self.limiter.record_latency(latency, self.admission.in_flight)
+
+    def _record_usage(self, usage: Any) -> None:
+        """Count the input, cached input and output tokens of a response."""
+        self.responses_total += 1
+        self.input_tokens_total += getattr(usage, "input_tokens", 0) or 0
+        self.output_tokens_total += getattr(usage, "output_tokens", 0) or 0
+        details = getattr(usage, "input_tokens_details", None)
+        self.cached_input_tokens_total += (
+            getattr(details, "cached_tokens", 0) or 0
+        )
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """Return token usage and the share of input served from cache."""
+        return {
+            "layout": self.prompt_layout,
+            "responses_total": self.responses_total,
+            "input_tokens_total": self.input_tokens_total,
+            "cached_input_tokens_total": self.cached_input_tokens_total,
+            "output_tokens_total": self.output_tokens_total,
+            "cached_input_ratio": (
+                self.cached_input_tokens_total / self.input_tokens_total
+                if self.input_tokens_total
+                else 0.0
+            ),
+        }
+
+    def _record_timeout(self, styles: List[str], model: str, reason: str) -> None:
+        """Count a stream abandoned for being too slow, for each style."""
+        for style in styles:
+            key = (style, model, reason)
+            self.timeouts[key] = self.timeouts.get(key, 0) + 1
+
+    def timeout_stats(self) -> Dict[str, Any]:
+        """Return upstream timeout counts by style, model and reason."""
+        return {
+            "first_token_timeout": settings.UPSTREAM_FIRST_TOKEN_TIMEOUT,
+            "idle_timeout": settings.UPSTREAM_IDLE_TIMEOUT,
+            "total": sum(self.timeouts.values()),
+            "by_style": [
+                {"style": style, "model": model, "reason": reason, "count": count}
+                for (style, model, reason), count in sorted(self.timeouts.items())
+            ],
+        }
+
+    def _record_upstream_error(self, error: BaseException) -> None:
+        """Back the adaptive limiter off on provider 429s and timeouts."""
+        if self.limiter is None:
+            return
+        if isinstance(error, RateLimitError):
+            self.limiter.record_overload("rate_limited")
+        elif isinstance(error, APITimeoutError):
+            self.limiter.record_overload("timeout")
+
+    async def _secure_input(self, prompt: str) -> str:
+        """
+        Run input through the security pipeline.
+
+        Args:
+            prompt: Raw user input
+
+        Returns:
+            Sanitized input
+
+        Raises:
+            ValueError: If the input is blocked
+        """
+        # Large inputs are scanned off the event loop
+        return await self.security_pipeline.secure_input(prompt)
+
+    async def close_stream(
+        self, request_id: str, style: Optional[str] = None
+    ) -> bool:
+        """
+        Close active streams for a request.
+
+        Args:
+            request_id: Unique identifier for the request
+            style: Only close the stream for this style. Closes every
+                stream of the request when omitted.
+
+        Returns:
+            bool: True if all matching streams were closed, False if none
+            were found or closing failed
+        """
+        # Pop first so a concurrent close for the same stream is a no-op
+        streams = self.active_streams.get(request_id)
+        if not streams:
+            return False
+        if style is None:
+            to_close = self.active_streams.pop(request_id)
+        else:
+            if style not in streams:
+                return False
+            to_close = {style: streams.pop(style)}
+            if not streams:
                 del self.active_streams[request_id]
-                return True
+
+        # Give the admission slots back before awaiting the close
+        slots = self.active_slots.get(request_id, {})
+        for key in to_close:
+            slot = slots.pop(key, None)
+            if slot is not None:
+                slot.release()
+        if not slots:
+            self.active_slots.pop(request_id, None)
+
+        closed = True
+        for stream_style, stream in to_close.items():
+            try:
+                # Close the stream and release the HTTP connection
+                await stream.close()
+                print(
+                    f"Stream for request {request_id} ({stream_style}) closed"
+                )
             except Exception as e:
                 print(
                     f"Error closing stream for request {request_id}: {str(e)}"
                 )
-                del self.active_streams[request_id]
-                return False
-        return False
+                closed = False
+        return closed
 
 
 openai_client = OpenAIClient()
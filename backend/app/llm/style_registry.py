@@ -0,0 +1,304 @@
+"""Registry of rephrase styles and their upstream settings.
+
+Styles come from a JSON file (STYLE_CONFIG_PATH) or the built-in defaults.
+Each style's system prompt is built once when styles are loaded rather than
+on every request. The file is polled for changes, so styles can be edited
+without a restart; an invalid file is reported and the previous styles kept.
+
+The file maps style names to their settings, of which only "prompt" is
+required. "max_output_tokens" is a hard cap, and "expansion" overrides
+OUTPUT_TOKEN_EXPANSION when sizing the per-request cap from the input:
+
+    {
+        "professional": {
+            "prompt": "Rewrite this text in a professional, formal tone",
+            "model": "gpt-4o-mini",
+            "temperature": 0.3,
+            "max_output_tokens": 1024,
+            "expansion": 1.5
+        }
+    }
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..security.secure_llm_pipeline import generate_system_prompt
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+STYLE_PROMPTS = {
+    "professional": "Rewrite this text in a professional, formal tone suitable for business communications",
+    "casual": "Rewrite this text in a casual, friendly tone suitable for informal conversations",
+    "polite": "Rewrite this text in a polite, respectful tone suitable for courteous communications",
+    "social": "Rewrite this text in a lively, engaging tone suitable for social media",
+}
+
+_STYLE_FIELDS = {
+    "prompt",
+    "model",
+    "temperature",
+    "max_output_tokens",
+    "expansion",
+}
+
+
+class UnknownStyleError(ValueError):
+    """Raised when a style is not in the registry."""
+
+
+@dataclass(frozen=True)
+class StyleConfig:
+    """Everything needed to generate one style."""
+
+    name: str
+    prompt: str
+    system_prompt: str
+    model: str = DEFAULT_MODEL
+    temperature: Optional[float] = None
+    max_output_tokens: Optional[int] = None
+    # Output tokens allowed per input token, or None for the default
+    expansion: Optional[float] = None
+    # Changes whenever any of the above does
+    version: str = ""
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        """Extra upstream request parameters this style sets."""
+        options: Dict[str, Any] = {}
+        if self.temperature is not None:
+            options["temperature"] = self.temperature
+        if self.max_output_tokens is not None:
+            options["max_output_tokens"] = self.max_output_tokens
+        return options
+
+    @property
+    def upstream(self) -> Tuple[str, Optional[float], Optional[int]]:
+        """Settings that must match for styles to share one upstream call."""
+        return self.model, self.temperature, self.max_output_tokens
+
+
+def build_style(name: str, raw: Dict[str, Any]) -> StyleConfig:
+    """
+    Validate one style's settings and precompute its system prompt.
+
+    Args:
+        name: Style name
+        raw: Settings from the style file
+
+    Returns:
+        The style
+
+    Raises:
+        ValueError: If a setting is missing, unknown or out of range
+    """
+    if not isinstance(raw, dict):
+        raise ValueError(f"Style {name!r} must be an object")
+    unknown = set(raw) - _STYLE_FIELDS
+    if unknown:
+        raise ValueError(f"Style {name!r} has unknown settings: {sorted(unknown)}")
+    prompt = raw.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError(f"Style {name!r} needs a non-empty prompt")
+    model = raw.get("model", DEFAULT_MODEL)
+    if not isinstance(model, str) or not model:
+        raise ValueError(f"Style {name!r} has an invalid model")
+    temperature = raw.get("temperature")
+    if temperature is not None and (
+        isinstance(temperature, bool)
+        or not isinstance(temperature, (int, float))
+        or not 0 <= temperature <= 2
+    ):
+        raise ValueError(f"Style {name!r} temperature must be between 0 and 2")
+    max_output_tokens = raw.get("max_output_tokens")
+    if max_output_tokens is not None and (
+        isinstance(max_output_tokens, bool)
+        or not isinstance(max_output_tokens, int)
+        or max_output_tokens <= 0
+    ):
+        raise ValueError(
+            f"Style {name!r} max_output_tokens must be a positive integer"
+        )
+    expansion = raw.get("expansion")
+    if expansion is not None and (
+        isinstance(expansion, bool)
+        or not isinstance(expansion, (int, float))
+        or expansion <= 0
+    ):
+        raise ValueError(f"Style {name!r} expansion must be a positive number")
+
+    version = hashlib.sha256(
+        json.dumps(
+            [prompt, model, temperature, max_output_tokens, expansion],
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()[:16]
+    return StyleConfig(
+        name=name,
+        prompt=prompt,
+        system_prompt=generate_system_prompt(
+            "a writing assistant",
+            f"to {prompt} while preserving the original meaning. You should only output the rewritten text, nothing else.",
+        ),
+        model=model,
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        expansion=expansion,
+        version=version,
+    )
+
+
+def load_styles(raw: Dict[str, Any]) -> Dict[str, StyleConfig]:
+    """
+    Build every style of a style file.
+
+    Args:
+        raw: Parsed style file, mapping style names to settings
+
+    Returns:
+        Styles by name
+
+    Raises:
+        ValueError: If the file or any style is invalid
+    """
+    if not isinstance(raw, dict) or not raw:
+        raise ValueError("Style file must map style names to settings")
+    return {name: build_style(name, style) for name, style in raw.items()}
+
+
+class StyleRegistry:
+    """Styles available for rephrasing, reloaded when their file changes."""
+
+    def __init__(self, path: str = ""):
+        """
+        Load styles from a file, or the built-in defaults.
+
+        Args:
+            path: JSON style file, or "" for the built-in styles
+
+        Raises:
+            ValueError: If the file is invalid
+            OSError: If the file cannot be read
+        """
+        self.path = path
+        self._mtime: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        if path:
+            self._mtime = os.path.getmtime(path)
+            self._styles = self._read()
+        else:
+            self._styles = load_styles(
+                {name: {"prompt": prompt} for name, prompt in STYLE_PROMPTS.items()}
+            )
+
+        # Metrics
+        self.reloads_total = 0
+        self.reload_errors_total = 0
+
+    def _read(self) -> Dict[str, StyleConfig]:
+        """Load and validate the style file."""
+        with open(self.path, encoding="utf-8") as style_file:
+            return load_styles(json.load(style_file))
+
+    def __contains__(self, name: str) -> bool:
+        """Whether a style exists."""
+        return name in self._styles
+
+    def names(self) -> List[str]:
+        """Names of every style, in file order."""
+        return list(self._styles)
+
+    def find(self, name: str) -> Optional[StyleConfig]:
+        """
+        Look up a style.
+
+        Args:
+            name: Style name
+
+        Returns:
+            The style, or None if it does not exist
+        """
+        return self._styles.get(name)
+
+    def get(self, name: str) -> StyleConfig:
+        """
+        Look up a style that must exist.
+
+        Args:
+            name: Style name
+
+        Returns:
+            The style
+
+        Raises:
+            UnknownStyleError: If the style does not exist
+        """
+        style = self._styles.get(name)
+        if style is None:
+            raise UnknownStyleError(f"Unknown style: {name}")
+        return style
+
+    def reload(self) -> bool:
+        """
+        Reload the style file if it changed since it was last read.
+
+        An invalid file is reported and the current styles are kept.
+
+        Returns:
+            True if new styles were loaded
+        """
+        if not self.path:
+            return False
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return False
+            styles = self._read()
+        except (OSError, ValueError) as e:
+            self.reload_errors_total += 1
+            print(f"Style reload error, keeping current styles: {str(e)}")
+            return False
+        self._styles = styles
+        self._mtime = mtime
+        self.reloads_total += 1
+        print(f"Reloaded {len(styles)} styles from {self.path}")
+        return True
+
+    async def start(self, interval: float) -> None:
+        """
+        Start watching the style file for changes.
+
+        Args:
+            interval: Seconds between checks (0 disables reloading)
+        """
+        if self.path and interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        """Stop watching the style file."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, interval: float) -> None:
+        """Reload loop run by start()."""
+        while True:
+            await asyncio.sleep(interval)
+            self.reload()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return registry metrics."""
+        return {
+            "styles": self.names(),
+            "reloads_total": self.reloads_total,
+            "reload_errors_total": self.reload_errors_total,
+        }
+
+
+style_registry = StyleRegistry(settings.STYLE_CONFIG_PATH)
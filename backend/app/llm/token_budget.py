@@ -0,0 +1,74 @@
+"""Output token budgets derived from input length.
+
+Capping ``max_output_tokens`` per request keeps a runaway response from
+holding a stream open and running up cost. The cap is the input's estimated
+token count times the style's expansion factor, plus a fixed allowance.
+Tokens are estimated locally from word and punctuation counts, which is close
+enough for a cap and avoids loading a tokenizer on the request path.
+"""
+
+import math
+import re
+from typing import Any
+
+# Words and single punctuation marks, roughly one token each
+_PIECE = re.compile(r"\w+|[^\w\s]")
+# Average characters per token of English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text without a tokenizer.
+
+    Long words count as several tokens, so the estimate is the larger of the
+    word/punctuation count and the character count over CHARS_PER_TOKEN.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    pieces = sum(1 for _ in _PIECE.finditer(text))
+    return max(pieces, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def output_token_budget(
+    input_tokens: int,
+    expansion: float,
+    overhead: int,
+    minimum: int,
+    maximum: int,
+) -> int:
+    """
+    Compute the output cap for an input.
+
+    Args:
+        input_tokens: Estimated tokens of the input
+        expansion: Output tokens allowed per input token
+        overhead: Tokens allowed on top, for short inputs
+        minimum: Smallest cap returned
+        maximum: Largest cap returned (0 for no limit)
+
+    Returns:
+        The max_output_tokens to request
+    """
+    budget = max(minimum, math.ceil(input_tokens * expansion) + overhead)
+    return min(budget, maximum) if maximum > 0 else budget
+
+
+def is_truncated(event: Any) -> bool:
+    """
+    Whether a stream event reports that the output cap cut the response off.
+
+    Args:
+        event: Upstream stream event
+
+    Returns:
+        True for a ``response.incomplete`` event caused by max_output_tokens
+    """
+    if event.type != "response.incomplete":
+        return False
+    details = getattr(getattr(event, "response", None), "incomplete_details", None)
+    return getattr(details, "reason", None) == "max_output_tokens"
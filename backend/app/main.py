@@ -1,17 +1,51 @@
 """Main entry point for the AI Writing Assistant backend."""
 
+import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
 from .config import settings
-from .routes import rephrase
+from .llm.openai_client import openai_client
+from .llm.style_registry import style_registry
+from .routes import metrics, rephrase
+from .services.cancellation import cancellation_bus
+from .services.rephrase import request_reaper, result_cache
 
 settings.validate()
 
-app = FastAPI(title=settings.APP_NAME)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background tasks."""
+    # Watch for cancellations sent by other workers
+    await cancellation_bus.start()
+    # Expire requests whose stream was never opened
+    await request_reaper.start()
+    # Pick up edits to the style file without a restart
+    await style_registry.start(settings.STYLE_RELOAD_INTERVAL)
+    store = result_cache.store
+    if store is not None:
+        # Pre-warm from a snapshot shipped with the container
+        snapshot = settings.RESULT_STORE_SNAPSHOT
+        if snapshot and os.path.exists(snapshot):
+            imported = store.import_snapshot(snapshot)
+            print(f"Imported {imported} cached results from {snapshot}")
+        await store.start(settings.RESULT_STORE_COMPACT_INTERVAL)
+    yield
+    if store is not None:
+        await store.stop()
+    await style_registry.stop()
+    await request_reaper.stop()
+    await cancellation_bus.stop()
+    openai_client.security_pipeline.shutdown()
+
+
+app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
 app.include_router(rephrase.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
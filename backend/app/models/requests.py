@@ -1,6 +1,11 @@
 """Request and response models."""
 
-from pydantic import BaseModel, Field
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from ..config import settings
+from ..llm.style_registry import style_registry
 
 
 class RephraseRequest(BaseModel):
@@ -10,6 +15,51 @@ class RephraseRequest(BaseModel):
     styles: list[str] = Field(
         ..., description="List of styles to rephrase the text into"
     )
+    bypass_cache: bool = Field(
+        False, description="Always generate fresh results, skipping the cache"
+    )
+    deadline: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Seconds the request may take, up to REQUEST_DEADLINE_MAX",
+    )
+
+    @field_validator("text")
+    @classmethod
+    def text_within_limit(cls, text: str) -> str:
+        """Reject text longer than the server will split into chunks."""
+        if len(text) > settings.LONG_DOCUMENT_MAX_CHARS:
+            raise ValueError(
+                f"text must be at most {settings.LONG_DOCUMENT_MAX_CHARS} "
+                "characters"
+            )
+        return text
+
+    @field_validator("styles")
+    @classmethod
+    def styles_must_exist(cls, styles: list[str]) -> list[str]:
+        """Reject unknown styles and more styles than one request may ask for."""
+        if len(styles) > settings.MAX_STYLES_PER_REQUEST:
+            raise ValueError(
+                f"At most {settings.MAX_STYLES_PER_REQUEST} styles per request"
+            )
+        unknown = [style for style in styles if style not in style_registry]
+        if unknown:
+            raise ValueError(
+                f"Unknown styles: {', '.join(unknown)}. "
+                f"Available styles: {', '.join(style_registry.names())}"
+            )
+        return styles
+
+    @field_validator("deadline")
+    @classmethod
+    def deadline_within_limit(cls, deadline: Optional[float]) -> Optional[float]:
+        """Reject deadlines longer than the server allows."""
+        if deadline is not None and deadline > settings.REQUEST_DEADLINE_MAX:
+            raise ValueError(
+                f"deadline must be at most {settings.REQUEST_DEADLINE_MAX} seconds"
+            )
+        return deadline
 
 
 class RephraseResponse(BaseModel):
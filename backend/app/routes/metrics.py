@@ -0,0 +1,21 @@
+"""Operational metrics routes."""
+
+from fastapi import APIRouter
+
+from ..services.rate_limiter import rate_limiter
+from ..services.rephrase import rephrase_service
+
+router = APIRouter(prefix="/v1/metrics", tags=["metrics"])
+
+
+@router.get("")
+async def get_metrics():
+    """
+    Return a snapshot of operational metrics for this worker.
+
+    Returns:
+        Metrics grouped by component
+    """
+    metrics = rephrase_service.metrics()
+    metrics["rate_limit"] = rate_limiter.stats()
+    return metrics
@@ -3,24 +3,67 @@
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import StreamingResponse
 
+from ..config import settings
 from ..models.requests import RephraseRequest, RephraseResponse
-from ..services.rephrase import rephrase_service
+from ..services.rate_limiter import rate_limiter
+from ..services.rephrase import (
+    RequestCapacityExceeded,
+    ServiceOverloaded,
+    rephrase_service,
+)
 
 router = APIRouter(prefix="/v1/rephrase", tags=["rephrase"])
 
 
 @router.post("", response_model=RephraseResponse)
-async def create_rephrase(request: RephraseRequest) -> RephraseResponse:
+async def create_rephrase(
+    request: RephraseRequest, http_request: Request
+) -> RephraseResponse:
     """
     Create a new rephrase request and return request_id.
 
     Args:
         request: The rephrase request containing text and styles
+        http_request: FastAPI request object, used to identify the client
 
     Returns:
         Response with request_id
     """
-    request_id = rephrase_service.create_request(request.text, request.styles)
+    if settings.RATE_LIMIT_ENABLED:
+        client_key, tier = rate_limiter.identify(
+            http_request.headers.get(settings.RATE_LIMIT_API_KEY_HEADER),
+            http_request.client.host if http_request.client else None,
+        )
+        # Each chunk of a long document is a generation for every style
+        generations = len(request.styles) * rephrase_service.generations_per_style(
+            request.text
+        )
+        result = rate_limiter.check(client_key, tier, generations)
+        if not result.allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(result.retry_after)},
+            )
+
+    try:
+        request_id = await rephrase_service.create_request(
+            request.text,
+            request.styles,
+            bypass_cache=request.bypass_cache,
+            deadline=request.deadline,
+        )
+    except ServiceOverloaded as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Service is busy, please retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except RequestCapacityExceeded:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many pending requests, please retry later",
+        )
     return RephraseResponse(request_id=request_id)
 
 
@@ -59,7 +102,7 @@ async def cancel_rephrase(request_id: str):
     """
     from ..services.rephrase import cancel_request
 
-    if cancel_request(request_id):
+    if await cancel_request(request_id):
         return {"message": f"Request {request_id} canceled successfully"}
 
     raise HTTPException(
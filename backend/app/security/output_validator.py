@@ -8,6 +8,51 @@ Validates LLM outputs to detect potential security issues such as prompt leakage
 
 import re
 
+# Longest response filter_response passes through
+MAX_OUTPUT_CHARS = 5000
+
+# Most text a StreamValidator holds back while a match could still complete
+STREAM_WINDOW_CHARS = 256
+
+# One pattern element: an escape, a character class or a plain character,
+# with an optional quantifier
+_TOKEN = re.compile(r"(\\.|\[(?:\\.|[^\]])*\]|[^\\\[\](){}|?*+])([?*+]?)")
+
+
+def _prefix_pattern(pattern: str) -> str:
+    """
+    Build a pattern matching every prefix of text the given pattern matches.
+
+    Only sequences of single-character elements with ?, * or + are
+    supported, which covers the suspicious output patterns.
+
+    Args:
+        pattern: Regular expression to derive prefixes of
+
+    Returns:
+        Regular expression matching any prefix, including the empty string
+
+    Raises:
+        ValueError: If the pattern uses groups, alternation or counted
+            repetition
+    """
+    tokens = []
+    position = 0
+    while position < len(pattern):
+        match = _TOKEN.match(pattern, position)
+        if match is None:
+            raise ValueError(f"Unsupported pattern for streaming: {pattern}")
+        tokens.append(match.groups())
+        position = match.end()
+
+    prefix = ""
+    for atom, quantifier in reversed(tokens):
+        if quantifier in ("?", "*"):
+            prefix = f"{atom}{quantifier}{prefix}"
+        else:
+            prefix = f"(?:{atom}{quantifier}{prefix})?"
+    return prefix
+
 
 class OutputValidator:
     """Validator for LLM outputs to detect security issues."""
@@ -19,6 +64,17 @@ class OutputValidator:
             r"API[_\s]KEY[:=]\s*\w+",  # API key exposure
             r"instructions?[:]\s*\d+\.",  # Numbered instructions
         ]
+        self._patterns = [
+            re.compile(pattern, re.IGNORECASE)
+            for pattern in self.suspicious_patterns
+        ]
+        # Finds where the tail that could still grow into a match starts
+        self._partial = re.compile(
+            "(?:"
+            + "|".join(_prefix_pattern(p) for p in self.suspicious_patterns)
+            + r")\Z",
+            re.IGNORECASE,
+        )
 
     def validate_output(self, output: str) -> bool:
         """
@@ -30,10 +86,38 @@ class OutputValidator:
         Returns:
             True if valid, False if suspicious
         """
-        return not any(
-            re.search(pattern, output, re.IGNORECASE)
-            for pattern in self.suspicious_patterns
-        )
+        return not any(pattern.search(output) for pattern in self._patterns)
+
+    def partial_match_start(self, output: str) -> int:
+        """
+        Find where the shortest suffix that could still complete a match
+        starts.
+
+        Args:
+            output: Output received so far, or its unreleased tail
+
+        Returns:
+            Index of the first character that must be held back, or
+            len(output) if none must be
+        """
+        return self._partial.search(output).start()
+
+    def stream(
+        self,
+        max_length: int = MAX_OUTPUT_CHARS,
+        window: int = STREAM_WINDOW_CHARS,
+    ) -> "StreamValidator":
+        """
+        Start validating one streamed response.
+
+        Args:
+            max_length: Longest response allowed, as in filter_response
+            window: Most characters held back at once
+
+        Returns:
+            Validator to feed the response's deltas to
+        """
+        return StreamValidator(self, max_length, window)
 
     def filter_response(self, response: str) -> str:
         """
@@ -45,6 +129,71 @@ class OutputValidator:
         Returns:
             Filtered response
         """
-        if not self.validate_output(response) or len(response) > 5000:
+        if not self.validate_output(response) or len(response) > MAX_OUTPUT_CHARS:
             return "I cannot provide that information for security reasons."
         return response
+
+
+class StreamValidator:
+    """
+    Incremental validation of one streamed response.
+
+    Deltas are only released once no suspicious pattern can match text
+    including them, so a leak split across deltas is still caught. Only the
+    unreleased tail is scanned, which keeps the total work linear in the
+    response length.
+    """
+
+    def __init__(self, validator: OutputValidator, max_length: int, window: int):
+        """
+        Initialize an empty stream.
+
+        Args:
+            validator: Validator providing the patterns
+            max_length: Longest response allowed
+            window: Most characters held back at once; a match padded
+                beyond it is not detected
+        """
+        self.validator = validator
+        self.max_length = max_length
+        self.window = window
+        self.blocked = False
+        self.length = 0
+        self._pending = ""
+
+    def feed(self, delta: str) -> str:
+        """
+        Add a delta and release the text that can no longer be part of a
+        match.
+
+        Args:
+            delta: Next piece of the response
+
+        Returns:
+            Text safe to emit, possibly empty; always empty once blocked
+        """
+        if self.blocked:
+            return ""
+        self.length += len(delta)
+        pending = self._pending + delta
+        too_long = self.length > self.max_length
+        if too_long or not self.validator.validate_output(pending):
+            self.blocked = True
+            self._pending = ""
+            return ""
+        hold = max(
+            self.validator.partial_match_start(pending),
+            len(pending) - self.window,
+        )
+        released, self._pending = pending[:hold], pending[hold:]
+        return released
+
+    def finish(self) -> str:
+        """
+        Release the held-back text once the response has ended.
+
+        Returns:
+            Remaining text, or "" if the response was blocked
+        """
+        released, self._pending = self._pending, ""
+        return "" if self.blocked else released
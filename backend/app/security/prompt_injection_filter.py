@@ -6,14 +6,56 @@ https://cheatsheetseries.owasp.org/cheatsheets/LLM_Prompt_Injection_Prevention_C
 Implements detection patterns and validation strategies for preventing prompt injection attacks in LLM applications.
 """
 
+import hashlib
+import json
 import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ..config import settings
+
+# Words are matched against fuzzy patterns for typoglycemia defense
+_WORD = re.compile(r"\b\w+\b")
+_WHITESPACE = re.compile(r"\s+")
+_REPETITION = re.compile(r"(.)\1{3,}")
+
+# Non-ASCII letters re.IGNORECASE matches to ASCII ones that str.lower()
+# does not map to them; with these folded, a case-sensitive search of the
+# lowered text finds exactly what an IGNORECASE search would
+_CASE_FOLD = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s"})
+
+# Longest input passed upstream in one piece; sanitize_input truncates to it
+MAX_INPUT_CHARS = 10000
+
+
+def load_keywords(path: str) -> List[str]:
+    """
+    Read protected keywords, one per line, skipping blanks and # comments.
+
+    Args:
+        path: Keyword file path, or "" for none
+
+    Returns:
+        Keywords in file order
+    """
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as keyword_file:
+        lines = (line.strip() for line in keyword_file)
+        return [line for line in lines if line and not line.startswith("#")]
 
 
 class PromptInjectionFilter:
     """Filter for detecting and preventing prompt injection attacks."""
 
-    def __init__(self):
-        """Initialize the prompt injection filter with detection patterns."""
+    def __init__(self, extra_keywords: Optional[Iterable[str]] = None):
+        """
+        Initialize the prompt injection filter with detection patterns.
+
+        Args:
+            extra_keywords: Words guarded against typoglycemia variants in
+                addition to the defaults; read from
+                PROMPT_INJECTION_KEYWORDS_FILE when None
+        """
         self.dangerous_patterns = [
             r"ignore\s+(all\s+)?previous\s+instructions?",
             r"you\s+are\s+now\s+(in\s+)?developer\s+mode",
@@ -30,6 +72,25 @@ class PromptInjectionFilter:
             "delete",
             "system",
         ]
+        if extra_keywords is None:
+            extra_keywords = load_keywords(
+                settings.PROMPT_INJECTION_KEYWORDS_FILE
+            )
+        known = set(self.fuzzy_patterns)
+        for keyword in map(str.lower, extra_keywords):
+            if keyword not in known:
+                known.add(keyword)
+                self.fuzzy_patterns.append(keyword)
+
+        # Typoglycemia variants of a keyword share its signature, so each
+        # word is checked with one lookup however many keywords there are
+        self._fuzzy_index: Dict[Tuple[str, str, str], str] = {}
+        for pattern in self.fuzzy_patterns:
+            if len(pattern) >= 3:
+                self._fuzzy_index.setdefault(self._signature(pattern), pattern)
+        self._fuzzy_lengths: Set[int] = {
+            len(pattern) for pattern in self._fuzzy_index.values()
+        }
 
         # HTML/Markdown injection patterns
         self.html_injection_patterns = [
@@ -41,6 +102,37 @@ class PromptInjectionFilter:
             r"onclick=",
         ]
 
+        # Both pattern lists compiled into one alternation, so text is
+        # scanned once. The scanner runs on lowered text and has no capturing
+        # groups, since IGNORECASE or groups would disable the prefix search
+        # that makes the alternation fast; the rule that fired is found by
+        # matching each pattern at the match position afterwards
+        self._rules = [
+            (f"dangerous:{pattern}", re.compile(pattern))
+            for pattern in self.dangerous_patterns
+        ] + [
+            (f"html:{pattern}", re.compile(pattern))
+            for pattern in self.html_injection_patterns
+        ]
+        self._scanner = re.compile(
+            "|".join(f"(?:{compiled.pattern})" for _, compiled in self._rules)
+        )
+        self._dangerous = [
+            re.compile(pattern, re.IGNORECASE)
+            for pattern in self.dangerous_patterns
+        ]
+
+        # Identifies the pattern set, so verdicts can be cached across calls
+        self.version = hashlib.sha256(
+            json.dumps(
+                [
+                    self.dangerous_patterns,
+                    self.html_injection_patterns,
+                    self.fuzzy_patterns,
+                ]
+            ).encode()
+        ).hexdigest()[:16]
+
     def detect_injection(self, text: str) -> bool:
         """
         Detect potential prompt injection attacks in text.
@@ -51,37 +143,51 @@ class PromptInjectionFilter:
         Returns:
             True if injection detected, False otherwise
         """
-        if any(
-            re.search(pattern, text, re.IGNORECASE)
-            for pattern in self.dangerous_patterns
-        ):
-            return True
+        return self.find_injection(text) is not None
 
-        if any(
-            re.search(pattern, text, re.IGNORECASE)
-            for pattern in self.html_injection_patterns
-        ):
-            return True
+    def find_injection(self, text: str) -> Optional[str]:
+        """
+        Find the first detection rule that fires on text.
+
+        Args:
+            text: The input text to check
+
+        Returns:
+            The rule, as "dangerous:<pattern>", "html:<pattern>" or
+            "typoglycemia:<word>", or None if no injection was detected
+        """
+        rule = self._scan_patterns(text)
+        if rule is not None:
+            return rule
 
         # Fuzzy matching for misspelled words (typoglycemia defense)
-        words = re.findall(r"\b\w+\b", text.lower())
-        for word in words:
-            for pattern in self.fuzzy_patterns:
-                if self._is_similar_word(word, pattern):
-                    return True
-        return False
-
-    def _is_similar_word(self, word: str, target: str) -> bool:
-        """Check if word is a typoglycemia variant of target"""
-        if len(word) != len(target) or len(word) < 3:
-            return False
-        # Same first and last letter, scrambled middle
-        return (
-            word[0] == target[0]
-            and word[-1] == target[-1]
-            and sorted(word[1:-1]) == sorted(target[1:-1])
+        for word in _WORD.findall(text.lower()):
+            if len(word) in self._fuzzy_lengths:
+                pattern = self._fuzzy_index.get(self._signature(word))
+                if pattern is not None:
+                    return f"typoglycemia:{pattern}"
+        return None
+
+    def _scan_patterns(self, text: str) -> Optional[str]:
+        """Return the first dangerous or HTML rule matching text, if any."""
+        if text.isascii():
+            folded = text.lower()
+        else:
+            folded = text.translate(_CASE_FOLD).lower()
+        match = self._scanner.search(folded)
+        if match is None:
+            return None
+        return next(
+            rule
+            for rule, compiled in self._rules
+            if compiled.match(folded, match.start())
         )
 
+    @staticmethod
+    def _signature(word: str) -> Tuple[str, str, str]:
+        """Key shared by a word and all its typoglycemia variants."""
+        return word[0], word[-1], "".join(sorted(word[1:-1]))
+
     def sanitize_input(self, text: str) -> str:
         """
         Sanitize input text to remove potential injection attempts.
@@ -93,9 +199,9 @@ class PromptInjectionFilter:
             Sanitized text
         """
         # Normalize common obfuscations
-        text = re.sub(r"\s+", " ", text)  # Collapse whitespace
-        text = re.sub(r"(.)\1{3,}", r"\1", text)  # Remove char repetition
+        text = _WHITESPACE.sub(" ", text)  # Collapse whitespace
+        text = _REPETITION.sub(r"\1", text)  # Remove char repetition
 
-        for pattern in self.dangerous_patterns:
-            text = re.sub(pattern, "[FILTERED]", text, flags=re.IGNORECASE)
-        return text[:10000]  # Limit length
+        for pattern in self._dangerous:
+            text = pattern.sub("[FILTERED]", text)
+        return text[:MAX_INPUT_CHARS]  # Limit length
@@ -0,0 +1,305 @@
+"""Cancellation propagation between workers.
+
+``DELETE /v1/rephrase/{request_id}`` may reach a different worker than the one
+streaming the request. The worker that owns a stream registers a cancel
+handler for it; ``publish`` runs that handler directly when the owner is the
+current process, and otherwise leaves a cancellation signal in the shared
+backend. Each worker polls for signals addressed to the requests it owns, so
+the owner aborts within one poll interval.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from ..config import settings
+
+
+class CancellationBus:
+    """
+    In-process cancellation bus.
+
+    Subclasses add a shared backend by returning True from ``is_shared`` and
+    overriding ``_send``, ``_fetch`` and ``_ack``; in this base class they
+    are no-ops and only local handlers receive cancellations.
+    """
+
+    def __init__(self, poll_interval: float = 0.02):
+        """
+        Initialize the bus.
+
+        Args:
+            poll_interval: Seconds between polls for remote signals
+        """
+        self.poll_interval = poll_interval
+        self._handlers: Dict[str, Callable[[], Any]] = {}
+        self._watcher: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.published_total = 0
+        self.delivered_local_total = 0
+        self.delivered_remote_total = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def is_shared(self) -> bool:
+        """Whether signals can reach other processes."""
+        return False
+
+    def register(self, request_id: str, handler: Callable[[], Any]) -> None:
+        """
+        Register the cancel handler for a stream owned by this process.
+
+        Args:
+            request_id: Unique identifier for the request
+            handler: Called once when the request is cancelled
+        """
+        self._handlers[request_id] = handler
+
+    def unregister(self, request_id: str) -> None:
+        """Forget the handler once the stream has finished."""
+        self._handlers.pop(request_id, None)
+
+    async def publish(self, request_id: str) -> bool:
+        """
+        Cancel a request wherever its stream is running.
+
+        Args:
+            request_id: Unique identifier for the request
+
+        Returns:
+            bool: True if a local handler ran or a remote signal was sent
+        """
+        self.published_total += 1
+        handler = self._handlers.pop(request_id, None)
+        if handler is not None:
+            handler()
+            self.delivered_local_total += 1
+            self._record_latency(0.0)
+            return True
+        if not self.is_shared:
+            return False
+        await asyncio.to_thread(self._send, request_id, time.time())
+        return True
+
+    async def start(self) -> None:
+        """Start polling for remote signals (no-op for local-only buses)."""
+        if self.is_shared and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        """Stop polling for remote signals."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def poll_once(self) -> int:
+        """
+        Deliver pending remote signals for locally owned requests.
+
+        Returns:
+            Number of requests cancelled
+        """
+        if not self._handlers:
+            return 0
+        signals = await asyncio.to_thread(self._fetch, list(self._handlers))
+        delivered = 0
+        for request_id, requested_at in signals.items():
+            handler = self._handlers.pop(request_id, None)
+            if handler is None:
+                continue
+            handler()
+            delivered += 1
+            self.delivered_remote_total += 1
+            self._record_latency(max(0.0, time.time() - requested_at))
+        if signals:
+            await asyncio.to_thread(self._ack, list(signals))
+        return delivered
+
+    async def _watch(self) -> None:
+        """Poll loop run by start()."""
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"Cancellation poll error: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _record_latency(self, latency: float) -> None:
+        """Track time from publish to delivery."""
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def _send(self, request_id: str, requested_at: float) -> None:
+        """Store a signal in the shared backend (none for local-only buses)."""
+
+    def _fetch(self, request_ids: Iterable[str]) -> Dict[str, float]:
+        """Return publish times of pending signals for the given requests."""
+        return {}
+
+    def _ack(self, request_ids: Iterable[str]) -> None:
+        """Remove delivered signals from the shared backend."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cancellation metrics."""
+        delivered = self.delivered_local_total + self.delivered_remote_total
+        return {
+            "shared": self.is_shared,
+            "owned_streams": len(self._handlers),
+            "published_total": self.published_total,
+            "delivered_local_total": self.delivered_local_total,
+            "delivered_remote_total": self.delivered_remote_total,
+            "latency_avg": (
+                self.latency_total / delivered if delivered else 0.0
+            ),
+            "latency_max": self.latency_max,
+        }
+
+
+class SQLiteCancellationBus(CancellationBus):
+    """Cancellation signals in a table of the shared SQLite request store."""
+
+    # Signals nobody claims (owner crashed or already done) are purged
+    SIGNAL_TTL = 300.0
+
+    def __init__(self, path: str, poll_interval: float = 0.02):
+        """
+        Open the signal table.
+
+        Args:
+            path: SQLite database file shared by all workers
+            poll_interval: Seconds between polls for remote signals
+        """
+        super().__init__(poll_interval)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cancellations (
+                request_id TEXT PRIMARY KEY,
+                requested_at REAL NOT NULL
+            )
+            """
+        )
+
+    @property
+    def is_shared(self) -> bool:
+        return True
+
+    def _send(self, request_id: str, requested_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cancellations VALUES (?, ?)",
+                (request_id, requested_at),
+            )
+            self._conn.execute(
+                "DELETE FROM cancellations WHERE requested_at < ?",
+                (requested_at - self.SIGNAL_TTL,),
+            )
+
+    def _fetch(self, request_ids: Iterable[str]) -> Dict[str, float]:
+        request_ids = list(request_ids)
+        placeholders = ",".join("?" * len(request_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT request_id, requested_at FROM cancellations "
+                f"WHERE request_id IN ({placeholders})",
+                request_ids,
+            ).fetchall()
+        return dict(rows)
+
+    def _ack(self, request_ids: Iterable[str]) -> None:
+        request_ids = list(request_ids)
+        placeholders = ",".join("?" * len(request_ids))
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cancellations "
+                f"WHERE request_id IN ({placeholders})",
+                request_ids,
+            )
+
+
+class RedisCancellationBus(CancellationBus):
+    """Cancellation signals as expiring keys on a Redis-compatible server."""
+
+    def __init__(
+        self,
+        client: Any,
+        prefix: str = "rephrase:cancel:",
+        ttl: int = 300,
+        poll_interval: float = 0.02,
+    ):
+        """
+        Initialize the bus.
+
+        Args:
+            client: redis-py compatible client
+            prefix: Key prefix for signals
+            ttl: Seconds before an unclaimed signal expires
+            poll_interval: Seconds between polls for remote signals
+        """
+        super().__init__(poll_interval)
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    @property
+    def is_shared(self) -> bool:
+        return True
+
+    def _send(self, request_id: str, requested_at: float) -> None:
+        self.client.set(
+            f"{self.prefix}{request_id}", json.dumps(requested_at), ex=self.ttl
+        )
+
+    def _fetch(self, request_ids: Iterable[str]) -> Dict[str, float]:
+        request_ids = list(request_ids)
+        values = self.client.mget([f"{self.prefix}{r}" for r in request_ids])
+        return {
+            request_id: json.loads(value)
+            for request_id, value in zip(request_ids, values)
+            if value is not None
+        }
+
+    def _ack(self, request_ids: Iterable[str]) -> None:
+        for request_id in request_ids:
+            self.client.delete(f"{self.prefix}{request_id}")
+
+
+def create_cancellation_bus(backend: Optional[str] = None) -> CancellationBus:
+    """
+    Build the cancellation bus matching the request store backend.
+
+    Args:
+        backend: Overrides settings.REQUEST_STORE when given
+
+    Returns:
+        The configured CancellationBus
+    """
+    backend = (backend or settings.REQUEST_STORE).lower()
+    interval = settings.CANCEL_POLL_INTERVAL
+    if backend == "sqlite":
+        return SQLiteCancellationBus(settings.REQUEST_STORE_PATH, interval)
+    if backend == "redis":
+        import redis
+
+        return RedisCancellationBus(
+            redis.Redis.from_url(settings.REQUEST_STORE_URL),
+            poll_interval=interval,
+        )
+    return CancellationBus(interval)
+
+
+cancellation_bus = create_cancellation_bus()
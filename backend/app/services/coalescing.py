@@ -0,0 +1,145 @@
+"""Single-flight coalescing of identical in-flight generations.
+
+When several requests ask for the same (normalized text, style, model) at
+once, only the first one drives an upstream stream. The stream runs in a
+detached leader task that records every event it emits; each request
+subscribes to that record, replaying the events already emitted and then
+following live ones. The leader is cancelled, closing the upstream stream,
+only once its last subscriber has left.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from .event_buffer import EventBuffer
+
+
+class Flight:
+    """Events emitted by one shared generation."""
+
+    def __init__(self):
+        """Initialize an empty flight."""
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        # Replaced on every change so followers never miss a wake-up
+        self._changed = asyncio.Event()
+
+    async def put(self, event: Dict[str, Any]) -> None:
+        """Record an event and wake followers."""
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Mark the flight finished, optionally with the leader's error."""
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self, sink: EventBuffer) -> None:
+        """
+        Copy every event, past and future, into a subscriber's buffer.
+
+        Args:
+            sink: Buffer of the subscribing request
+
+        Raises:
+            Exception: Whatever aborted the leader, once events are drained
+        """
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.events):
+                await sink.put(self.events[index])
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+Generator = Callable[[Flight], Awaitable[None]]
+
+# Anything generation can emit events into
+EventSink = Union[EventBuffer, Flight]
+
+
+class SingleFlight:
+    """Registry of flights keyed by generation key."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._flights: Dict[str, Flight] = {}
+
+        # Metrics
+        self.led_total = 0
+        self.joined_total = 0
+        self.abandoned_total = 0
+
+    async def run(self, key: str, generate: Generator, sink: EventBuffer) -> None:
+        """
+        Stream a generation into sink, sharing it with identical requests.
+
+        Args:
+            key: Generation key; equal keys produce interchangeable output
+            generate: Starts the generation, emitting events into the flight;
+                only called when no flight for key is running
+            sink: Buffer of the calling request
+
+        Raises:
+            Exception: Whatever aborted the shared generation
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._lead(key, flight, generate))
+            self.led_total += 1
+        else:
+            self.joined_total += 1
+
+        flight.subscribers += 1
+        try:
+            await flight.follow(sink)
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more, so stop paying for tokens
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.abandoned_total += 1
+
+    async def _lead(self, key: str, flight: Flight, generate: Generator) -> None:
+        """Run a generation and publish its outcome to the flight."""
+        try:
+            await generate(flight)
+        except asyncio.CancelledError:
+            flight.finish()
+            raise
+        except Exception as e:
+            flight.finish(e)
+        else:
+            flight.finish()
+        finally:
+            self._forget(key, flight)
+
+    def _forget(self, key: str, flight: Flight) -> None:
+        """Stop routing new requests to a finished or abandoned flight."""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Return coalescing metrics."""
+        return {
+            "in_flight": len(self._flights),
+            "led_total": self.led_total,
+            "joined_total": self.joined_total,
+            "abandoned_total": self.abandoned_total,
+        }
@@ -0,0 +1,75 @@
+"""Bounded buffer of SSE events between a producer task and its reader.
+
+Generation can start before the client attaches to the stream, so events
+queue up here and are replayed in order once the reader arrives, after which
+it tails live events. When the buffer is full producers wait, which applies
+backpressure to the upstream stream instead of growing memory without bound.
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class EventBuffer:
+    """FIFO of event dicts with a single reader and a close marker."""
+
+    def __init__(self, max_events: int = 0):
+        """
+        Initialize an empty buffer.
+
+        Args:
+            max_events: Events held before producers wait (0 = unbounded)
+        """
+        self.max_events = max(0, max_events)
+        self.closed = False
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+
+    def __len__(self) -> int:
+        """Number of events waiting to be read."""
+        return len(self._events)
+
+    def full(self) -> bool:
+        """Return True when producers have to wait."""
+        return 0 < self.max_events <= len(self._events)
+
+    async def put(self, event: Dict[str, Any]) -> None:
+        """
+        Append an event, waiting while the buffer is full.
+
+        Events put after close() are dropped.
+
+        Args:
+            event: SSE event dict
+        """
+        while self.full() and not self.closed:
+            self._writable.clear()
+            await self._writable.wait()
+        if self.closed:
+            return
+        self._events.append(event)
+        self._readable.set()
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next event.
+
+        Returns:
+            The oldest buffered event, or None once closed and drained
+        """
+        while not self._events:
+            if self.closed:
+                return None
+            self._readable.clear()
+            await self._readable.wait()
+        event = self._events.popleft()
+        self._writable.set()
+        return event
+
+    def close(self) -> None:
+        """Mark the end of the stream and wake any waiting reader or writer."""
+        self.closed = True
+        self._readable.set()
+        self._writable.set()
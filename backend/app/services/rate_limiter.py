@@ -0,0 +1,285 @@
+"""Per-client token-bucket rate limiting.
+
+Each client gets two token buckets: one counting requests and one counting
+requested styles, since every style costs a separate upstream generation.
+Buckets live in an LRU-ordered map so every check is O(1), idle clients are
+evicted lazily and the number of tracked clients is capped.
+
+Buckets are kept per worker process. With several workers each one enforces
+its share of a tier (rates and bursts divided by the worker count), so a
+client spread across the workers gets about its tier in total. A worker's
+style bucket always holds at least one full request's styles, so no request
+is rejected forever.
+"""
+
+import json
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from ..config import settings
+
+DEFAULT_TIER = "default"
+
+
+@dataclass(frozen=True)
+class RateLimitTier:
+    """Limits applied to every client in a tier."""
+
+    requests_per_minute: float
+    request_burst: int
+    styles_per_minute: float
+    style_burst: int
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a rate limit check."""
+
+    allowed: bool
+    retry_after: int = 0
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at a fixed rate."""
+
+    def __init__(self, capacity: int, refill_per_second: float, now: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            capacity: Maximum tokens (burst size)
+            refill_per_second: Tokens added per second
+            now: Current ``time.monotonic()`` value
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = float(capacity)
+        self.updated_at = now
+
+    def refill(self, now: float) -> None:
+        """Add the tokens accrued since the last update."""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(
+                self.capacity, self.tokens + elapsed * self.refill_per_second
+            )
+            self.updated_at = now
+
+    def wait_time(self, cost: int) -> float:
+        """Seconds until cost tokens are available (0 if available now)."""
+        if self.tokens >= cost:
+            return 0.0
+        if cost > self.capacity or self.refill_per_second <= 0:
+            return math.inf
+        return (cost - self.tokens) / self.refill_per_second
+
+
+class RateLimiter:
+    """Token-bucket rate limiter keyed by client identity."""
+
+    def __init__(
+        self,
+        tiers: Dict[str, RateLimitTier],
+        api_key_tiers: Optional[Dict[str, str]] = None,
+        max_clients: int = 10000,
+        idle_ttl: float = 600.0,
+        workers: int = 1,
+        max_styles: int = 1,
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            tiers: Limits by tier name; must include ``default``
+            api_key_tiers: Tier name for each known API key
+            max_clients: Maximum clients tracked before LRU eviction
+            idle_ttl: Seconds after which an unused client is evicted
+            workers: Worker processes sharing each tier's limits
+            max_styles: Most styles one request may ask for; the least
+                capacity of each worker's style bucket
+        """
+        if DEFAULT_TIER not in tiers:
+            raise ValueError("Rate limit tiers must define a 'default' tier")
+        self.tiers = tiers
+        self.api_key_tiers = api_key_tiers or {}
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self.workers = max(1, workers)
+        self.max_styles = max(1, max_styles)
+        # client key -> (request bucket, style bucket), least recent first
+        self._buckets: "OrderedDict[str, Tuple[TokenBucket, TokenBucket]]" = (
+            OrderedDict()
+        )
+
+        # Metrics
+        self.allowed_total = 0
+        self.rejected_total = 0
+        self.evicted_total = 0
+
+    def identify(
+        self, api_key: Optional[str], client_host: Optional[str]
+    ) -> Tuple[str, str]:
+        """
+        Resolve the bucket key and tier for a client.
+
+        Known API keys get their own bucket and tier. Anything else is keyed
+        by IP in the default tier, so sending made-up keys cannot be used to
+        get fresh buckets.
+
+        Args:
+            api_key: Value of the API key header, if any
+            client_host: Client IP address, if known
+
+        Returns:
+            Tuple of (client key, tier name)
+        """
+        if api_key and api_key in self.api_key_tiers:
+            return f"key:{api_key}", self.api_key_tiers[api_key]
+        return f"ip:{client_host or 'unknown'}", DEFAULT_TIER
+
+    def check(
+        self, client_key: str, tier_name: str, style_count: int
+    ) -> RateLimitResult:
+        """
+        Consume one request and style_count styles if both are available.
+
+        Args:
+            client_key: Key from identify()
+            tier_name: Tier from identify()
+            style_count: Number of styles requested
+
+        Returns:
+            Whether the request is allowed, and Retry-After if not
+        """
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        tier = self.tiers.get(tier_name, self.tiers[DEFAULT_TIER])
+        buckets = self._buckets.get(client_key)
+        if buckets is None:
+            buckets = (
+                self._bucket(
+                    tier.request_burst, tier.requests_per_minute, now, 1
+                ),
+                self._bucket(
+                    tier.style_burst, tier.styles_per_minute, now, self.max_styles
+                ),
+            )
+            self._buckets[client_key] = buckets
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+                self.evicted_total += 1
+        else:
+            self._buckets.move_to_end(client_key)
+
+        request_bucket, style_bucket = buckets
+        request_bucket.refill(now)
+        style_bucket.refill(now)
+
+        # A request with more styles than the bucket holds empties it
+        style_cost = min(style_count, style_bucket.capacity)
+        wait = max(
+            request_bucket.wait_time(1), style_bucket.wait_time(style_cost)
+        )
+        if wait > 0:
+            self.rejected_total += 1
+            retry_after = 3600 if math.isinf(wait) else math.ceil(wait)
+            return RateLimitResult(allowed=False, retry_after=retry_after)
+
+        request_bucket.tokens -= 1
+        style_bucket.tokens -= style_cost
+        self.allowed_total += 1
+        return RateLimitResult(allowed=True)
+
+    def _bucket(
+        self, burst: int, per_minute: float, now: float, floor: int
+    ) -> TokenBucket:
+        """Build this worker's share of a tier limit, of at least floor tokens."""
+        return TokenBucket(
+            max(floor, math.ceil(burst / self.workers)),
+            per_minute / 60 / self.workers,
+            now,
+        )
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop clients unused for idle_ttl, oldest first."""
+        while self._buckets:
+            client_key, (request_bucket, _) = next(iter(self._buckets.items()))
+            if now - request_bucket.updated_at < self.idle_ttl:
+                break
+            del self._buckets[client_key]
+            self.evicted_total += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return rate limiter metrics."""
+        return {
+            "workers": self.workers,
+            "tracked_clients": len(self._buckets),
+            "allowed_total": self.allowed_total,
+            "rejected_total": self.rejected_total,
+            "evicted_total": self.evicted_total,
+        }
+
+
+def load_tiers(raw: str, max_styles: int = 1) -> Dict[str, RateLimitTier]:
+    """
+    Parse tier limits from JSON.
+
+    Args:
+        raw: JSON object mapping tier name to RateLimitTier fields
+        max_styles: Most styles one request may ask for
+
+    Returns:
+        Tiers by name
+
+    Raises:
+        ValueError: If a tier cannot admit a request with max_styles styles
+    """
+    tiers = {
+        name: RateLimitTier(**limits)
+        for name, limits in json.loads(raw).items()
+    }
+    for name, tier in tiers.items():
+        if tier.request_burst < 1 or tier.style_burst < max_styles:
+            raise ValueError(
+                f"Rate limit tier '{name}' must allow a burst of 1 request "
+                f"and {max_styles} styles (MAX_STYLES_PER_REQUEST)"
+            )
+        if tier.requests_per_minute <= 0 or tier.styles_per_minute <= 0:
+            raise ValueError(
+                f"Rate limit tier '{name}' must refill requests and styles"
+            )
+    return tiers
+
+
+def load_api_key_tiers(raw: str) -> Dict[str, str]:
+    """
+    Parse API key tier assignments.
+
+    Args:
+        raw: Comma separated ``key:tier`` pairs
+
+    Returns:
+        Tier name by API key
+    """
+    assignments = {}
+    for pair in raw.split(","):
+        if pair.strip():
+            key, _, tier = pair.strip().rpartition(":")
+            assignments[key] = tier
+    return assignments
+
+
+rate_limiter = RateLimiter(
+    tiers=load_tiers(
+        settings.RATE_LIMIT_TIERS, settings.MAX_STYLES_PER_REQUEST
+    ),
+    api_key_tiers=load_api_key_tiers(settings.RATE_LIMIT_API_KEYS),
+    max_clients=settings.RATE_LIMIT_MAX_CLIENTS,
+    idle_ttl=settings.RATE_LIMIT_IDLE_TTL,
+    workers=settings.WEB_CONCURRENCY,
+    max_styles=settings.MAX_STYLES_PER_REQUEST,
+)
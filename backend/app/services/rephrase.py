@@ -1,21 +1,96 @@
 """Rephrase service for handling text rephrasing requests."""
 
+import asyncio
+import time
 import uuid
 import json
-from typing import Dict, List, AsyncGenerator, TypedDict, Literal
+from typing import Any, Dict, List, AsyncGenerator, Optional, Set
 from fastapi import Request
 
-from ..llm.openai_client import openai_client
-from ..security.output_validator import OutputValidator
+from ..config import settings
+from ..llm.admission import (
+    AdmissionRejected,
+    AdmissionTimeout,
+    PositionCallback,
+)
+from ..llm.deadline import UpstreamTimeout, request_deadline
+from ..llm.openai_client import PROMPT_TEMPLATE_VERSION, openai_client
+from ..llm.style_registry import StyleConfig, UnknownStyleError, style_registry
+from ..llm.token_budget import is_truncated
+from ..security.output_validator import OutputValidator, StreamValidator
+from ..security.prompt_injection_filter import MAX_INPUT_CHARS
+from .cancellation import cancellation_bus
+from .coalescing import EventSink, SingleFlight
+from .event_buffer import EventBuffer
+from .request_store import (
+    ActiveRequest,
+    RequestReaper,
+    RequestStore,
+    create_request_store,
+)
+from .result_cache import ResultCache, make_cache_key
+from .result_store import create_result_store
+from .segmenter import Segment, segment_context, split_chunks, split_segments
 
-class ActiveRequest(TypedDict):
-    """Represents an active in-memory rephrase request."""
-    text: str
-    styles: list[str]
-    status: Literal["created", "processing", "completed", "error"]
+# Store active requests. Use a shared backend (REQUEST_STORE=sqlite/redis)
+# when running several workers so POST and GET can land on different ones.
+active_requests: RequestStore = create_request_store()
+
+# Expires requests that are created but never streamed, or whose stream's
+# worker died; started in lifespan
+request_reaper = RequestReaper(
+    active_requests,
+    settings.REQUEST_TTL,
+    settings.REQUEST_REAP_INTERVAL,
+    settings.REQUEST_PROCESSING_TTL,
+)
+
+# Producer tasks driving the upstream streams, keyed by request_id
+active_tasks: Dict[str, asyncio.Task] = {}
+
+# Buffers of generations started at POST time that no stream has attached to
+eager_buffers: Dict[str, EventBuffer] = {}
+
+# Identical generations running at the same time share one upstream stream
+coalescer = SingleFlight()
+
+# Finished results replayed for identical inputs, optionally backed by a
+# host-wide store (RESULT_STORE=sqlite) shared by every worker
+result_cache = ResultCache(
+    settings.RESULT_CACHE_MAX_ENTRIES,
+    settings.RESULT_CACHE_TTL,
+    store=create_result_store(),
+)
+
+SECURITY_ERROR_TEXT = (
+    "Content blocked due to security concerns. Please try rephrasing your input."
+)
+BUSY_ERROR_TEXT = "The service is busy right now. Please try again shortly."
+UNKNOWN_STYLE_ERROR_TEXT = "The {style} style is no longer available."
+
+
+class RequestCapacityExceeded(Exception):
+    """Raised when the pending request registry is full."""
+
+
+class ServiceOverloaded(Exception):
+    """Raised when new requests are shed because upstream capacity is full."""
+
+    def __init__(self, retry_after: int):
+        """Store the suggested Retry-After in seconds."""
+        super().__init__("Service overloaded")
+        self.retry_after = retry_after
+
+
+def _template_version(style: StyleConfig) -> str:
+    """Prompt version of a style, for result cache keys."""
+    return f"{PROMPT_TEMPLATE_VERSION}:{settings.PROMPT_LAYOUT}:{style.version}"
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Format an event dict as an SSE data frame."""
+    return f"data: {json.dumps(event)}\n\n"
 
-# Store active requests, maybe use something like Redis in prod
-active_requests: Dict[str, ActiveRequest] = {}
 
 class RephraseService:
     """Service for handling text rephrasing requests."""
@@ -24,34 +99,159 @@ class RephraseService:
         """Initialize the rephrase service with security components."""
         self.output_validator = OutputValidator()
 
-    def create_request(self, text: str, styles: List[str]) -> str:
+        # Eager generation metrics
+        self.eager_started_total = 0
+        self.eager_attached_total = 0
+        self.eager_expired_total = 0
+        self.events_replayed_total = 0
+        # Pending _expire_unattached tasks, referenced until they finish
+        self._expiry_tasks: Set[asyncio.Task] = set()
+
+        # Incremental rephrase metrics
+        self.segments_reused_total = 0
+        self.segments_generated_total = 0
+
+    async def create_request(
+        self,
+        text: str,
+        styles: List[str],
+        bypass_cache: bool = False,
+        deadline: Optional[float] = None,
+    ) -> str:
         """
         Create a new rephrase request.
 
+        With EAGER_GENERATION enabled, generation starts right away into a
+        buffer the stream endpoint attaches to, and is cancelled if no
+        stream attaches within EAGER_ATTACH_TIMEOUT seconds.
+
         Args:
             text: The text to rephrase
             styles: List of styles to rephrase the text into
+            bypass_cache: Generate fresh results even if cached ones exist
+            deadline: Seconds from now the request may take, instead of
+                REQUEST_DEADLINE
 
         Returns:
             request_id: Unique identifier for the request
+
+        Raises:
+            ServiceOverloaded: If the upstream wait queue is already full
+            RequestCapacityExceeded: If too many requests are pending
         """
+        admission = openai_client.admission
+        if admission.is_saturated():
+            raise ServiceOverloaded(admission.retry_after())
+        if await active_requests.acount() >= settings.MAX_PENDING_REQUESTS:
+            raise RequestCapacityExceeded()
+
         request_id = str(uuid.uuid4())
 
         # Store the request
-        active_requests[request_id] = {
+        created_at = time.time()
+        record: ActiveRequest = {
             "text": text,
             "styles": styles,
             "status": "created",
+            "created_at": created_at,
+            "bypass_cache": bypass_cache,
         }
+        seconds = deadline or settings.REQUEST_DEADLINE
+        if seconds > 0:
+            record["deadline"] = created_at + seconds
+        await active_requests.aput(request_id, record)
+
+        if settings.EAGER_GENERATION:
+            eager_buffers[request_id] = self._start_generation(
+                request_id,
+                text,
+                styles,
+                settings.EAGER_BUFFER_EVENTS,
+                bypass_cache,
+                record.get("deadline"),
+                eager=True,
+            )
+            self.eager_started_total += 1
+            expiry = asyncio.create_task(self._expire_unattached(request_id))
+            self._expiry_tasks.add(expiry)
+            expiry.add_done_callback(self._expiry_tasks.discard)
 
         return request_id
 
+    def _start_generation(
+        self,
+        request_id: str,
+        text: str,
+        styles: List[str],
+        max_events: int,
+        bypass_cache: bool = False,
+        deadline: Optional[float] = None,
+        eager: bool = False,
+    ) -> EventBuffer:
+        """
+        Start the producer task for a request.
+
+        Args:
+            request_id: Unique identifier for the request
+            text: The text to rephrase
+            styles: Styles to generate
+            max_events: Buffered events before generation pauses (0 = unbounded)
+            bypass_cache: Generate fresh results even if cached ones exist
+            deadline: ``time.time()`` by which upstream calls must finish
+            eager: Started before any stream claimed the request, so the
+                stored status is left alone
+
+        Returns:
+            Buffer receiving the request's SSE events
+        """
+        buffer = EventBuffer(max_events)
+        task = asyncio.create_task(
+            self._produce_events(
+                request_id,
+                text,
+                styles,
+                buffer,
+                bypass_cache,
+                deadline,
+                track_status=not eager,
+            )
+        )
+        active_tasks[request_id] = task
+        # Let a DELETE received by another worker stop this stream
+        cancellation_bus.register(request_id, task.cancel)
+        return buffer
+
+    async def _expire_unattached(self, request_id: str) -> None:
+        """
+        Cancel an eager generation that no stream attaches to in time.
+
+        The request itself is only deleted if no stream claimed it: with a
+        shared store, the stream may have been opened on another worker,
+        which is generating it there.
+        """
+        await asyncio.sleep(settings.EAGER_ATTACH_TIMEOUT)
+        if eager_buffers.pop(request_id, None) is None:
+            return
+        task = active_tasks.pop(request_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+        cancellation_bus.unregister(request_id)
+        self.eager_expired_total += 1
+        await active_requests.adiscard(request_id, status="created")
+        print(f"Eager generation {request_id} expired before attach")
+
     async def stream_rephrase(
         self, request: Request, request_id: str
     ) -> AsyncGenerator[str, None]:
         """
         Stream rephrase results.
 
+        Upstream streams are consumed by a separate producer task that feeds
+        an event buffer, so cancelling the task (DELETE or client disconnect)
+        aborts generation without touching the SSE response itself. Events
+        from different styles are interleaved in arrival order. If the
+        generation was started eagerly, buffered events are replayed first.
+
         Args:
             request: FastAPI request object
             request_id: Unique identifier for the request
@@ -59,122 +259,902 @@ class RephraseService:
         Yields:
             SSE formatted events
         """
-        if request_id not in active_requests:
-            yield f"data: {json.dumps({'type': 'error', 'message': 'Request not found'})}\n\n"
-            return
+        queue = eager_buffers.pop(request_id, None)
+        if queue is not None:
+            # Claim the request for this stream, unless a stream on another
+            # worker already did and is generating it there
+            if not await active_requests.aupdate_status(
+                request_id, "processing", expected="created"
+            ):
+                task = active_tasks.pop(request_id, None)
+                if task is not None:
+                    task.cancel()
+                cancellation_bus.unregister(request_id)
+                yield format_sse(
+                    {"type": "error", "message": "Request already streaming"}
+                )
+                return
+            self.eager_attached_total += 1
+            self.events_replayed_total += len(queue)
+        else:
+            req_data = await active_requests.aget(request_id)
+            if req_data is None:
+                yield format_sse(
+                    {"type": "error", "message": "Request not found"}
+                )
+                return
+            # Claim the request, so a worker that started generating it
+            # eagerly does not delete it when no stream attaches there, and
+            # a second stream for it does not generate it again
+            if not await active_requests.aupdate_status(
+                request_id, "processing", expected="created"
+            ):
+                yield format_sse(
+                    {"type": "error", "message": "Request already streaming"}
+                )
+                return
+            queue = self._start_generation(
+                request_id,
+                req_data["text"],
+                req_data["styles"],
+                0,
+                req_data.get("bypass_cache", False),
+                req_data.get("deadline"),
+            )
+        task = active_tasks.get(request_id)
+
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
 
-        req_data = active_requests[request_id]
-        text = req_data["text"]
-        styles = req_data["styles"]
+                # Check if client disconnected
+                if await request.is_disconnected():
+                    print(f"Client disconnected during {event.get('style')}")
+                    return
 
+                yield format_sse(event)
+        finally:
+            # Cancelling the producer closes the upstream stream
+            if task is not None:
+                if not task.done():
+                    task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            active_tasks.pop(request_id, None)
+            cancellation_bus.unregister(request_id)
+
+            # Clean up request
+            await active_requests.adiscard(request_id)
+
+    async def _produce_events(
+        self,
+        request_id: str,
+        text: str,
+        styles: List[str],
+        queue: EventBuffer,
+        bypass_cache: bool = False,
+        deadline: Optional[float] = None,
+        track_status: bool = True,
+    ) -> None:
+        """
+        Generate all styles concurrently and push SSE event dicts into a buffer.
+
+        Input the security pipeline blocks fails every style before anything
+        is generated. Styles with a cached result are replayed from the
+        cache. The rest each run in their own task, bounded by
+        MAX_STYLE_CONCURRENCY, so their events interleave in the buffer.
+        With MULTI_STYLE_SINGLE_CALL a single upstream call produces them
+        instead. The buffer is always closed last so the consumer can stop,
+        including when this task is cancelled.
+
+        Args:
+            request_id: Unique identifier for the request
+            text: The text to rephrase
+            styles: Styles to generate
+            queue: Buffer the SSE generator drains
+            bypass_cache: Generate fresh results even if cached ones exist
+            deadline: ``time.time()`` by which upstream calls must finish
+            track_status: Record the outcome in the request's status; off
+                until a stream has claimed the request
+        """
+        # Inherited by every task started below, down to the upstream calls
+        request_deadline.set(deadline)
+        tasks: List[asyncio.Task] = []
         try:
+            clean_input = await self._screen_input(text)
+            if clean_input is None:
+                # Long documents are generated chunk by chunk, so the whole
+                # text is checked first: an injection split across chunks
+                # would pass every chunk's own check
+                for style in styles:
+                    await queue.put(
+                        {
+                            "type": "error",
+                            "style": style,
+                            "text": SECURITY_ERROR_TEXT,
+                        }
+                    )
+                await queue.put({"type": "end"})
+                if track_status:
+                    await active_requests.aupdate_status(request_id, "completed")
+                return
+
+            cache_keys = self._cache_keys(text, clean_input, styles)
+            cached: Dict[str, str] = {}
+            if not bypass_cache:
+                for style, key in cache_keys.items():
+                    result = await result_cache.get(key)
+                    if result is not None:
+                        cached[style] = result
+            pending = [style for style in styles if style not in cached]
+
+            tasks.extend(
+                asyncio.create_task(self._replay_cached(style, result, queue))
+                for style, result in cached.items()
+            )
+            if (
+                settings.MULTI_STYLE_SINGLE_CALL
+                and len(pending) > 1
+                and not self._is_long_document(text)
+                and self._share_upstream(pending)
+            ):
+                tasks.append(
+                    asyncio.create_task(
+                        self._stream_styles_single_call(
+                            request_id, text, pending, queue, cache_keys
+                        )
+                    )
+                )
+            else:
+                semaphore = asyncio.Semaphore(
+                    max(1, settings.MAX_STYLE_CONCURRENCY)
+                )
+                tasks.extend(
+                    asyncio.create_task(
+                        self._stream_style(
+                            request_id,
+                            text,
+                            style,
+                            queue,
+                            semaphore,
+                            cache_keys.get(style),
+                        )
+                    )
+                    for style in pending
+                )
+
+            await asyncio.gather(*tasks)
+
+            # All styles complete
+            await queue.put({"type": "end"})
+
             # Update request status
-            active_requests[request_id]["status"] = "processing"
+            if track_status:
+                await active_requests.aupdate_status(request_id, "completed")
 
-            # Process each style. We will open new connection to OpenAI for each style. In future, we could do all styles in one prompt, but will likely be tricky. Might have to build some kind of buffer that we add the deltas to in order to find delimiters. Since we are streaming, each delta might not be legible on its own, so need buffers. Even then, the delimiters might not be reliable as they could be valid rephrased output text.   
-            for style in styles:
+        except asyncio.CancelledError:
+            print(f"Rephrase request {request_id} cancelled")
+            raise
+        except Exception as e:
+            print(f"Rephrase stream error: {str(e)}")
+            # To Do: Update frontend on global errors
+            await queue.put({"type": "error", "message": str(e)})
+
+            # Update request status
+            if track_status:
+                await active_requests.aupdate_status(request_id, "error")
+        finally:
+            # Stop sibling styles after a global error or cancellation
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            # Close any stream that is still active
+            await openai_client.close_stream(request_id)
+            queue.close()
+
+    async def _stream_style(
+        self,
+        request_id: str,
+        text: str,
+        style: str,
+        queue: EventBuffer,
+        semaphore: asyncio.Semaphore,
+        cache_key: Optional[str] = None,
+    ) -> None:
+        """
+        Stream a single style's upstream response onto the shared queue.
+
+        Long documents are split into chunks that are rephrased in parallel.
+        With INCREMENTAL_REPHRASE, text with several sentences is rephrased
+        segment by segment so that unchanged segments come from the cache.
+
+        Args:
+            request_id: Unique identifier for the request
+            text: The text to rephrase
+            style: Style to generate
+            queue: Buffer the SSE generator drains
+            semaphore: Per-request parallelism cap
+            cache_key: Key to store the finished result under, if cacheable
+        """
+        async with semaphore:
+            if self._is_long_document(text):
+                await self._stream_segments(
+                    request_id,
+                    style,
+                    self._chunks(text),
+                    queue,
+                    cache_key,
+                    settings.LONG_DOCUMENT_CONCURRENCY,
+                )
+                return
+            if settings.INCREMENTAL_REPHRASE and cache_key is not None:
+                segments = split_segments(text)
+                if sum(1 for segment, _ in segments if segment.strip()) > 1:
+                    await self._stream_segments(
+                        request_id,
+                        style,
+                        segments,
+                        queue,
+                        cache_key,
+                        settings.INCREMENTAL_SEGMENT_CONCURRENCY,
+                        neighbours=True,
+                    )
+                    return
+            await self._run_generation(request_id, text, style, queue, cache_key)
+
+    def _is_long_document(self, text: str) -> bool:
+        """
+        Whether text is rephrased in parallel chunks.
+
+        Text longer than the upstream input cap always is, so it is never
+        silently truncated.
+
+        Args:
+            text: The text to rephrase
+
+        Returns:
+            True if text exceeds LONG_DOCUMENT_CHARS (or MAX_INPUT_CHARS)
+        """
+        threshold = settings.LONG_DOCUMENT_CHARS or MAX_INPUT_CHARS
+        return len(text) > min(threshold, MAX_INPUT_CHARS)
+
+    def _chunks(self, text: str) -> List[Segment]:
+        """Split a long document into the chunks generated in parallel."""
+        chunk_chars = min(settings.LONG_DOCUMENT_CHUNK_CHARS, MAX_INPUT_CHARS)
+        return split_chunks(text, chunk_chars)
+
+    def generations_per_style(self, text: str) -> int:
+        """
+        Count the upstream generations one style of text costs.
+
+        Args:
+            text: The text to rephrase
+
+        Returns:
+            Number of chunks for a long document, otherwise 1
+        """
+        if not self._is_long_document(text):
+            return 1
+        return sum(1 for chunk, _ in self._chunks(text) if chunk.strip()) or 1
+
+    async def _run_generation(
+        self,
+        request_id: str,
+        text: str,
+        style: str,
+        queue: EventSink,
+        cache_key: Optional[str] = None,
+        context: str = "",
+    ) -> None:
+        """
+        Generate one style of a text, joining an identical running generation.
+
+        With COALESCE_INFLIGHT, a generation whose key matches one that is
+        already running follows it instead of opening another upstream
+        stream.
+
+        Args:
+            request_id: Identifier the upstream stream is registered under
+            text: The text to rephrase
+            style: Style to generate
+            queue: Buffer or flight receiving the events
+            cache_key: Key to store the finished result under, if cacheable
+            context: Surrounding text sent read-only along with text
+        """
+        if cache_key is None or not settings.COALESCE_INFLIGHT:
+            await self._generate_style(
+                request_id, text, style, queue, cache_key, context
+            )
+            return
+
+        async def generate(flight: EventSink) -> None:
+            # Owned by no single request, so cancelling one never closes a
+            # stream other requests still follow
+            await self._generate_style(
+                f"flight:{cache_key}", text, style, flight, cache_key, context
+            )
+
+        await coalescer.run(cache_key, generate, queue)
+
+    async def _stream_segments(
+        self,
+        request_id: str,
+        style: str,
+        segments: List[Segment],
+        queue: EventBuffer,
+        cache_key: Optional[str],
+        concurrency: int,
+        neighbours: bool = False,
+    ) -> None:
+        """
+        Rephrase a text segment by segment and stream the stitched result.
+
+        Each segment's result is cached by its own text and the style, so
+        after an edit only the changed segments go upstream. With neighbours,
+        each segment is sent with the sentences around it as read-only
+        context, which keeps pronouns and connectives coherent; the context
+        is part of the segment's cache key, so an edit also regenerates the
+        segments right before and after it. Segments are generated
+        concurrently, up to concurrency at a time, and streamed in order with
+        their original separators; segments that finish early wait in their
+        buffers until every segment before them has been streamed.
+
+        Args:
+            request_id: Unique identifier for the request
+            style: Style to generate
+            segments: Output of split_segments() or split_chunks()
+            queue: Buffer the SSE generator drains
+            cache_key: Key to store the whole stitched result under, or None
+                if the text is not cacheable
+            concurrency: Segments generated at the same time
+            neighbours: Send each segment's neighbours as context
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        buffers: List[EventBuffer] = []
+        tasks: Dict[int, asyncio.Task] = {}
+        for index, (segment, _) in enumerate(segments):
+            buffer = EventBuffer()
+            buffers.append(buffer)
+            if not segment.strip():
+                buffer.close()
+                continue
+            key: Optional[str] = None
+            cached: Optional[str] = None
+            clean_segment: Optional[str] = None
+            context = segment_context(segments, index) if neighbours else ""
+            config = style_registry.find(style)
+            if cache_key is not None and config is not None:
                 try:
-                    # Stream from OpenAI with enhanced security
-                    response_stream = openai_client.create_completion_stream(
-                        request_id=request_id, prompt=text, style=style
+                    # The same memoized check the segment's upstream call
+                    # runs
+                    clean_segment = (
+                        await openai_client.security_pipeline.secure_input(
+                            segment
+                        )
+                    )
+                except ValueError:
+                    # Left uncached; its generation reports the block
+                    clean_segment = None
+            if clean_segment is not None:
+                key = make_cache_key(
+                    clean_segment,
+                    style,
+                    config.model,
+                    _template_version(config),
+                    context,
+                )
+                cached = await result_cache.get(key)
+            if cached is not None:
+                await buffer.put({"type": "delta", "style": style, "text": cached})
+                buffer.close()
+                self.segments_reused_total += 1
+                continue
+            self.segments_generated_total += 1
+            tasks[index] = asyncio.create_task(
+                self._generate_segment(
+                    f"{request_id}:{index}",
+                    segment,
+                    style,
+                    buffer,
+                    key,
+                    semaphore,
+                    context,
+                )
+            )
+
+        parts: List[str] = []
+        truncated = False
+        try:
+            for index, buffer in enumerate(buffers):
+                while (event := await buffer.get()) is not None:
+                    if event["type"] == "complete":
+                        truncated = truncated or event.get("truncated", False)
+                        continue
+                    if event["type"] in ("error", "timeout"):
+                        # A blocked or timed out segment fails the whole style
+                        await queue.put(event)
+                        return
+                    if event["type"] == "delta":
+                        parts.append(event["text"])
+                    await queue.put(event)
+                if index in tasks:
+                    # Surface unexpected errors from the segment's generation
+                    await tasks[index]
+                separator = segments[index][1]
+                if separator and index < len(segments) - 1:
+                    parts.append(separator)
+                    await queue.put(
+                        {"type": "delta", "style": style, "text": separator}
                     )
 
-                    for event in response_stream:
-                        # Check if client disconnected
-                        if await request.is_disconnected():
-                            print(f"Client disconnected during {style}")
-                            # Close the stream to stop token generation
-                            openai_client.close_stream(request_id)
-                            return
-
-                        # Handle text delta events from OpenAI streaming
-                        if event.type == "response.output_text.delta":
-                            content = event.delta
-
-                            # Validate output chunk for security
-                            # Note: Test this
-                            if not self.output_validator.validate_output(
-                                content
-                            ):
-                                # Send security error event for frontend to display
-                                error_event = {
-                                    "type": "error",
-                                    "style": style,
-                                    "text": "Content blocked due to security concerns. Please try rephrasing your input.",
-                                }
-                                yield f"data: {json.dumps(error_event)}\n\n"
-                                openai_client.close_stream(request_id)
-                                print(f"Validation failed")
-                                break
-
-                            # Send SSE event
-                            event_data = {
-                                "type": "delta",
+            if truncated:
+                await queue.put(
+                    {"type": "complete", "style": style, "truncated": True}
+                )
+                return
+            if cache_key is not None:
+                await result_cache.put(cache_key, "".join(parts))
+            await queue.put({"type": "complete", "style": style})
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    async def _generate_segment(
+        self,
+        upstream_id: str,
+        segment: str,
+        style: str,
+        buffer: EventBuffer,
+        cache_key: Optional[str],
+        semaphore: asyncio.Semaphore,
+        context: str = "",
+    ) -> None:
+        """Generate one segment into its own buffer, closing it when done."""
+        try:
+            async with semaphore:
+                await self._run_generation(
+                    upstream_id, segment, style, buffer, cache_key, context
+                )
+        finally:
+            buffer.close()
+
+    async def _generate_style(
+        self,
+        request_id: str,
+        text: str,
+        style: str,
+        queue: EventSink,
+        cache_key: Optional[str] = None,
+        context: str = "",
+    ) -> None:
+        """
+        Run one style's upstream stream, emitting its SSE events.
+
+        Security failures, and the style having been removed since the
+        request was made, only terminate this style; any other exception
+        propagates and aborts the whole request.
+
+        Args:
+            request_id: Identifier the upstream stream is registered under
+            text: The text to rephrase
+            style: Style to generate
+            queue: Buffer or flight receiving the events
+            cache_key: Key to store the finished result under, if cacheable
+            context: Surrounding text sent read-only along with text
+        """
+        parts: List[str] = []
+        blocked = False
+        truncated = False
+        validator = self.output_validator.stream()
+        try:
+            # Stream from OpenAI with enhanced security
+            response_stream = await openai_client.create_completion_stream(
+                request_id=request_id,
+                prompt=text,
+                style=style,
+                on_queued=self._position_reporter(queue, style),
+                context=context,
+            )
+
+            async for event in response_stream:
+                # Handle text delta events from OpenAI streaming
+                if event.type == "response.output_text.delta":
+                    # Validate output for security, holding back text that
+                    # could still become a leak together with later deltas
+                    content = validator.feed(event.delta)
+                    if validator.blocked:
+                        # Send security error event for frontend to display
+                        await queue.put(
+                            {
+                                "type": "error",
                                 "style": style,
-                                "text": content,
+                                "text": SECURITY_ERROR_TEXT,
                             }
-                            yield f"data: {json.dumps(event_data)}\n\n"
+                        )
+                        await openai_client.close_stream(request_id, style)
+                        print(f"Validation failed")
+                        blocked = True
+                        break
+
+                    # Send SSE event
+                    if content:
+                        await queue.put(
+                            {"type": "delta", "style": style, "text": content}
+                        )
+                        parts.append(content)
+                elif is_truncated(event):
+                    truncated = True
+
+            content = validator.finish()
+            if content:
+                await queue.put(
+                    {"type": "delta", "style": style, "text": content}
+                )
+                parts.append(content)
+
+            # Results cut off by the output cap are not cached
+            if cache_key is not None and not blocked and not truncated:
+                await result_cache.put(cache_key, "".join(parts))
 
-                    # Mark style as complete since we finished iterating over response_stream
-                    complete_event = {"type": "complete", "style": style}
-                    yield f"data: {json.dumps(complete_event)}\n\n"
+            # Mark style as complete since we finished iterating over response_stream
+            complete = {"type": "complete", "style": style}
+            if truncated:
+                complete["truncated"] = True
+            await queue.put(complete)
 
-                except ValueError as ve:
-                    # Handle input validation errors (security blocks)
-                    print(f"Validation error for style {style}: {str(ve)}")
-                    error_event = {
+        except UnknownStyleError as ue:
+            # The style was removed by a reload after the request was made
+            print(f"Style {style} unavailable: {str(ue)}")
+            await queue.put(
+                {
+                    "type": "error",
+                    "style": style,
+                    "text": UNKNOWN_STYLE_ERROR_TEXT.format(style=style),
+                }
+            )
+        except ValueError as ve:
+            # Handle input validation errors (security blocks)
+            print(f"Validation error for style {style}: {str(ve)}")
+            await queue.put(
+                {
+                    "type": "error",
+                    "style": style,
+                    "text": SECURITY_ERROR_TEXT,
+                }
+            )
+        except (AdmissionRejected, AdmissionTimeout) as ae:
+            # Shed this style when upstream capacity is exhausted
+            print(f"Admission failed for style {style}: {str(ae)}")
+            await queue.put(
+                {"type": "error", "style": style, "text": BUSY_ERROR_TEXT}
+            )
+        except UpstreamTimeout as te:
+            # The upstream stream stalled; give up on this style only
+            print(f"Upstream timeout for style {style}: {str(te)}")
+            await queue.put(
+                {"type": "timeout", "style": style, "reason": te.reason}
+            )
+        finally:
+            # Release this style's connection as soon as it is done
+            await openai_client.close_stream(request_id, style)
+
+    async def _stream_styles_single_call(
+        self,
+        request_id: str,
+        text: str,
+        styles: List[str],
+        queue: EventBuffer,
+        cache_keys: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """
+        Stream every style from one upstream call onto the shared queue.
+
+        The parser returned by the client splits the deltas into styles. A
+        style that fails output validation stops emitting, but the shared
+        upstream stream keeps running for the others.
+
+        Args:
+            request_id: Unique identifier for the request
+            text: The text to rephrase
+            styles: Styles to generate
+            queue: Buffer the SSE generator drains
+            cache_keys: Keys to store finished results under, by style
+        """
+        cache_keys = cache_keys or {}
+        validators = {style: self.output_validator.stream() for style in styles}
+        parts: Dict[str, List[str]] = {style: [] for style in styles}
+        truncated: Set[str] = set()
+        try:
+            response_stream, parser = (
+                await openai_client.create_multi_style_stream(
+                    request_id=request_id,
+                    prompt=text,
+                    styles=styles,
+                    on_queued=self._position_reporter(queue),
+                )
+            )
+
+            async for event in response_stream:
+                if event.type == "response.output_text.delta":
+                    for style, content in parser.feed(event.delta):
+                        await self._put_style_delta(
+                            style, content, validators[style], queue, parts
+                        )
+                elif is_truncated(event):
+                    # The cap cut off the section being written and any
+                    # section not started yet
+                    truncated = {parser.current_style} | {
+                        style for style in styles if not parts[style]
+                    }
+
+            for style, content in parser.finish():
+                await self._put_style_delta(
+                    style, content, validators[style], queue, parts
+                )
+
+            for style in styles:
+                validator = validators[style]
+                content = validator.finish()
+                if content:
+                    await queue.put(
+                        {"type": "delta", "style": style, "text": content}
+                    )
+                    parts[style].append(content)
+                if validator.blocked:
+                    continue
+                if style in truncated:
+                    await queue.put(
+                        {"type": "complete", "style": style, "truncated": True}
+                    )
+                    continue
+                if style in cache_keys:
+                    await result_cache.put(
+                        cache_keys[style], "".join(parts[style])
+                    )
+                await queue.put({"type": "complete", "style": style})
+
+        except ValueError as ve:
+            # Input blocked, so every style fails the same way
+            print(f"Validation error for styles {styles}: {str(ve)}")
+            for style in styles:
+                await queue.put(
+                    {
                         "type": "error",
                         "style": style,
-                        "text": "Content blocked due to security concerns. Please try rephrasing your input.",
+                        "text": SECURITY_ERROR_TEXT,
                     }
-                    yield f"data: {json.dumps(error_event)}\n\n"
+                )
+        except (AdmissionRejected, AdmissionTimeout) as ae:
+            print(f"Admission failed for styles {styles}: {str(ae)}")
+            for style in styles:
+                await queue.put(
+                    {"type": "error", "style": style, "text": BUSY_ERROR_TEXT}
+                )
+        except UpstreamTimeout as te:
+            print(f"Upstream timeout for styles {styles}: {str(te)}")
+            for style in styles:
+                if not validators[style].blocked:
+                    await queue.put(
+                        {"type": "timeout", "style": style, "reason": te.reason}
+                    )
 
-            # All styles complete
-            end_event = {"type": "end"}
-            yield f"data: {json.dumps(end_event)}\n\n"
+    def _position_reporter(
+        self,
+        queue: EventSink,
+        style: Optional[str] = None,
+    ) -> PositionCallback:
+        """
+        Build a callback that reports upstream queue positions as SSE events.
 
-            # Update request status
-            if request_id in active_requests:
-                active_requests[request_id]["status"] = "completed"
+        The first report is a ``queued`` event, later ones are ``position``
+        events. Events for a single-call stream carry no style.
 
-        except Exception as e:
-            print(f"Rephrase stream error: {str(e)}")
-            # To Do: Update frontend on global errors
-            error_event = {"type": "error", "message": str(e)}
-            yield f"data: {json.dumps(error_event)}\n\n"
+        Args:
+            queue: Buffer or flight receiving the events
+            style: Style waiting for capacity, if any
 
-            # Update request status
-            if request_id in active_requests:
-                active_requests[request_id]["status"] = "error"
-        finally:
-            # Close the stream if it's still active
-            openai_client.close_stream(request_id)
+        Returns:
+            Callback for the admission controller
+        """
+        reported = False
 
-            # Clean up request
-            if request_id in active_requests:
-                del active_requests[request_id]
+        async def report(position: int) -> None:
+            nonlocal reported
+            event: Dict[str, Any] = {
+                "type": "position" if reported else "queued",
+                "position": position,
+            }
+            if style is not None:
+                event["style"] = style
+            reported = True
+            await queue.put(event)
+
+        return report
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return operational metrics for the rephrase pipeline."""
+        metrics: Dict[str, Any] = {
+            "admission": openai_client.admission.stats(),
+            "cancellation": cancellation_bus.stats(),
+            "requests": request_reaper.stats(),
+            "result_cache": result_cache.stats(),
+            "coalescing": coalescer.stats(),
+            "security": openai_client.security_pipeline.stats(),
+            "styles": style_registry.stats(),
+            "usage": openai_client.usage_stats(),
+            "timeouts": openai_client.timeout_stats(),
+            "incremental": {
+                "enabled": settings.INCREMENTAL_REPHRASE,
+                "segments_reused_total": self.segments_reused_total,
+                "segments_generated_total": self.segments_generated_total,
+            },
+            "eager": {
+                "enabled": settings.EAGER_GENERATION,
+                "pending": len(eager_buffers),
+                "started_total": self.eager_started_total,
+                "attached_total": self.eager_attached_total,
+                "expired_total": self.eager_expired_total,
+                "events_replayed_total": self.events_replayed_total,
+            },
+        }
+        if openai_client.limiter is not None:
+            metrics["adaptive_limit"] = openai_client.limiter.stats()
+        if openai_client.hedging is not None:
+            metrics["hedging"] = openai_client.hedging.stats()
+        return metrics
+
+    async def _put_style_delta(
+        self,
+        style: str,
+        content: str,
+        validator: StreamValidator,
+        queue: EventBuffer,
+        parts: Dict[str, List[str]],
+    ) -> None:
+        """Validate a demultiplexed delta and queue it, blocking on failure."""
+        if validator.blocked:
+            return
+        content = validator.feed(content)
+        if validator.blocked:
+            await queue.put(
+                {"type": "error", "style": style, "text": SECURITY_ERROR_TEXT}
+            )
+            print(f"Validation failed")
+            return
+        if content:
+            await queue.put({"type": "delta", "style": style, "text": content})
+            parts[style].append(content)
+
+    async def _screen_input(self, text: str) -> Optional[str]:
+        """
+        Run the whole input through the security pipeline.
+
+        Args:
+            text: The raw text to rephrase
+
+        Returns:
+            The sanitized input, or None if it is blocked
+        """
+        try:
+            return await openai_client.security_pipeline.secure_input(text)
+        except ValueError as ve:
+            print(f"Validation error for request input: {str(ve)}")
+            return None
+
+    def _cache_keys(
+        self, text: str, clean_input: str, styles: List[str]
+    ) -> Dict[str, str]:
+        """
+        Build result cache keys for each style of an input.
+
+        The keys also identify in-flight generations for coalescing, and are
+        only built for input the security pipeline let through, so a cached
+        or shared result can never bypass a block. Keys include the style's
+        model and settings, so editing a style stops serving its old results.
+
+        Args:
+            text: The raw text to rephrase
+            clean_input: The text as sanitized by the security pipeline
+            styles: Styles requested
+
+        Returns:
+            Cache key by style, empty if the input is not cacheable
+        """
+        if not (result_cache.enabled or settings.COALESCE_INFLIGHT):
+            return {}
+        if len(text) > MAX_INPUT_CHARS:
+            # The sanitized text is cut at the cap, so inputs past it are
+            # keyed by their full raw text
+            clean_input = text
+        keys: Dict[str, str] = {}
+        for style in styles:
+            config = style_registry.find(style)
+            if config is not None:
+                keys[style] = make_cache_key(
+                    clean_input, style, config.model, _template_version(config)
+                )
+        return keys
+
+    def _share_upstream(self, styles: List[str]) -> bool:
+        """
+        Whether styles can be generated by a single upstream call.
+
+        Args:
+            styles: Styles to generate
+
+        Returns:
+            True if every style exists and they share model and limits
+        """
+        configs = [style_registry.find(style) for style in styles]
+        if any(config is None for config in configs):
+            return False
+        return len({config.upstream for config in configs}) == 1
+
+    async def _replay_cached(
+        self, style: str, result: str, queue: EventBuffer
+    ) -> None:
+        """
+        Replay a cached result as delta and complete events.
+
+        Args:
+            style: Style of the cached result
+            result: Cached rephrased text
+            queue: Buffer the SSE generator drains
+        """
+        chunk = settings.RESULT_CACHE_REPLAY_CHUNK
+        pieces = (
+            [result[i : i + chunk] for i in range(0, len(result), chunk)]
+            if chunk > 0
+            else [result]
+        )
+        for index, piece in enumerate(pieces):
+            if index and settings.RESULT_CACHE_REPLAY_DELAY > 0:
+                await asyncio.sleep(settings.RESULT_CACHE_REPLAY_DELAY)
+            await queue.put({"type": "delta", "style": style, "text": piece})
+        await queue.put({"type": "complete", "style": style, "cached": True})
 
 
 rephrase_service = RephraseService()
 
 
-def cancel_request(request_id: str) -> bool:
+async def cancel_request(request_id: str) -> bool:
     """
     Cancel an active rephrase request.
 
+    The stream may be owned by another worker, in which case the
+    cancellation bus delivers the signal to it.
+
     Args:
         request_id: Unique identifier for the request
 
     Returns:
         bool: True if request was canceled, False if not found
     """
-    if request_id in active_requests:
+    if await active_requests.acontains(request_id):
+        eager_buffers.pop(request_id, None)
+        # Stop the producer task so it cannot open a stream for later styles
+        task = active_tasks.pop(request_id, None)
+        if task is not None and not task.done():
+            cancellation_bus.unregister(request_id)
+            # Coalesced streams are registered under their flight, so the
+            # stream close below can miss; the cancelled task stops them
+            task.cancel()
+            cancelled = True
+        else:
+            # Not streaming here; signal whichever worker owns the stream
+            cancelled = await cancellation_bus.publish(request_id)
+
         # Close the stream
-        stream_closed = openai_client.close_stream(request_id)
+        stream_closed = await openai_client.close_stream(request_id)
 
         # Remove from active requests
-        del active_requests[request_id]
+        await active_requests.adiscard(request_id)
 
-        return stream_closed
+        return stream_closed or cancelled
 
     return False
@@ -0,0 +1,704 @@
+"""Storage backends for pending and active rephrase requests.
+
+A request is created by ``POST /v1/rephrase`` and consumed by
+``GET /v1/rephrase/stream``. With several uvicorn workers (or nodes) those two
+calls can land on different processes, so the store must be shared between
+them. Every backend exposes the same dict-like interface:
+
+- ``memory``: a plain in-process dict (single worker, tests)
+- ``sqlite``: a WAL-mode SQLite file shared by all workers on a host
+- ``redis``: any Redis-compatible server shared by all hosts
+
+Requests that are created but never streamed are expired by RequestReaper.
+
+Shared backends wait on a file lock or the network, so async code uses the
+``a``-prefixed methods, which run them in a thread.
+"""
+
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import abstractmethod
+from collections.abc import MutableMapping
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    TypedDict,
+    get_args,
+)
+
+from ..config import settings
+
+RequestStatus = Literal["created", "processing", "completed", "error"]
+REQUEST_STATUSES = get_args(RequestStatus)
+
+
+class ActiveRequest(TypedDict, total=False):
+    """Represents an active rephrase request."""
+    text: str
+    styles: list[str]
+    status: RequestStatus
+    # time.time() when the request was created
+    created_at: float
+    # Skip cached results for this request
+    bypass_cache: bool
+    # time.time() by which upstream calls must finish
+    deadline: float
+
+
+class RequestStore(MutableMapping):
+    """
+    Dict-like store of ActiveRequest records keyed by request_id.
+
+    Records returned by backends other than ``memory`` are copies, so
+    changes must be written back (or made with update_status) rather than
+    mutated in place.
+    """
+
+    # Whether calls wait on I/O; the async methods run those in a thread
+    blocking = True
+
+    @abstractmethod
+    def __getitem__(self, request_id: str) -> ActiveRequest:
+        """Return the request or raise KeyError."""
+
+    @abstractmethod
+    def __setitem__(self, request_id: str, data: ActiveRequest) -> None:
+        """Insert or replace a request."""
+
+    @abstractmethod
+    def __delitem__(self, request_id: str) -> None:
+        """Delete a request or raise KeyError."""
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over stored request ids."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Return the number of stored requests."""
+
+    def update_status(
+        self,
+        request_id: str,
+        status: RequestStatus,
+        expected: Optional[RequestStatus] = None,
+    ) -> bool:
+        """
+        Set the status of a stored request.
+
+        Args:
+            request_id: Unique identifier for the request
+            status: New status
+            expected: Only update the request while it is in this status
+
+        Returns:
+            bool: True if the request was updated, False otherwise
+        """
+        data = self.get(request_id)
+        if data is None or expected not in (None, data.get("status")):
+            return False
+        data["status"] = status
+        self[request_id] = data
+        return True
+
+    def reap_expired(self, status: RequestStatus, created_before: float) -> int:
+        """
+        Delete requests in a status that were created before a cutoff.
+
+        Records without ``created_at`` never expire.
+
+        Args:
+            status: Only requests in this status are deleted
+            created_before: ``time.time()`` cutoff
+
+        Returns:
+            Number of requests deleted
+        """
+        reaped = 0
+        for request_id in list(self):
+            data = self.get(request_id)
+            if (
+                data is not None
+                and data.get("status") == status
+                and data.get("created_at", created_before) < created_before
+                and self.discard(request_id)
+            ):
+                reaped += 1
+        return reaped
+
+    def usage(self) -> Dict[str, int]:
+        """
+        Summarize stored requests for observability.
+
+        Returns:
+            Request counts by status and approximate bytes held
+        """
+        summary: Dict[str, int] = {"total": 0, "bytes": 0}
+        for request_id in list(self):
+            data = self.get(request_id)
+            if data is None:
+                continue
+            summary["total"] += 1
+            summary["bytes"] += len(json.dumps(data).encode())
+            summary[data["status"]] = summary.get(data["status"], 0) + 1
+        return summary
+
+    def discard(
+        self, request_id: str, status: Optional[RequestStatus] = None
+    ) -> bool:
+        """
+        Delete a request if present.
+
+        Args:
+            request_id: Unique identifier for the request
+            status: Only delete the request while it is in this status
+
+        Returns:
+            bool: True if the request was deleted, False if not found
+        """
+        if status is not None:
+            data = self.get(request_id)
+            if data is None or data.get("status") != status:
+                return False
+        try:
+            del self[request_id]
+            return True
+        except KeyError:
+            return False
+
+    async def _run(self, method: Callable[..., Any], *args: Any) -> Any:
+        """Call a store method, in a thread if the backend blocks."""
+        if not self.blocking:
+            return method(*args)
+        return await asyncio.to_thread(method, *args)
+
+    async def aget(self, request_id: str) -> Optional[ActiveRequest]:
+        """Async get()."""
+        return await self._run(self.get, request_id)
+
+    async def aput(self, request_id: str, data: ActiveRequest) -> None:
+        """Async ``store[request_id] = data``."""
+        await self._run(self.__setitem__, request_id, data)
+
+    async def acontains(self, request_id: str) -> bool:
+        """Async ``request_id in store``."""
+        return await self._run(self.__contains__, request_id)
+
+    async def acount(self) -> int:
+        """Async len()."""
+        return await self._run(self.__len__)
+
+    async def aupdate_status(
+        self,
+        request_id: str,
+        status: RequestStatus,
+        expected: Optional[RequestStatus] = None,
+    ) -> bool:
+        """Async update_status()."""
+        return await self._run(self.update_status, request_id, status, expected)
+
+    async def adiscard(
+        self, request_id: str, status: Optional[RequestStatus] = None
+    ) -> bool:
+        """Async discard()."""
+        return await self._run(self.discard, request_id, status)
+
+
+class InMemoryRequestStore(RequestStore):
+    """Per-process store backed by a dict."""
+
+    blocking = False
+
+    def __init__(self):
+        """Initialize an empty store."""
+        self._requests: Dict[str, ActiveRequest] = {}
+
+    def __getitem__(self, request_id: str) -> ActiveRequest:
+        return self._requests[request_id]
+
+    def __setitem__(self, request_id: str, data: ActiveRequest) -> None:
+        self._requests[request_id] = data
+
+    def __delitem__(self, request_id: str) -> None:
+        del self._requests[request_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._requests))
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+
+class SQLiteRequestStore(RequestStore):
+    """Host-wide store in a WAL-mode SQLite file shared by all workers."""
+
+    def __init__(self, path: str):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            path: SQLite database file path
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        # WAL lets readers in other workers proceed while one worker writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS requests (
+                request_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """Run a statement under the connection lock."""
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def __getitem__(self, request_id: str) -> ActiveRequest:
+        row = self._execute(
+            "SELECT data, status FROM requests WHERE request_id = ?",
+            (request_id,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(request_id)
+        data = json.loads(row[0])
+        data["status"] = row[1]
+        return data
+
+    def __setitem__(self, request_id: str, data: ActiveRequest) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO requests "
+            "(request_id, data, status, updated_at) VALUES (?, ?, ?, ?)",
+            (request_id, json.dumps(data), data["status"], time.time()),
+        )
+
+    def __delitem__(self, request_id: str) -> None:
+        cursor = self._execute(
+            "DELETE FROM requests WHERE request_id = ?", (request_id,)
+        )
+        if cursor.rowcount == 0:
+            raise KeyError(request_id)
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._execute("SELECT request_id FROM requests").fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM requests").fetchone()[0]
+
+    def __contains__(self, request_id: object) -> bool:
+        return (
+            self._execute(
+                "SELECT 1 FROM requests WHERE request_id = ?", (request_id,)
+            ).fetchone()
+            is not None
+        )
+
+    def update_status(
+        self,
+        request_id: str,
+        status: RequestStatus,
+        expected: Optional[RequestStatus] = None,
+    ) -> bool:
+        """Set the status with a single atomic UPDATE."""
+        if expected is None:
+            cursor = self._execute(
+                "UPDATE requests SET status = ?, updated_at = ? "
+                "WHERE request_id = ?",
+                (status, time.time(), request_id),
+            )
+        else:
+            cursor = self._execute(
+                "UPDATE requests SET status = ?, updated_at = ? "
+                "WHERE request_id = ? AND status = ?",
+                (status, time.time(), request_id, expected),
+            )
+        return cursor.rowcount > 0
+
+    def discard(
+        self, request_id: str, status: Optional[RequestStatus] = None
+    ) -> bool:
+        """Delete a request, checking its status in the same statement."""
+        if status is None:
+            cursor = self._execute(
+                "DELETE FROM requests WHERE request_id = ?", (request_id,)
+            )
+        else:
+            cursor = self._execute(
+                "DELETE FROM requests WHERE request_id = ? AND status = ?",
+                (request_id, status),
+            )
+        return cursor.rowcount > 0
+
+    def clear(self) -> None:
+        """Delete every stored request."""
+        self._execute("DELETE FROM requests")
+
+    def reap_expired(self, status: RequestStatus, created_before: float) -> int:
+        """Delete expired requests with a single statement."""
+        cursor = self._execute(
+            "DELETE FROM requests WHERE status = ? "
+            "AND json_extract(data, '$.created_at') < ?",
+            (status, created_before),
+        )
+        return cursor.rowcount
+
+    def usage(self) -> Dict[str, int]:
+        """Summarize stored requests with one aggregate query."""
+        summary: Dict[str, int] = {"total": 0, "bytes": 0}
+        rows = self._execute(
+            "SELECT status, COUNT(*), SUM(LENGTH(data)) FROM requests "
+            "GROUP BY status"
+        ).fetchall()
+        for status, count, size in rows:
+            summary[status] = count
+            summary["total"] += count
+            summary["bytes"] += size or 0
+        return summary
+
+
+class RedisRequestStore(RequestStore):
+    """
+    Store on a Redis-compatible server shared by all workers and hosts.
+
+    Records are kept under one key each, with a TTL so abandoned ones expire
+    on the server. Sorted-set indexes of expiry time and of creation time
+    per status, and a running byte count, keep ``len()``, the reaper and
+    ``usage()`` from reading every record: they cost O(log n) plus the
+    number of records expired since the last call.
+
+    Status changes and conditional deletes read and write the record in a
+    WATCH/MULTI transaction, retried if another worker changed it meanwhile.
+    Only plain string, sorted set, hash and counter commands are used, in
+    ``pipeline()`` and ``transaction()`` blocks, so any client exposing the
+    redis-py API works.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        prefix: str = "rephrase:request:",
+        ttl: int = 3600,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            client: redis-py compatible client
+            prefix: Key prefix for request records and their indexes
+            ttl: Seconds before an abandoned record expires on the server
+        """
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, request_id: str) -> str:
+        return f"{self.prefix}{request_id}"
+
+    def _index(self, name: str) -> str:
+        return f"{self.prefix}index:{name}"
+
+    def __getitem__(self, request_id: str) -> ActiveRequest:
+        raw = self.client.get(self._key(request_id))
+        if raw is None:
+            raise KeyError(request_id)
+        return json.loads(raw)
+
+    def __setitem__(self, request_id: str, data: ActiveRequest) -> None:
+        previous = self.client.hget(self._index("sizes"), request_id)
+        pipe = self.client.pipeline()
+        self._write(pipe, request_id, data, previous)
+        pipe.execute()
+
+    def _write(
+        self, pipe: Any, request_id: str, data: ActiveRequest, previous: Any
+    ) -> None:
+        """
+        Queue the commands storing a record and indexing it.
+
+        Args:
+            pipe: Pipeline to queue the commands on
+            request_id: Unique identifier for the request
+            data: Record to store
+            previous: Size of the record being replaced, from the sizes index
+        """
+        payload = json.dumps(data)
+        size = len(payload.encode())
+        pipe.set(self._key(request_id), payload, ex=self.ttl)
+        pipe.zadd(self._index("expires"), {request_id: time.time() + self.ttl})
+        for status in REQUEST_STATUSES:
+            if status != data["status"]:
+                pipe.zrem(self._index(f"status:{status}"), request_id)
+        # Records without created_at never expire
+        pipe.zadd(
+            self._index(f"status:{data['status']}"),
+            {request_id: data.get("created_at", math.inf)},
+        )
+        pipe.hset(self._index("sizes"), request_id, size)
+        pipe.incrby(self._index("bytes"), size - int(previous or 0))
+
+    def update_status(
+        self,
+        request_id: str,
+        status: RequestStatus,
+        expected: Optional[RequestStatus] = None,
+    ) -> bool:
+        """Set the status in a transaction, so no concurrent change is lost."""
+        key = self._key(request_id)
+
+        def update(pipe: Any) -> bool:
+            raw = pipe.get(key)
+            if raw is None:
+                return False
+            data = json.loads(raw)
+            if expected not in (None, data.get("status")):
+                return False
+            previous = pipe.hget(self._index("sizes"), request_id)
+            data["status"] = status
+            pipe.multi()
+            self._write(pipe, request_id, data, previous)
+            return True
+
+        return self.client.transaction(update, key, value_from_callable=True)
+
+    def discard(
+        self, request_id: str, status: Optional[RequestStatus] = None
+    ) -> bool:
+        """Delete a request, checking its status in the same transaction."""
+        if status is None:
+            return super().discard(request_id)
+        key = self._key(request_id)
+
+        def delete(pipe: Any) -> bool:
+            raw = pipe.get(key)
+            if raw is None or json.loads(raw).get("status") != status:
+                return False
+            pipe.multi()
+            pipe.delete(key)
+            return True
+
+        if not self.client.transaction(delete, key, value_from_callable=True):
+            return False
+        self._forget([request_id])
+        return True
+
+    def __delitem__(self, request_id: str) -> None:
+        deleted = self.client.delete(self._key(request_id))
+        self._forget([request_id])
+        if not deleted:
+            raise KeyError(request_id)
+
+    def __iter__(self) -> Iterator[str]:
+        self._prune()
+        for request_id in self.client.zrange(self._index("expires"), 0, -1):
+            if isinstance(request_id, bytes):
+                request_id = request_id.decode()
+            yield request_id
+
+    def __len__(self) -> int:
+        self._prune()
+        return self.client.zcard(self._index("expires"))
+
+    def __contains__(self, request_id: object) -> bool:
+        return bool(self.client.exists(self._key(str(request_id))))
+
+    def reap_expired(self, status: RequestStatus, created_before: float) -> int:
+        """Delete expired requests found through the status index."""
+        self._prune()
+        request_ids = [
+            request_id.decode() if isinstance(request_id, bytes) else request_id
+            for request_id in self.client.zrangebyscore(
+                self._index(f"status:{status}"), "-inf", f"({created_before}"
+            )
+        ]
+        if not request_ids:
+            return 0
+        reaped = self.client.delete(*map(self._key, request_ids))
+        self._forget(request_ids)
+        return reaped
+
+    def usage(self) -> Dict[str, int]:
+        """Summarize stored requests from the indexes."""
+        self._prune()
+        pipe = self.client.pipeline()
+        for status in REQUEST_STATUSES:
+            pipe.zcard(self._index(f"status:{status}"))
+        pipe.get(self._index("bytes"))
+        *counts, size = pipe.execute()
+        summary: Dict[str, int] = {"total": sum(counts), "bytes": int(size or 0)}
+        for status, count in zip(REQUEST_STATUSES, counts):
+            if count:
+                summary[status] = count
+        return summary
+
+    def _prune(self) -> None:
+        """Drop index entries of records the server has expired."""
+        expired = self.client.zrangebyscore(
+            self._index("expires"), "-inf", time.time()
+        )
+        if expired:
+            self._forget(
+                [
+                    request_id.decode()
+                    if isinstance(request_id, bytes)
+                    else request_id
+                    for request_id in expired
+                ]
+            )
+
+    def _forget(self, request_ids: List[str]) -> None:
+        """Remove requests from every index and the byte count."""
+        sizes = self.client.hmget(self._index("sizes"), request_ids)
+        pipe = self.client.pipeline()
+        pipe.zrem(self._index("expires"), *request_ids)
+        for status in REQUEST_STATUSES:
+            pipe.zrem(self._index(f"status:{status}"), *request_ids)
+        pipe.hdel(self._index("sizes"), *request_ids)
+        pipe.decrby(self._index("bytes"), sum(int(size or 0) for size in sizes))
+        pipe.execute()
+
+
+class RequestReaper:
+    """
+    Background task that expires requests nobody started streaming.
+
+    It also expires ``processing`` requests left behind by a worker that was
+    killed mid-stream, which would otherwise count against the pending
+    request cap forever in a persistent store.
+    """
+
+    def __init__(
+        self,
+        store: RequestStore,
+        ttl: float,
+        interval: float,
+        processing_ttl: Optional[float] = None,
+    ):
+        """
+        Initialize the reaper.
+
+        Args:
+            store: Store to clean up
+            ttl: Seconds a ``created`` request may wait for its stream
+            interval: Seconds between reaper passes
+            processing_ttl: Seconds after creation a ``processing`` request
+                is presumed orphaned (None never expires them)
+        """
+        self.store = store
+        self.ttl = ttl
+        self.interval = interval
+        self.processing_ttl = processing_ttl
+        self.reaped_total = 0
+        self.last_run_at: Optional[float] = None
+        # Usage of a blocking store as of the last pass, for stats()
+        self._usage: Dict[str, int] = {"total": 0, "bytes": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def reap_once(self) -> int:
+        """
+        Delete expired ``created`` and orphaned ``processing`` requests.
+
+        Returns:
+            Number of requests deleted
+        """
+        now = time.time()
+        reaped = self.store.reap_expired("created", now - self.ttl)
+        if self.processing_ttl is not None:
+            reaped += self.store.reap_expired(
+                "processing", now - self.processing_ttl
+            )
+        self.reaped_total += reaped
+        self.last_run_at = now
+        if self.store.blocking:
+            self._usage = self.store.usage()
+        return reaped
+
+    async def start(self) -> None:
+        """Start the periodic reaper task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic reaper task."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        """Reaper loop run by start()."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                reaped = await asyncio.to_thread(self.reap_once)
+                if reaped:
+                    print(f"Reaped {reaped} expired requests")
+            except Exception as e:
+                print(f"Request reaper error: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return reaper metrics and store usage.
+
+        Usage of a blocking store is the one measured by the last pass, so
+        reading metrics never waits on the store.
+        """
+        usage = self._usage if self.store.blocking else self.store.usage()
+        return {
+            **usage,
+            "bytes_per_request": (
+                usage["bytes"] // usage["total"] if usage["total"] else 0
+            ),
+            "reaped_total": self.reaped_total,
+            "last_run_at": self.last_run_at,
+        }
+
+
+def create_request_store(backend: Optional[str] = None) -> RequestStore:
+    """
+    Build the request store selected in settings.
+
+    Args:
+        backend: Overrides settings.REQUEST_STORE when given
+
+    Returns:
+        The configured RequestStore
+    """
+    backend = (backend or settings.REQUEST_STORE).lower()
+    if backend == "memory":
+        return InMemoryRequestStore()
+    if backend == "sqlite":
+        return SQLiteRequestStore(settings.REQUEST_STORE_PATH)
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise ValueError(
+                "REQUEST_STORE=redis requires the 'redis' package"
+            ) from e
+        return RedisRequestStore(
+            redis.Redis.from_url(settings.REQUEST_STORE_URL)
+        )
+    raise ValueError(f"Unknown REQUEST_STORE backend: {backend}")
@@ -0,0 +1,195 @@
+"""Exact-match cache of finished rephrase results.
+
+Results are keyed by a hash of the sanitized input, the style, the model and
+the prompt template version, so a prompt change never serves stale output.
+Entries are evicted least recently used first once the cache is full, and
+expire after a fixed TTL. An optional persistent store acts as a cold tier
+behind the in-process entries; it is read and written in a thread, and its
+errors only cost a miss or a lost write.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .result_store import SQLiteResultStore
+
+
+def make_cache_key(
+    text: str, style: str, model: str, template_version: str, context: str = ""
+) -> str:
+    """
+    Build the cache key for one style of one input.
+
+    Args:
+        text: Sanitized input text
+        style: Rephrase style
+        model: Upstream model name
+        template_version: Version of the prompt template
+        context: Surrounding text a partial input is rephrased with, if any
+
+    Returns:
+        Hex digest identifying the result
+    """
+    components = [template_version, model, style, text]
+    if context:
+        components.append(hashlib.sha256(context.encode()).hexdigest())
+    payload = json.dumps(components)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """In-process LRU cache of rephrased text with a TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 3600.0,
+        store: Optional[SQLiteResultStore] = None,
+    ):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum results held in process (the hot tier)
+            ttl: Seconds a result stays valid
+            store: Persistent store consulted on hot tier misses
+        """
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl
+        self.store = store
+        # key -> (stored at, text), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.store_errors = 0
+        # Lookup latency of hits by tier, in seconds
+        self._latency: Dict[str, Dict[str, float]] = {
+            tier: {"hits": 0, "total": 0.0, "max": 0.0}
+            for tier in ("hot", "cold")
+        }
+
+    @property
+    def enabled(self) -> bool:
+        """Whether results are cached at all."""
+        return self.max_entries > 0 or self.store is not None
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a result and mark it recently used.
+
+        Args:
+            key: Key from make_cache_key()
+
+        Returns:
+            The cached text, or None on a miss
+        """
+        started = time.perf_counter()
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self._record_hit("hot", started)
+            return entry[1]
+
+        if self.store is not None:
+            try:
+                found = await asyncio.to_thread(self.store.lookup, key)
+            except sqlite3.Error as e:
+                # Busy or broken store; generate the result instead
+                print(f"Result store lookup error: {str(e)}")
+                self.store_errors += 1
+                found = None
+            if found is not None:
+                created_at, text = found
+                # Promote with the stored age, so the TTL is not restarted
+                age = max(0.0, time.time() - created_at)
+                self._remember(key, text, time.monotonic() - age)
+                self._record_hit("cold", started)
+                return text
+
+        self.misses += 1
+        return None
+
+    def _record_hit(self, tier: str, started: float) -> None:
+        """Count a hit and its lookup latency."""
+        latency = time.perf_counter() - started
+        self.hits += 1
+        stats = self._latency[tier]
+        stats["hits"] += 1
+        stats["total"] += latency
+        stats["max"] = max(stats["max"], latency)
+
+    async def put(self, key: str, text: str) -> None:
+        """
+        Store a result, evicting the least recently used ones if full.
+
+        Args:
+            key: Key from make_cache_key()
+            text: Complete rephrased text
+        """
+        self._remember(key, text)
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.put, key, text)
+            except sqlite3.Error as e:
+                # The result is still cached in this worker
+                print(f"Result store write error: {str(e)}")
+                self.store_errors += 1
+
+    def _remember(
+        self, key: str, text: str, stored_at: Optional[float] = None
+    ) -> None:
+        """
+        Add a result to the in-process tier.
+
+        Args:
+            key: Key from make_cache_key()
+            text: Complete rephrased text
+            stored_at: ``time.monotonic()`` the result was made, if not now
+        """
+        if self.max_entries == 0:
+            return
+        if stored_at is None:
+            stored_at = time.monotonic()
+        self._entries[key] = (stored_at, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every result held in process."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache metrics."""
+        stats: Dict[str, Any] = {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "store_errors": self.store_errors,
+        }
+        for tier, latency in self._latency.items():
+            stats[f"{tier}_hits"] = latency["hits"]
+            stats[f"{tier}_latency_avg"] = (
+                latency["total"] / latency["hits"] if latency["hits"] else 0.0
+            )
+            stats[f"{tier}_latency_max"] = latency["max"]
+        if self.store is not None:
+            stats["store"] = self.store.stats()
+        return stats
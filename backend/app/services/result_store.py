@@ -0,0 +1,385 @@
+"""Persistent rephrase result store shared by all workers on a host.
+
+The in-process ResultCache is the hot tier; this SQLite file is the cold tier
+behind it, so every worker on the host reuses results generated by the others
+and results survive restarts. The file is bounded by total text size with
+least-recently-used eviction, compacted periodically, and can be exported to
+a snapshot that a fresh container imports at startup.
+
+Usage as a script, from the backend directory:
+
+    python -m app.services.result_store export /path/to/snapshot.db
+    python -m app.services.result_store import /path/to/snapshot.db
+    python -m app.services.result_store compact
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import settings
+
+
+# Results, plus a single row of totals kept current by triggers, so the
+# size check on every write does not sum the whole table. The row also
+# records the last compaction, so only one worker compacts per interval.
+# Runs as one transaction, so a worker starting at the same time never sees
+# the results table without the triggers keeping the totals.
+_SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at);
+CREATE TABLE IF NOT EXISTS store_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    compacted_at REAL NOT NULL
+);
+INSERT OR IGNORE INTO store_state
+    SELECT 0, COUNT(*), COALESCE(SUM(size), 0), 0 FROM results;
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+    UPDATE store_state
+    SET entries = entries + 1, bytes = bytes + new.size
+    WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results
+BEGIN
+    UPDATE store_state SET bytes = bytes - old.size + new.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+    UPDATE store_state
+    SET entries = entries - 1, bytes = bytes - old.size
+    WHERE id = 0;
+END;
+COMMIT;
+"""
+
+# Eviction frees space down to this fraction of max_bytes, so a full store
+# does not run the eviction query on every write
+EVICT_TO = 0.9
+
+
+class SQLiteResultStore:
+    """
+    Result store in a WAL-mode SQLite file shared by all workers.
+
+    Calls block on the database, for up to its busy timeout when another
+    worker holds the write lock; run them off the event loop.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            path: SQLite database file path
+            max_bytes: Total result text size kept before eviction
+            ttl: Seconds a result stays valid
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self._conn.executescript(_SCHEMA)
+        except BaseException:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            raise
+        self._task: Optional[asyncio.Task] = None
+
+        # Totals as of this worker's last access, so stats() never waits on
+        # the database
+        self.entries = 0
+        self.bytes = 0
+        self._read_totals()
+
+        # Metrics
+        self.evictions = 0
+        self.compactions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the store file."""
+        return sqlite3.connect(
+            self.path,
+            timeout=5.0,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """Run a statement under the connection lock."""
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up an unexpired result and mark it recently used.
+
+        Args:
+            key: Key from make_cache_key()
+
+        Returns:
+            The stored text, or None if absent or expired
+        """
+        entry = self.lookup(key)
+        return None if entry is None else entry[1]
+
+    def lookup(self, key: str) -> Optional[Tuple[float, str]]:
+        """
+        Look up an unexpired result with its age and mark it recently used.
+
+        Args:
+            key: Key from make_cache_key()
+
+        Returns:
+            ``time.time()`` the result was stored and its text, or None if
+            absent or expired
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, text FROM results "
+                "WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            # Picks up results other workers stored, for stats()
+            self._read_totals()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE results SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return row[0], row[1]
+
+    def put(self, key: str, text: str) -> None:
+        """
+        Store a result, evicting least recently used ones past max_bytes.
+
+        Args:
+            key: Key from make_cache_key()
+            text: Complete rephrased text
+        """
+        now = time.time()
+        self._execute(
+            """
+            INSERT INTO results VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                text = excluded.text,
+                size = excluded.size,
+                created_at = excluded.created_at,
+                accessed_at = excluded.accessed_at
+            """,
+            (key, text, len(text.encode()), now, now),
+        )
+        self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used results once over max_bytes."""
+        with self._lock:
+            self._read_totals()
+            if self.bytes <= self.max_bytes:
+                return
+            # Keep the most recently used results that fit below the target
+            evicted = self._conn.execute(
+                """
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (
+                            ORDER BY accessed_at DESC, key
+                        ) AS running
+                        FROM results
+                    )
+                    WHERE running > ?
+                )
+                """,
+                (int(self.max_bytes * EVICT_TO),),
+            ).rowcount
+            self._read_totals()
+        self.evictions += evicted
+
+    def _read_totals(self) -> None:
+        """Refresh entries and bytes from the totals row."""
+        self.entries, self.bytes = self._conn.execute(
+            "SELECT entries, bytes FROM store_state WHERE id = 0"
+        ).fetchone()
+
+    def compact(self, min_interval: float = 0) -> Optional[int]:
+        """
+        Drop expired results and return freed pages to the filesystem.
+
+        Runs on its own connection, so this worker's lookups and writes do
+        not wait behind VACUUM. Workers share the interval: if another one
+        compacted within min_interval seconds, nothing is done.
+
+        Args:
+            min_interval: Seconds that must have passed since any worker's
+                last compaction
+
+        Returns:
+            Number of expired results deleted, or None if skipped
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            claimed = conn.execute(
+                "UPDATE store_state SET compacted_at = ? "
+                "WHERE id = 0 AND compacted_at <= ?",
+                (now, now - min_interval),
+            ).rowcount
+            if not claimed:
+                return None
+            deleted = conn.execute(
+                "DELETE FROM results WHERE created_at <= ?",
+                (now - self.ttl,),
+            ).rowcount
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            self.entries, self.bytes = conn.execute(
+                "SELECT entries, bytes FROM store_state WHERE id = 0"
+            ).fetchone()
+        finally:
+            conn.close()
+        self.compactions += 1
+        return deleted
+
+    def export_snapshot(self, path: str) -> None:
+        """
+        Write a consistent copy of the store to a new SQLite file.
+
+        Args:
+            path: Snapshot file path (replaced if it exists)
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        target = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self._conn.backup(target)
+        finally:
+            target.close()
+
+    def import_snapshot(self, path: str) -> int:
+        """
+        Load results from a snapshot, keeping any already stored.
+
+        Args:
+            path: Snapshot file written by export_snapshot()
+
+        Returns:
+            Number of results imported
+        """
+        with self._lock:
+            self._conn.execute("ATTACH DATABASE ? AS snapshot", (path,))
+            try:
+                imported = self._conn.execute(
+                    "INSERT OR IGNORE INTO results "
+                    "SELECT * FROM snapshot.results WHERE created_at > ?",
+                    (time.time() - self.ttl,),
+                ).rowcount
+            finally:
+                self._conn.execute("DETACH DATABASE snapshot")
+        self._evict()
+        return imported
+
+    def clear(self) -> None:
+        """Delete every stored result."""
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._read_totals()
+
+    async def start(self, interval: float) -> None:
+        """
+        Start periodic compaction.
+
+        Args:
+            interval: Seconds between compactions (0 disables them)
+        """
+        if interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        """Stop periodic compaction."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, interval: float) -> None:
+        """Compaction loop run by start()."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Skipped when another worker compacted this interval
+                await asyncio.to_thread(self.compact, interval * 0.9)
+            except Exception as e:
+                # Another worker may hold the database; retry next interval
+                print(f"Result store compaction error: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return store metrics."""
+        return {
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "compactions": self.compactions,
+        }
+
+
+def create_result_store(
+    backend: Optional[str] = None,
+) -> Optional[SQLiteResultStore]:
+    """
+    Build the persistent result store selected in settings.
+
+    Args:
+        backend: Overrides settings.RESULT_STORE when given
+
+    Returns:
+        The store, or None when results are only cached in memory
+    """
+    backend = (backend or settings.RESULT_STORE).lower()
+    if backend == "memory":
+        return None
+    if backend == "sqlite":
+        return SQLiteResultStore(
+            settings.RESULT_STORE_PATH,
+            settings.RESULT_STORE_MAX_BYTES,
+            settings.RESULT_CACHE_TTL,
+        )
+    raise ValueError(f"Unknown RESULT_STORE backend: {backend}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["export", "import", "compact"])
+    parser.add_argument("snapshot", nargs="?", help="Snapshot file path")
+    args = parser.parse_args()
+
+    store = create_result_store("sqlite")
+    if args.command == "compact":
+        print(f"Deleted {store.compact()} expired results")
+    elif not args.snapshot:
+        parser.error(f"{args.command} requires a snapshot path")
+    elif args.command == "export":
+        store.export_snapshot(args.snapshot)
+        print(f"Exported {store.stats()['entries']} results")
+    else:
+        print(f"Imported {store.import_snapshot(args.snapshot)} results")
@@ -0,0 +1,117 @@
+"""Split input text into segments that are rephrased independently.
+
+Sentences and paragraphs are used for incremental rephrasing, and bounded
+chunks of paragraphs for long documents. Segments keep the exact whitespace
+that separated them, so rephrased segments can be stitched back into text
+with the original layout.
+"""
+
+import re
+from typing import Iterable, List, Tuple
+
+# Paragraph breaks, or whitespace following sentence-ending punctuation
+_BOUNDARY = re.compile(r"(\n\s*\n|(?<=[.!?])\s+)")
+_PARAGRAPH_BREAK = re.compile(r"(\n\s*\n)")
+
+# (segment text, separator that followed it)
+Segment = Tuple[str, str]
+
+
+def split_segments(text: str) -> List[Segment]:
+    """
+    Split text at sentence and paragraph boundaries.
+
+    Joining every segment followed by its separator reproduces the input.
+
+    Args:
+        text: Text to split
+
+    Returns:
+        Segments in order, each with its trailing separator
+    """
+    return _split(_BOUNDARY, text)
+
+
+def split_chunks(text: str, max_chars: int) -> List[Segment]:
+    """
+    Split text into chunks of at most max_chars, preferably at paragraphs.
+
+    Whole paragraphs are packed together while they fit. Longer paragraphs
+    are split at sentence boundaries, and sentences that still do not fit
+    are cut at max_chars. Joining every chunk followed by its separator
+    reproduces the input.
+
+    Args:
+        text: Text to split
+        max_chars: Maximum characters per chunk, excluding separators
+
+    Returns:
+        Chunks in order, each with its trailing separator
+    """
+    units: List[Segment] = []
+    for paragraph, separator in _split(_PARAGRAPH_BREAK, text):
+        if len(paragraph) <= max_chars:
+            units.append((paragraph, separator))
+            continue
+        sentences = split_segments(paragraph)
+        sentences[-1] = (sentences[-1][0], sentences[-1][1] + separator)
+        for sentence, sentence_separator in sentences:
+            while len(sentence) > max_chars:
+                units.append((sentence[:max_chars], ""))
+                sentence = sentence[max_chars:]
+            units.append((sentence, sentence_separator))
+
+    chunks: List[Segment] = []
+    for unit, separator in units:
+        if chunks:
+            chunk, chunk_separator = chunks[-1]
+            if len(chunk) + len(chunk_separator) + len(unit) <= max_chars:
+                chunks[-1] = (chunk + chunk_separator + unit, separator)
+                continue
+        chunks.append((unit, separator))
+    return chunks
+
+
+def _split(boundary: "re.Pattern[str]", text: str) -> List[Segment]:
+    """Split text at a boundary pattern with one capturing group."""
+    pieces = boundary.split(text)
+    segments: List[Segment] = []
+    for index in range(0, len(pieces), 2):
+        segment = pieces[index]
+        separator = pieces[index + 1] if index + 1 < len(pieces) else ""
+        if not segment.strip() and segments:
+            # Fold blank pieces into the previous separator
+            previous, previous_separator = segments[-1]
+            segments[-1] = (previous, previous_separator + segment + separator)
+        else:
+            segments.append((segment, separator))
+    return segments
+
+
+def segment_context(segments: List[Segment], index: int) -> str:
+    """
+    Describe the text around a segment, for it to be rephrased in context.
+
+    The context is the nearest non-blank segment on each side, so pronouns
+    and connectives are rephrased consistently with their neighbours.
+
+    Args:
+        segments: Output of split_segments()
+        index: Position of the segment
+
+    Returns:
+        The neighbouring segments, one per line, or "" if there are none
+    """
+    before = _neighbour(reversed(segments[:index]))
+    after = _neighbour(segments[index + 1 :])
+    lines = []
+    if before:
+        lines.append(f"Before: {before}")
+    if after:
+        lines.append(f"After: {after}")
+    return "\n".join(lines)
+
+
+def _neighbour(segments: Iterable[Segment]) -> str:
+    """Return the first non-blank segment, stripped, or ""."""
+    return next((s.strip() for s, _ in segments if s.strip()), "")
@@ -0,0 +1 @@
+"""Micro-benchmarks for hot paths, run as scripts from the backend directory."""
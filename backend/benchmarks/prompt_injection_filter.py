@@ -0,0 +1,101 @@
+"""Benchmark PromptInjectionFilter.detect_injection on 10 KB inputs.
+
+Compares the single-pass compiled scanner and the typoglycemia signature
+index with the previous implementation, which searched every pattern
+separately with uncompiled pattern strings and compared every word with
+every protected keyword.
+
+Usage, from the backend directory:
+
+    python -m benchmarks.prompt_injection_filter [--runs N]
+"""
+
+import argparse
+import re
+import timeit
+
+from app.security.prompt_injection_filter import (
+    MAX_INPUT_CHARS,
+    PromptInjectionFilter,
+)
+
+CLEAN_TEXT = (
+    "Our quarterly results exceeded expectations thanks to strong demand. "
+    "The team shipped three features and closed most open support tickets.\n\n"
+)
+INPUTS = {
+    "clean": (CLEAN_TEXT * MAX_INPUT_CHARS)[:MAX_INPUT_CHARS],
+    "late_html": (CLEAN_TEXT * MAX_INPUT_CHARS)[: MAX_INPUT_CHARS - 20]
+    + "<script>x</script>",
+}
+# Extra protected keywords, as loaded from PROMPT_INJECTION_KEYWORDS_FILE
+EXTRA_KEYWORDS = [f"keyword{index:04d}" for index in range(1000)]
+
+
+def legacy_is_similar_word(word: str, target: str) -> bool:
+    """Typoglycemia check the legacy scan ran for every word and keyword."""
+    if len(word) != len(target) or len(word) < 3:
+        return False
+    # Same first and last letter, scrambled middle
+    return (
+        word[0] == target[0]
+        and word[-1] == target[-1]
+        and sorted(word[1:-1]) == sorted(target[1:-1])
+    )
+
+
+def legacy_detect_injection(
+    input_filter: PromptInjectionFilter, text: str
+) -> bool:
+    """detect_injection as implemented before the compiled scanner."""
+    if any(
+        re.search(pattern, text, re.IGNORECASE)
+        for pattern in input_filter.dangerous_patterns
+    ):
+        return True
+    if any(
+        re.search(pattern, text, re.IGNORECASE)
+        for pattern in input_filter.html_injection_patterns
+    ):
+        return True
+    words = re.findall(r"\b\w+\b", text.lower())
+    for word in words:
+        for pattern in input_filter.fuzzy_patterns:
+            if legacy_is_similar_word(word, pattern):
+                return True
+    return False
+
+
+def main() -> None:
+    """Time both implementations on each input and print the speedup."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    default_filter = PromptInjectionFilter(extra_keywords=[])
+    keyword_filter = PromptInjectionFilter(extra_keywords=EXTRA_KEYWORDS)
+    cases = [
+        (name, default_filter, text, args.runs) for name, text in INPUTS.items()
+    ]
+    # The legacy loop is too slow for many runs with a large keyword list
+    cases.append(
+        ("keywords", keyword_filter, INPUTS["clean"], max(1, args.runs // 50))
+    )
+    for name, input_filter, text, runs in cases:
+        expected = legacy_detect_injection(input_filter, text)
+        assert input_filter.detect_injection(text) == expected
+        legacy = timeit.timeit(
+            lambda: legacy_detect_injection(input_filter, text), number=runs
+        )
+        current = timeit.timeit(
+            lambda: input_filter.detect_injection(text), number=runs
+        )
+        print(
+            f"{name:>10}: legacy {legacy / runs * 1e6:10.1f} us, "
+            f"compiled {current / runs * 1e6:8.1f} us, "
+            f"speedup {legacy / current:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
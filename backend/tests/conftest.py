@@ -1,6 +1,9 @@
 """Test configuration and common fixtures."""
 
+import asyncio
+import fnmatch
 import pytest
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 from typing import Generator
 
@@ -32,3 +35,256 @@ def sample_rephrase_text() -> str:
 def sample_styles() -> list[str]:
     """Sample styles for testing."""
     return ["professional", "casual", "polite", "social"]
+
+
+class FakeStream:
+    """Local stand-in for openai.AsyncStream with injectable latency."""
+
+    def __init__(
+        self, deltas, first_token_delay=0.0, token_delay=0.0, usage=None
+    ):
+        self.deltas = deltas
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.usage = usage
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await asyncio.sleep(self.first_token_delay)
+        for index, delta in enumerate(self.deltas):
+            if self.closed:
+                return
+            if index:
+                await asyncio.sleep(self.token_delay)
+            yield SimpleNamespace(type="response.output_text.delta", delta=delta)
+        yield SimpleNamespace(
+            type="response.completed", response=SimpleNamespace(usage=self.usage)
+        )
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeProvider:
+    """
+    Local fake of the OpenAI async client's ``responses`` API.
+
+    Tests tune ``first_token_delay``/``token_delay`` to inject latency and
+    queue exceptions in ``errors`` to simulate 429s or timeouts. Delays
+    queued in ``first_token_delays`` override ``first_token_delay`` for
+    the next calls, one per call.
+
+    Usage is reported like a provider with prefix caching: a prompt's
+    cached tokens are its longest prefix shared with an earlier prompt,
+    rounded down to ``cache_block_tokens``, at four characters per token.
+    """
+
+    def __init__(self):
+        self.deltas = ["Hello", " world"]
+        self.first_token_delay = 0.0
+        self.first_token_delays = []
+        self.token_delay = 0.0
+        self.errors = []
+        self.calls = []
+        self.streams = []
+        self.prompts = []
+        self.cache_block_tokens = 16
+        self.responses = SimpleNamespace(create=self._create)
+
+    async def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.errors:
+            raise self.errors.pop(0)
+        first_token_delay = (
+            self.first_token_delays.pop(0)
+            if self.first_token_delays
+            else self.first_token_delay
+        )
+        stream = FakeStream(
+            list(self.deltas),
+            first_token_delay,
+            self.token_delay,
+            self._usage(kwargs["input"]),
+        )
+        self.streams.append(stream)
+        return stream
+
+    def _usage(self, messages):
+        """Token usage of a prompt, counting cached prefix tokens."""
+        prompt = "".join(
+            f"<{message['role']}>{message['content']}" for message in messages
+        )
+        shared = 0
+        for earlier in self.prompts:
+            length = 0
+            for a, b in zip(prompt, earlier):
+                if a != b:
+                    break
+                length += 1
+            shared = max(shared, length)
+        self.prompts.append(prompt)
+        block = self.cache_block_tokens
+        return SimpleNamespace(
+            input_tokens=len(prompt) // 4,
+            input_tokens_details=SimpleNamespace(
+                cached_tokens=shared // 4 // block * block
+            ),
+            output_tokens=len(self.deltas),
+        )
+
+
+@pytest.fixture
+def fake_provider() -> FakeProvider:
+    """Fake upstream provider with injectable latency."""
+    return FakeProvider()
+
+
+class FakeRedis:
+    """Minimal local stand-in for a redis-py client."""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.zsets = {}
+        self.hashes = {}
+        # Writes per key, to detect changes to WATCHed keys
+        self.versions = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        self.expiry[key] = ex
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.versions[key] = self.versions.get(key, 0) + 1
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def scan_iter(self, match="*"):
+        for key in list(self.data):
+            if fnmatch.fnmatch(key, match):
+                yield key.encode()
+
+    def incrby(self, key, amount):
+        value = int(self.data.get(key, 0)) + amount
+        self.data[key] = str(value).encode()
+        return value
+
+    def decrby(self, key, amount):
+        return self.incrby(key, -amount)
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def zrem(self, key, *members):
+        zset = self.zsets.get(key, {})
+        return sum(zset.pop(member, None) is not None for member in members)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def zrange(self, key, start, end):
+        members = sorted(
+            self.zsets.get(key, {}).items(), key=lambda item: (item[1], item[0])
+        )
+        end = len(members) if end == -1 else end + 1
+        return [member.encode() for member, _ in members[start:end]]
+
+    def zrangebyscore(self, key, low, high):
+        def bound(value):
+            text = str(value)
+            if text.startswith("("):
+                return float(text[1:]), True
+            return float(text), False
+
+        low, low_open = bound(low)
+        high, high_open = bound(high)
+        return [
+            member.encode()
+            for member, score in sorted(
+                self.zsets.get(key, {}).items(), key=lambda item: item[1]
+            )
+            if (score > low if low_open else score >= low)
+            and (score < high if high_open else score <= high)
+        ]
+
+    def hget(self, key, field):
+        value = self.hashes.get(key, {}).get(field)
+        return None if value is None else str(value).encode()
+
+    def hmget(self, key, fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+        return 1
+
+    def hdel(self, key, *fields):
+        values = self.hashes.get(key, {})
+        return sum(values.pop(field, None) is not None for field in fields)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        """Run func in a WATCH/MULTI transaction, retrying on conflict."""
+        while True:
+            watched = {key: self.versions.get(key, 0) for key in watches}
+            pipe = FakePipeline(self, watching=True)
+            value = func(pipe)
+            if any(self.versions.get(key, 0) != v for key, v in watched.items()):
+                continue
+            results = pipe.execute()
+            return value if value_from_callable else results
+
+
+class FakePipeline:
+    """
+    Queues FakeRedis commands and runs them on execute().
+
+    A pipeline in a transaction runs commands immediately until multi().
+    """
+
+    def __init__(self, client, watching=False):
+        self.client = client
+        self.commands = []
+        self.watching = watching
+
+    def multi(self):
+        self.watching = False
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        if self.watching:
+            return method
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        results = [method(*args, **kwargs) for method, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    """Local stand-in for a Redis-compatible server."""
+    return FakeRedis()
@@ -13,7 +13,7 @@ from unittest.mock import MagicMock, patch
 def mock_openai_responses():
     """Mock OpenAI responses for consistent testing."""
     return {
-        "formal": iter(
+        "professional": iter(
             [
                 "Here is the text rephrased in a formal style: ",
                 "Good morning, I hope this message finds you well.",
@@ -51,11 +51,11 @@ def mock_security_pipeline():
 def sample_requests():
     """Sample request data for testing."""
     return [
-        {"text": "Hello, how are you?", "styles": ["formal"]},
+        {"text": "Hello, how are you?", "styles": ["professional"]},
         {"text": "Thanks for your help!", "styles": ["casual", "polite"]},
         {
             "text": "I need assistance with this project.",
-            "styles": ["professional", "friendly"],
+            "styles": ["professional", "casual"],
         },
     ]
 
@@ -0,0 +1,146 @@
+"""
+Unit tests for app.llm.adaptive_limiter module.
+
+This module tests the AIMD concurrency limit, including growth under
+healthy latency, back-off on latency spikes and overloads, and its
+integration with OpenAIClient against a local fake provider.
+"""
+
+import asyncio
+import httpx
+import pytest
+from openai import RateLimitError
+
+from app.llm.adaptive_limiter import AdaptiveConcurrencyLimiter
+from app.llm.openai_client import OpenAIClient
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test class for AdaptiveConcurrencyLimiter."""
+
+    def test_grows_while_latency_is_healthy(self):
+        """Test additive increase when samples stay near the baseline."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=10)
+
+        for _ in range(40):
+            limiter.record_latency(0.1, in_flight=limiter.limit)
+
+        assert limiter.limit > 4
+        assert limiter.limit <= 10
+
+    def test_does_not_grow_when_underused(self):
+        """Test that an idle limit is not inflated."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+
+        for _ in range(40):
+            limiter.record_latency(0.1, in_flight=1)
+
+        assert limiter.limit == 8
+
+    def test_backs_off_on_latency_spike(self):
+        """Test multiplicative decrease on slow samples."""
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=20, latency_tolerance=2.0, backoff_ratio=0.5
+        )
+        limiter.record_latency(0.1, in_flight=1)
+
+        limiter.record_latency(0.5, in_flight=20)
+
+        assert limiter.limit == 10
+        assert limiter.history[-1]["reason"] == "latency"
+
+    def test_backs_off_on_overload_to_min(self):
+        """Test that overloads shrink the limit down to min_limit."""
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=8, min_limit=2, backoff_ratio=0.5
+        )
+
+        for _ in range(10):
+            limiter.record_overload("rate_limited")
+
+        assert limiter.limit == 2
+
+    def test_on_change_and_stats(self):
+        """Test change notifications and exported history."""
+        changes = []
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=4,
+            backoff_ratio=0.5,
+            history_size=3,
+            on_change=changes.append,
+        )
+
+        limiter.record_overload()
+        for _ in range(5):
+            limiter.record_latency(0.1, in_flight=4)
+
+        stats = limiter.stats()
+        assert changes[0] == 2
+        assert stats["limit"] == limiter.limit
+        assert stats["baseline_latency"] == 0.1
+        assert len(stats["samples"]) == 3
+
+
+class TestAdaptiveLimitWithFakeProvider:
+    """Test the limiter wired into OpenAIClient with injected latency."""
+
+    def setup_method(self):
+        """Create a client whose admission limit is adaptive."""
+        self.client = OpenAIClient()
+        self.client.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=4,
+            max_limit=16,
+            backoff_ratio=0.5,
+            on_change=self.client.admission.set_limit,
+        )
+        self.client.admission.set_limit(4)
+
+    async def run_batch(self, count: int) -> None:
+        """Open and drain count concurrent streams."""
+
+        async def run(index):
+            stream = await self.client.create_completion_stream(
+                f"req-{index}", "Hello there", "casual"
+            )
+            async for _ in stream:
+                pass
+            await self.client.close_stream(f"req-{index}")
+
+        await asyncio.gather(*(run(i) for i in range(count)))
+
+    @pytest.mark.asyncio
+    async def test_limit_follows_provider_latency(self, fake_provider):
+        """Test growth at steady latency and back-off when it degrades."""
+        self.client.client = fake_provider
+        fake_provider.first_token_delay = 0.05
+
+        for _ in range(4):
+            await self.run_batch(8)
+        grown = self.client.admission.limit
+        assert grown > 4
+
+        fake_provider.first_token_delay = 0.3
+        await self.run_batch(4)
+
+        assert self.client.admission.limit < grown
+        assert self.client.admission.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_provider_429_backs_off(self, fake_provider):
+        """Test that an upstream rate limit error shrinks the limit."""
+        self.client.client = fake_provider
+        response = httpx.Response(
+            429, request=httpx.Request("POST", "https://api.openai.com")
+        )
+        fake_provider.errors.append(
+            RateLimitError("rate limited", response=response, body=None)
+        )
+
+        with pytest.raises(RateLimitError):
+            await self.client.create_completion_stream(
+                "req-1", "Hello there", "casual"
+            )
+
+        assert self.client.admission.limit == 2
+        assert self.client.admission.in_flight == 0
+        assert self.client.limiter.history[-1]["reason"] == "rate_limited"
@@ -0,0 +1,198 @@
+"""
+Unit tests for app.llm.admission module.
+
+This module tests upstream admission control, including queueing,
+queue positions, load shedding, timeouts and the host-wide slot pool.
+"""
+
+import asyncio
+import pytest
+
+from app.llm.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    AdmissionTimeout,
+    HostSlotPool,
+)
+
+
+class TestAdmissionController:
+    """Test class for AdmissionController."""
+
+    @pytest.mark.asyncio
+    async def test_admits_up_to_limit(self):
+        """Test that callers under the limit are admitted immediately."""
+        controller = AdmissionController(
+            limit=2, max_queue=1, queue_timeout=1
+        )
+
+        first = await controller.acquire()
+        second = await controller.acquire()
+
+        assert controller.in_flight == 2
+        first.release()
+        second.release()
+        assert controller.in_flight == 0
+        assert controller.stats()["admitted_total"] == 2
+
+    @pytest.mark.asyncio
+    async def test_queue_reports_positions_in_fifo_order(self):
+        """Test that waiters see their positions and are admitted FIFO."""
+        controller = AdmissionController(
+            limit=1, max_queue=2, queue_timeout=1
+        )
+        held = await controller.acquire()
+        positions = {"a": [], "b": []}
+        order = []
+
+        async def wait(name):
+            async def report(position):
+                positions[name].append(position)
+
+            slot = await controller.acquire(report)
+            order.append(name)
+            return slot
+
+        task_a = asyncio.create_task(wait("a"))
+        await asyncio.sleep(0)
+        task_b = asyncio.create_task(wait("b"))
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 2
+
+        held.release()
+        slot_a = await task_a
+        await asyncio.sleep(0)
+        slot_a.release()
+        slot_b = await task_b
+        slot_b.release()
+
+        assert order == ["a", "b"]
+        assert positions == {"a": [1], "b": [2, 1]}
+        assert controller.stats()["queued_total"] == 2
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_full(self):
+        """Test that callers are shed once the wait queue is full."""
+        controller = AdmissionController(
+            limit=1, max_queue=0, queue_timeout=1
+        )
+        held = await controller.acquire()
+
+        assert controller.is_saturated() is True
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire()
+
+        assert exc_info.value.retry_after >= 1
+        assert controller.stats()["rejected_total"] == 1
+        held.release()
+        assert controller.is_saturated() is False
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        """Test that a waiter gives up after the queue timeout."""
+        controller = AdmissionController(
+            limit=1, max_queue=1, queue_timeout=0.01
+        )
+        held = await controller.acquire()
+
+        with pytest.raises(AdmissionTimeout):
+            await controller.acquire()
+
+        assert controller.queue_depth == 0
+        assert controller.stats()["timeouts_total"] == 1
+        held.release()
+        assert controller.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_caller_timeout_shortens_wait(self):
+        """Test that a caller can wait less than the queue timeout."""
+        controller = AdmissionController(
+            limit=1, max_queue=1, queue_timeout=10
+        )
+        held = await controller.acquire()
+
+        with pytest.raises(AdmissionTimeout):
+            await asyncio.wait_for(controller.acquire(timeout=0.01), 1)
+
+        assert controller.queue_depth == 0
+        held.release()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Test that cancelling a waiter frees its queue entry."""
+        controller = AdmissionController(
+            limit=1, max_queue=1, queue_timeout=1
+        )
+        held = await controller.acquire()
+
+        task = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert controller.queue_depth == 0
+        held.release()
+        assert controller.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_raising_limit_admits_waiters(self):
+        """Test that set_limit hands new capacity to waiters."""
+        controller = AdmissionController(
+            limit=1, max_queue=1, queue_timeout=1
+        )
+        held = await controller.acquire()
+        task = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        controller.set_limit(2)
+        slot = await asyncio.wait_for(task, 1)
+
+        assert controller.in_flight == 2
+        slot.release()
+        held.release()
+
+    @pytest.mark.asyncio
+    async def test_release_is_idempotent(self):
+        """Test that releasing a slot twice only frees it once."""
+        controller = AdmissionController(
+            limit=1, max_queue=0, queue_timeout=1
+        )
+        slot = await controller.acquire()
+
+        slot.release()
+        slot.release()
+
+        assert controller.in_flight == 0
+
+
+class TestHostSlotPool:
+    """Test class for HostSlotPool."""
+
+    def test_slots_are_exclusive(self, tmp_path):
+        """Test that a host slot cannot be taken twice."""
+        pool = HostSlotPool(1, str(tmp_path))
+
+        fd = pool.try_acquire()
+        assert fd is not None
+        assert pool.try_acquire() is None
+
+        pool.release(fd)
+        fd = pool.try_acquire()
+        assert fd is not None
+        pool.release(fd)
+
+    @pytest.mark.asyncio
+    async def test_controller_waits_for_host_slot(self, tmp_path):
+        """Test that the controller times out when host slots are taken."""
+        pool = HostSlotPool(1, str(tmp_path))
+        controller = AdmissionController(
+            limit=2, max_queue=0, queue_timeout=0.1, host_pool=pool
+        )
+        slot = await controller.acquire()
+
+        with pytest.raises(AdmissionTimeout):
+            await controller.acquire()
+
+        assert controller.in_flight == 1
+        slot.release()
+        assert controller.in_flight == 0
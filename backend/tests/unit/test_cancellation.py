@@ -0,0 +1,131 @@
+"""
+Unit tests for app.services.cancellation module.
+
+This module tests cancellation delivery to local handlers and across
+workers through the shared SQLite and Redis backends.
+"""
+
+import asyncio
+import pytest
+
+from app.services.cancellation import (
+    CancellationBus,
+    RedisCancellationBus,
+    SQLiteCancellationBus,
+)
+
+
+class TestLocalCancellationBus:
+    """Test class for the in-process bus."""
+
+    @pytest.mark.asyncio
+    async def test_publish_runs_local_handler(self):
+        """Test that a locally owned stream is cancelled directly."""
+        bus = CancellationBus()
+        cancelled = []
+        bus.register("req-1", lambda: cancelled.append("req-1"))
+
+        assert await bus.publish("req-1") is True
+        assert cancelled == ["req-1"]
+        assert bus.stats()["delivered_local_total"] == 1
+
+        # Handlers run at most once
+        assert await bus.publish("req-1") is False
+
+    @pytest.mark.asyncio
+    async def test_publish_unknown_request(self):
+        """Test that an in-process bus cannot reach other workers."""
+        bus = CancellationBus()
+
+        assert await bus.publish("req-1") is False
+
+    @pytest.mark.asyncio
+    async def test_local_bus_has_no_backend(self):
+        """Test that the in-process bus neither watches nor stores signals."""
+        bus = CancellationBus()
+        bus.register("req-1", lambda: None)
+
+        await bus.start()
+        bus._send("req-2", 0.0)
+
+        assert bus._watcher is None
+        assert await bus.poll_once() == 0
+
+
+class SharedBusTests:
+    """Tests shared by every cross-worker backend."""
+
+    def make_workers(self):
+        """Return two buses standing in for two workers."""
+        raise NotImplementedError
+
+    @pytest.mark.asyncio
+    async def test_cancel_reaches_owning_worker(self):
+        """Test that a DELETE on one worker cancels the other's stream."""
+        owner, receiver = self.make_workers()
+        cancelled = asyncio.Event()
+        owner.register("req-1", cancelled.set)
+
+        assert await receiver.publish("req-1") is True
+        assert await owner.poll_once() == 1
+
+        assert cancelled.is_set()
+        assert owner.stats()["delivered_remote_total"] == 1
+        assert owner.stats()["latency_max"] >= 0
+        # Delivered signals are acknowledged
+        assert await owner.poll_once() == 0
+
+    @pytest.mark.asyncio
+    async def test_only_owner_acts(self):
+        """Test that signals for other requests are left alone."""
+        owner, receiver = self.make_workers()
+        owner.register("req-1", lambda: None)
+
+        await receiver.publish("req-2")
+
+        assert await owner.poll_once() == 0
+
+    @pytest.mark.asyncio
+    async def test_watcher_delivers_within_poll_interval(self):
+        """Test the background watcher aborts the stream promptly."""
+        owner, receiver = self.make_workers()
+        cancelled = asyncio.Event()
+        owner.register("req-1", cancelled.set)
+        await owner.start()
+        try:
+            await receiver.publish("req-1")
+            await asyncio.wait_for(cancelled.wait(), 1)
+        finally:
+            await owner.stop()
+
+        assert owner.stats()["latency_max"] < 1
+
+
+class TestSQLiteCancellationBus(SharedBusTests):
+    """Test class for SQLiteCancellationBus."""
+
+    @pytest.fixture(autouse=True)
+    def db_path(self, tmp_path):
+        """Shared database file."""
+        self.path = str(tmp_path / "requests.db")
+
+    def make_workers(self):
+        return (
+            SQLiteCancellationBus(self.path, poll_interval=0.01),
+            SQLiteCancellationBus(self.path, poll_interval=0.01),
+        )
+
+
+class TestRedisCancellationBus(SharedBusTests):
+    """Test class for RedisCancellationBus."""
+
+    @pytest.fixture(autouse=True)
+    def redis_client(self, fake_redis):
+        """Shared Redis stand-in."""
+        self.client = fake_redis
+
+    def make_workers(self):
+        return (
+            RedisCancellationBus(self.client, poll_interval=0.01),
+            RedisCancellationBus(self.client, poll_interval=0.01),
+        )
@@ -0,0 +1,113 @@
+"""
+Unit tests for app.services.coalescing module.
+
+This module tests sharing one generation between subscribers, replay for
+late joiners, and cancellation when the last subscriber leaves.
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.coalescing import SingleFlight
+from app.services.event_buffer import EventBuffer
+
+
+async def drain(buffer: EventBuffer):
+    """Collect events from a closed buffer."""
+    buffer.close()
+    events = []
+    while (event := await buffer.get()) is not None:
+        events.append(event)
+    return events
+
+
+class TestSingleFlight:
+    """Test cases for SingleFlight."""
+
+    def setup_method(self):
+        """Set up test fixtures before each test."""
+        self.flights = SingleFlight()
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.cancelled = False
+
+    async def generate(self, flight):
+        """Emit one event, wait to be released, then emit another."""
+        self.calls += 1
+        try:
+            await flight.put({"n": 1})
+            await self.release.wait()
+            await flight.put({"n": 2})
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    @pytest.mark.asyncio
+    async def test_late_joiner_replays_and_shares_generation(self):
+        """Test that a second subscriber gets every event from one run."""
+        first, second = EventBuffer(), EventBuffer()
+        leader = asyncio.create_task(
+            self.flights.run("k", self.generate, first)
+        )
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(
+            self.flights.run("k", self.generate, second)
+        )
+        await asyncio.sleep(0.01)
+
+        self.release.set()
+        await asyncio.wait_for(asyncio.gather(leader, follower), 1)
+
+        assert self.calls == 1
+        assert await drain(first) == [{"n": 1}, {"n": 2}]
+        assert await drain(second) == [{"n": 1}, {"n": 2}]
+        stats = self.flights.stats()
+        assert stats["led_total"] == 1
+        assert stats["joined_total"] == 1
+        assert stats["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_generation_survives_until_last_subscriber_leaves(self):
+        """Test that only the last subscriber leaving cancels the leader."""
+        first = asyncio.create_task(
+            self.flights.run("k", self.generate, EventBuffer())
+        )
+        second = asyncio.create_task(
+            self.flights.run("k", self.generate, EventBuffer())
+        )
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert not self.cancelled
+
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert self.cancelled
+        assert self.flights.stats()["abandoned_total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_leader_error_reaches_every_subscriber(self):
+        """Test that an unexpected generation error is raised to followers."""
+
+        async def fail(flight):
+            await flight.put({"n": 1})
+            raise RuntimeError("boom")
+
+        buffer = EventBuffer()
+        with pytest.raises(RuntimeError):
+            await self.flights.run("k", fail, buffer)
+
+        assert await drain(buffer) == [{"n": 1}]
+
+    @pytest.mark.asyncio
+    async def test_finished_flight_is_not_joined(self):
+        """Test that a new request after completion starts a new run."""
+        self.release.set()
+        await self.flights.run("k", self.generate, EventBuffer())
+        await self.flights.run("k", self.generate, EventBuffer())
+
+        assert self.calls == 2
@@ -135,3 +135,16 @@ class TestSettings:
             ValueError, match="OPENAI_API_KEY environment variable is required"
         ):
             settings.validate()
+
+    def test_validate_rejects_memory_store_with_workers(self):
+        """Test that several workers cannot share an in-process store."""
+        settings = app.config.Settings()
+        settings.OPENAI_API_KEY = "test-key"
+        settings.WEB_CONCURRENCY = 4
+        settings.REQUEST_STORE = "memory"
+
+        with pytest.raises(ValueError, match="REQUEST_STORE=memory"):
+            settings.validate()
+
+        settings.REQUEST_STORE = "sqlite"
+        settings.validate()
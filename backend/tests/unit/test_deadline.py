@@ -0,0 +1,72 @@
+"""
+Unit tests for app.llm.deadline module.
+
+This module will test deadline arithmetic, propagation through the
+request context and bounded waits on upstream steps.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.llm.deadline import UpstreamTimeout, request_deadline, time_left, within
+
+
+class TestTimeLeft:
+    """Test class for time_left."""
+
+    def test_no_deadline(self):
+        """Test there is no time limit without a deadline."""
+        assert time_left() is None
+
+    def test_explicit_deadline(self):
+        """Test seconds left until an explicit deadline."""
+        assert 9 < time_left(time.time() + 10) <= 10
+        assert time_left(time.time() - 1) < 0
+
+    @pytest.mark.asyncio
+    async def test_inherited_by_tasks(self):
+        """Test tasks started after the deadline is set see it."""
+
+        async def child():
+            return time_left()
+
+        async def parent():
+            request_deadline.set(time.time() + 5)
+            return await asyncio.create_task(child())
+
+        left = await asyncio.create_task(parent())
+
+        assert 4 < left <= 5
+        assert time_left() is None
+
+
+class TestWithin:
+    """Test class for within."""
+
+    @pytest.mark.asyncio
+    async def test_returns_result_in_time(self):
+        """Test a fast step returns its result."""
+        assert await within(asyncio.sleep(0, "done"), 1, "idle") == "done"
+
+    @pytest.mark.asyncio
+    async def test_own_timeout(self):
+        """Test a slow step raises with its own reason."""
+        with pytest.raises(UpstreamTimeout) as exc_info:
+            await within(asyncio.sleep(1), 0.01, "idle")
+
+        assert exc_info.value.reason == "idle"
+
+    @pytest.mark.asyncio
+    async def test_deadline_wins_when_sooner(self):
+        """Test the deadline applies when it comes before the timeout."""
+        with pytest.raises(UpstreamTimeout) as exc_info:
+            await within(asyncio.sleep(1), 10, "idle", time.time() + 0.01)
+
+        assert exc_info.value.reason == "deadline"
+
+    @pytest.mark.asyncio
+    async def test_no_limit(self):
+        """Test a step without timeout or deadline is awaited as is."""
+        assert await within(asyncio.sleep(0.01, "done"), 0, "idle") == "done"
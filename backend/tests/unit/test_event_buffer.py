@@ -0,0 +1,66 @@
+"""
+Unit tests for app.services.event_buffer module.
+
+This module tests ordering, bounding and closing of the SSE event buffer.
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.event_buffer import EventBuffer
+
+
+class TestEventBuffer:
+    """Test cases for EventBuffer."""
+
+    @pytest.mark.asyncio
+    async def test_events_in_order_then_none_after_close(self):
+        """Test that buffered events are read in order before the end."""
+        buffer = EventBuffer()
+        await buffer.put({"n": 1})
+        await buffer.put({"n": 2})
+        buffer.close()
+
+        assert await buffer.get() == {"n": 1}
+        assert await buffer.get() == {"n": 2}
+        assert await buffer.get() is None
+
+    @pytest.mark.asyncio
+    async def test_reader_waits_for_live_events(self):
+        """Test that a reader tails events put after it started waiting."""
+        buffer = EventBuffer()
+        reader = asyncio.create_task(buffer.get())
+        await asyncio.sleep(0)
+        assert not reader.done()
+
+        await buffer.put({"n": 1})
+
+        assert await asyncio.wait_for(reader, 1) == {"n": 1}
+
+    @pytest.mark.asyncio
+    async def test_full_buffer_blocks_writer(self):
+        """Test that writers wait for the reader once the bound is hit."""
+        buffer = EventBuffer(max_events=1)
+        await buffer.put({"n": 1})
+        writer = asyncio.create_task(buffer.put({"n": 2}))
+        await asyncio.sleep(0)
+        assert not writer.done()
+        assert buffer.full()
+
+        assert await buffer.get() == {"n": 1}
+        await asyncio.wait_for(writer, 1)
+        assert await buffer.get() == {"n": 2}
+
+    @pytest.mark.asyncio
+    async def test_close_releases_blocked_writer(self):
+        """Test that closing drops pending writes instead of hanging."""
+        buffer = EventBuffer(max_events=1)
+        await buffer.put({"n": 1})
+        writer = asyncio.create_task(buffer.put({"n": 2}))
+        await asyncio.sleep(0)
+
+        buffer.close()
+        await asyncio.wait_for(writer, 1)
+
+        assert len(buffer) == 1
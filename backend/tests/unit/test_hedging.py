@@ -0,0 +1,201 @@
+"""
+Unit tests for app.llm.hedging module.
+
+This module will test the hedging delay and budget, and racing duplicate
+upstream requests through OpenAIClient against a fake provider.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.llm.admission import HostSlotPool
+from app.llm.hedging import MIN_SAMPLES, HedgePolicy
+from app.llm.openai_client import OpenAIClient
+
+
+class TestHedgePolicy:
+    """Test class for HedgePolicy."""
+
+    def test_fixed_delay(self):
+        """Test a configured delay is used as is."""
+        assert HedgePolicy(delay=0.5).delay() == 0.5
+
+    def test_p95_delay(self):
+        """Test the delay follows the rolling p95 once there are samples."""
+        policy = HedgePolicy()
+        for latency in range(1, MIN_SAMPLES):
+            policy.record_latency(latency / 100)
+        assert policy.delay() is None
+
+        for latency in range(MIN_SAMPLES, 101):
+            policy.record_latency(latency / 100)
+
+        assert policy.delay() == 0.95
+
+    def test_budget_limits_hedges(self):
+        """Test hedges are capped at the budgeted fraction of requests."""
+        policy = HedgePolicy(budget=0.25)
+
+        hedges = 0
+        for _ in range(100):
+            policy.record_request()
+            hedges += policy.try_spend()
+
+        assert hedges == 25
+        stats = policy.stats()
+        assert stats["hedges_total"] == 25
+        assert stats["budget_denied_total"] == 75
+        assert stats["hedge_rate"] == 0.25
+
+    def test_burst_is_capped(self):
+        """Test idle periods only save up a bounded number of hedges."""
+        policy = HedgePolicy(budget=1, burst=3)
+        for _ in range(10):
+            policy.record_request()
+
+        assert sum(policy.try_spend() for _ in range(10)) == 3
+
+
+class TestHedgedRequests:
+    """Test hedging wired into OpenAIClient with a fake provider."""
+
+    def setup_method(self):
+        """Create a client that hedges after 20 ms with ample budget."""
+        self.client = OpenAIClient()
+        self.client.hedging = HedgePolicy(delay=0.02, budget=1)
+
+    async def run(self, fake_provider, request_id="req-1"):
+        """Stream one request, returning its text and duration."""
+        self.client.client = fake_provider
+        started = time.monotonic()
+        stream = await self.client.create_completion_stream(
+            request_id, "Hello there", "casual"
+        )
+        text = ""
+        try:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    text += event.delta
+        finally:
+            await self.client.close_stream(request_id)
+        return text, time.monotonic() - started
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged(self, fake_provider):
+        """Test a duplicate overtakes a slow primary, which is cancelled."""
+        fake_provider.first_token_delays = [1, 0]
+
+        text, duration = await self.run(fake_provider)
+
+        assert text == "Hello world"
+        assert duration < 0.5
+        assert len(fake_provider.calls) == 2
+        assert fake_provider.calls[0] == fake_provider.calls[1]
+        assert fake_provider.streams[0].closed
+        assert self.client.hedging.hedge_wins_total == 1
+        assert self.client.admission.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_primary_can_still_win(self, fake_provider):
+        """Test the primary is kept if it answers before the duplicate."""
+        fake_provider.first_token_delays = [0.05, 1]
+
+        text, duration = await self.run(fake_provider)
+
+        assert text == "Hello world"
+        assert duration < 0.5
+        assert len(fake_provider.calls) == 2
+        assert fake_provider.streams[1].closed
+        assert self.client.hedging.hedge_wins_total == 0
+        assert self.client.admission.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_is_not_hedged(self, fake_provider):
+        """Test no duplicate is sent when the first token is quick."""
+        text, _ = await self.run(fake_provider)
+
+        assert text == "Hello world"
+        assert len(fake_provider.calls) == 1
+        assert self.client.hedging.hedges_total == 0
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_spare_capacity(self, fake_provider):
+        """Test duplicates never queue for admission."""
+        self.client.admission.set_limit(1)
+        fake_provider.first_token_delays = [0.1]
+
+        text, _ = await self.run(fake_provider)
+
+        assert text == "Hello world"
+        assert len(fake_provider.calls) == 1
+        assert self.client.hedging.capacity_denied_total == 1
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_host_pool_is_full(self, fake_provider, tmp_path):
+        """Test duplicates never wait for a host-wide slot."""
+        self.client.admission.host_pool = HostSlotPool(1, str(tmp_path))
+        fake_provider.first_token_delays = [0.1]
+
+        text, duration = await self.run(fake_provider)
+
+        assert text == "Hello world"
+        assert duration < 0.3
+        assert len(fake_provider.calls) == 1
+        assert self.client.hedging.capacity_denied_total == 1
+        assert self.client.hedging.hedges_total == 0
+        assert self.client.admission.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_hedge_open_does_not_delay_primary(self, fake_provider):
+        """Test the primary's first token is not held back by the duplicate."""
+        fake_provider.first_token_delays = [0.1]
+        create = fake_provider.responses.create
+
+        async def slow_duplicate(**kwargs):
+            if fake_provider.calls:
+                await asyncio.sleep(2)
+            return await create(**kwargs)
+
+        fake_provider.responses.create = slow_duplicate
+
+        text, duration = await self.run(fake_provider)
+
+        assert text == "Hello world"
+        assert duration < 0.5
+        assert self.client.hedging.hedges_total == 1
+        assert self.client.hedging.hedge_wins_total == 0
+        assert self.client.admission.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_budget_prevents_amplification(self, fake_provider):
+        """Test an upstream-wide slowdown only adds the budgeted requests."""
+        self.client.hedging = HedgePolicy(delay=0.01, budget=0.25)
+        fake_provider.first_token_delay = 0.03
+
+        for index in range(8):
+            await self.run(fake_provider, f"req-{index}")
+
+        assert len(fake_provider.calls) == 8 + 2
+        assert self.client.hedging.budget_denied_total == 6
+        assert self.client.admission.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_hedge_keeps_primary(self, fake_provider):
+        """Test an error sending the duplicate does not fail the request."""
+        fake_provider.first_token_delays = [0.05]
+        self.client.client = fake_provider
+
+        stream = await self.client.create_completion_stream(
+            "req-1", "Hello there", "casual"
+        )
+        fake_provider.errors.append(RuntimeError("boom"))
+        events = [event async for event in stream]
+        await self.client.close_stream("req-1")
+
+        assert [e.delta for e in events if hasattr(e, "delta")] == [
+            "Hello",
+            " world",
+        ]
+        assert self.client.admission.in_flight == 0
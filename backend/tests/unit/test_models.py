@@ -7,6 +7,7 @@ including field validation, serialization, and error handling.
 
 import pytest
 from pydantic import ValidationError
+from unittest.mock import patch
 
 from app.models.requests import RephraseRequest, RephraseResponse
 
@@ -17,22 +18,56 @@ class TestRephraseRequest:
     def test_valid_rephrase_request(self):
         """Test creation of valid RephraseRequest."""
         request = RephraseRequest(
-            text="Hello world", styles=["formal", "casual"]
+            text="Hello world", styles=["professional", "casual"]
         )
         assert request.text == "Hello world"
-        assert request.styles == ["formal", "casual"]
+        assert request.styles == ["professional", "casual"]
 
     def test_empty_text_validation(self):
         """Test validation with empty text - Pydantic allows empty strings by default."""
         # Pydantic allows empty strings, so this should pass
-        request = RephraseRequest(text="", styles=["formal"])
+        request = RephraseRequest(text="", styles=["professional"])
         assert request.text == ""
-        assert request.styles == ["formal"]
+        assert request.styles == ["professional"]
 
     def test_missing_text_validation(self):
         """Test validation with missing text field."""
         with pytest.raises(ValidationError):
-            RephraseRequest(styles=["formal"])
+            RephraseRequest(styles=["professional"])
+
+    def test_unknown_style_validation(self):
+        """Test validation rejects styles that are not registered."""
+        with pytest.raises(ValidationError, match="Unknown styles: pirate"):
+            RephraseRequest(text="Hello world", styles=["professional", "pirate"])
+
+    def test_too_many_styles_validation(self):
+        """Test validation caps the styles in one request."""
+        styles = ["casual"] * 3
+        with patch("app.models.requests.settings") as mock_settings:
+            mock_settings.MAX_STYLES_PER_REQUEST = 2
+            mock_settings.LONG_DOCUMENT_MAX_CHARS = 100
+            with pytest.raises(ValidationError, match="At most 2 styles"):
+                RephraseRequest(text="Hello world", styles=styles)
+
+    def test_text_length_validation(self):
+        """Test validation caps the text one request may send."""
+        with patch("app.models.requests.settings") as mock_settings:
+            mock_settings.LONG_DOCUMENT_MAX_CHARS = 5
+            mock_settings.MAX_STYLES_PER_REQUEST = 8
+            assert RephraseRequest(text="Hello", styles=["casual"])
+            with pytest.raises(ValidationError, match="at most 5 characters"):
+                RephraseRequest(text="Hello!", styles=["casual"])
+
+    def test_deadline_validation(self):
+        """Test deadlines must be positive and within the server limit."""
+        request = RephraseRequest(text="Hi", styles=["casual"], deadline=10)
+        assert request.deadline == 10
+        assert RephraseRequest(text="Hi", styles=["casual"]).deadline is None
+
+        with pytest.raises(ValidationError):
+            RephraseRequest(text="Hi", styles=["casual"], deadline=0)
+        with pytest.raises(ValidationError, match="at most"):
+            RephraseRequest(text="Hi", styles=["casual"], deadline=10**6)
 
     def test_missing_styles_validation(self):
         """Test validation with missing styles field."""
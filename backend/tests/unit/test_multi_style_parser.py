@@ -0,0 +1,91 @@
+"""
+Unit tests for app.llm.multi_style_parser module.
+
+This module tests demultiplexing of single-call multi-style completions,
+including markers split across deltas and whitespace handling.
+"""
+
+from app.llm.multi_style_parser import (
+    MultiStyleStreamParser,
+    new_marker_nonce,
+    section_marker,
+)
+
+STYLES = ["professional", "casual"]
+
+
+def collect(parser: MultiStyleStreamParser, deltas: list[str]) -> dict:
+    """Feed deltas through the parser and join the output per style."""
+    pieces = []
+    for delta in deltas:
+        pieces.extend(parser.feed(delta))
+    pieces.extend(parser.finish())
+
+    output = {}
+    for style, text in pieces:
+        output[style] = output.get(style, "") + text
+    return output
+
+
+class TestMultiStyleStreamParser:
+    """Test class for MultiStyleStreamParser."""
+
+    def setup_method(self):
+        """Set up a parser with a fixed nonce."""
+        self.nonce = "f00dfeed"
+        self.parser = MultiStyleStreamParser(self.nonce, STYLES)
+        self.full = (
+            f"{section_marker(self.nonce, 'professional')}\n"
+            "Good morning, team.\n\n"
+            f"{section_marker(self.nonce, 'casual')}\n"
+            "Hey folks!\n"
+        )
+
+    def test_whole_output_in_one_delta(self):
+        """Test parsing when the output arrives in one delta."""
+        assert collect(self.parser, [self.full]) == {
+            "professional": "Good morning, team.",
+            "casual": "Hey folks!",
+        }
+
+    def test_markers_split_at_every_position(self):
+        """Test that character-by-character deltas give the same result."""
+        assert collect(self.parser, list(self.full)) == {
+            "professional": "Good morning, team.",
+            "casual": "Hey folks!",
+        }
+
+    def test_marker_lookalikes_are_text(self):
+        """Test that markers without the nonce are kept as output text."""
+        output = collect(
+            self.parser,
+            [
+                f"{section_marker(self.nonce, 'professional')}",
+                "Use <<other|casual>> and << brackets >> freely",
+            ],
+        )
+        assert output == {
+            "professional": "Use <<other|casual>> and << brackets >> freely"
+        }
+
+    def test_preamble_and_unknown_sections_dropped(self):
+        """Test that text outside known sections is discarded."""
+        output = collect(
+            self.parser,
+            [
+                "Sure! Here you go.\n",
+                f"{section_marker(self.nonce, 'pirate')}\nArr\n",
+                f"{section_marker(self.nonce, 'casual')}\nHi",
+            ],
+        )
+        assert output == {"casual": "Hi"}
+
+    def test_text_is_not_held_back_unnecessarily(self):
+        """Test that plain text is released as soon as it arrives."""
+        self.parser.feed(section_marker(self.nonce, "professional"))
+        assert self.parser.feed("Hello") == [("professional", "Hello")]
+        assert self.parser.feed(" there <") == [("professional", " there")]
+
+    def test_nonces_are_random(self):
+        """Test that generated nonces differ between requests."""
+        assert new_marker_nonce() != new_marker_nonce()
@@ -6,15 +6,26 @@ including API communication, streaming, error handling, and configuration.
 """
 
 import pytest
-from unittest.mock import patch, MagicMock, Mock
+import time
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
 
 from app.llm.openai_client import OpenAIClient
+from app.config import settings
+from app.llm.deadline import UpstreamTimeout, request_deadline
+from app.llm.style_registry import (
+    STYLE_PROMPTS,
+    StyleRegistry,
+    UnknownStyleError,
+    build_style,
+)
+from app.llm.token_budget import estimate_tokens
 
 
 class TestOpenAIClient:
     """Test class for OpenAI client."""
 
-    @patch("app.llm.openai_client.OpenAI")
+    @patch("app.llm.openai_client.AsyncOpenAI")
     @patch("app.llm.openai_client.SecureLLMPipeline")
     def test_openai_client_initialization(self, mock_pipeline, mock_openai):
         """Test OpenAI client initialization."""
@@ -27,15 +38,18 @@ class TestOpenAIClient:
         assert client.active_streams == {}
         assert client.security_pipeline is not None
 
-    @patch("app.llm.openai_client.OpenAI")
+    @pytest.mark.asyncio
+    @patch("app.llm.openai_client.AsyncOpenAI")
     @patch("app.llm.openai_client.SecureLLMPipeline")
-    def test_create_completion_stream_security_block(
+    async def test_create_completion_stream_security_block(
         self, mock_pipeline, mock_openai
     ):
         """Test that security pipeline blocks malicious input."""
         mock_openai.return_value = MagicMock()
         mock_security = MagicMock()
-        mock_security.input_filter.detect_injection.return_value = True
+        mock_security.secure_input = AsyncMock(
+            side_effect=ValueError("Input blocked due to security concerns")
+        )
         mock_pipeline.return_value = mock_security
 
         client = OpenAIClient()
@@ -43,38 +57,340 @@ class TestOpenAIClient:
         with pytest.raises(
             ValueError, match="Input blocked due to security concerns"
         ):
-            list(client.create_completion_stream("test-id", "malicious prompt"))
+            await client.create_completion_stream(
+                "test-id", "malicious prompt", style="professional"
+            )
 
-    @patch("app.llm.openai_client.OpenAI")
+    @pytest.mark.asyncio
+    @patch("app.llm.openai_client.AsyncOpenAI")
     @patch("app.llm.openai_client.SecureLLMPipeline")
-    def test_create_completion_stream_success(self, mock_pipeline, mock_openai):
+    async def test_create_completion_stream_success(
+        self, mock_pipeline, mock_openai
+    ):
         """Test successful completion stream creation."""
         # Mock OpenAI client
         mock_openai_instance = MagicMock()
         mock_stream = MagicMock()
-        mock_stream.__iter__ = Mock(return_value=iter(["Hello", " world"]))
-        mock_openai_instance.responses.create.return_value = mock_stream
+        events = [
+            SimpleNamespace(type="response.output_text.delta", delta="Hello"),
+            SimpleNamespace(type="response.output_text.delta", delta=" world"),
+        ]
+        mock_stream.__aiter__.return_value = events
+        mock_openai_instance.responses.create = AsyncMock(
+            return_value=mock_stream
+        )
         mock_openai.return_value = mock_openai_instance
 
         # Mock security pipeline
         mock_security = MagicMock()
-        mock_security.input_filter.detect_injection.return_value = False
-        mock_security.input_filter.sanitize_input.return_value = "clean prompt"
+        mock_security.secure_input = AsyncMock(return_value="clean prompt")
         mock_security.output_validator.validate_output.return_value = True
         mock_pipeline.return_value = mock_security
 
         client = OpenAIClient()
 
         # Test stream creation
-        stream = client.create_completion_stream("test-id", "test prompt")
-        chunks = list(stream)
+        stream = await client.create_completion_stream(
+            "test-id", "test prompt", style="professional"
+        )
+        chunks = [chunk async for chunk in stream]
 
         assert len(chunks) == 2
-        assert chunks == ["Hello", " world"]
-        mock_security.input_filter.detect_injection.assert_called_once_with(
-            "test prompt"
+        assert chunks == events
+        assert stream.first_token_latency is not None
+        mock_security.secure_input.assert_awaited_once_with("test prompt")
+        mock_openai_instance.responses.create.assert_awaited_once()
+        assert client.active_streams["test-id"]["professional"].stream is mock_stream
+        kwargs = mock_openai_instance.responses.create.await_args.kwargs
+        assert kwargs["model"] == "gpt-4o-mini"
+
+    @pytest.mark.asyncio
+    @patch("app.llm.openai_client.AsyncOpenAI")
+    @patch("app.llm.openai_client.SecureLLMPipeline")
+    async def test_create_completion_stream_unknown_style(
+        self, mock_pipeline, mock_openai
+    ):
+        """Test unknown styles are rejected before any scan or upstream call."""
+        mock_openai_instance = MagicMock()
+        mock_openai_instance.responses.create = AsyncMock()
+        mock_openai.return_value = mock_openai_instance
+        mock_security = MagicMock()
+        mock_security.secure_input = AsyncMock(return_value="clean prompt")
+        mock_pipeline.return_value = mock_security
+
+        client = OpenAIClient()
+
+        with pytest.raises(UnknownStyleError):
+            await client.create_completion_stream(
+                "test-id", "test prompt", style="pirate"
+            )
+        mock_security.secure_input.assert_not_awaited()
+        mock_openai_instance.responses.create.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @patch("app.llm.openai_client.AsyncOpenAI")
+    @patch("app.llm.openai_client.SecureLLMPipeline")
+    async def test_close_stream(self, mock_pipeline, mock_openai):
+        """Test closing an active stream awaits close and forgets it."""
+        client = OpenAIClient()
+        streams = {}
+        for style in ("professional", "casual"):
+            streams[style] = MagicMock()
+            streams[style].close = AsyncMock()
+        client.active_streams["test-id"] = dict(streams)
+
+        # Closing one style leaves the others open
+        assert await client.close_stream("test-id", "professional") is True
+        streams["professional"].close.assert_awaited_once()
+        assert list(client.active_streams["test-id"]) == ["casual"]
+
+        # Closing the request closes every remaining style
+        assert await client.close_stream("test-id") is True
+        streams["casual"].close.assert_awaited_once()
+        assert "test-id" not in client.active_streams
+
+        # Closing again is a no-op
+        assert await client.close_stream("test-id") is False
+
+    @pytest.mark.asyncio
+    @patch("app.llm.openai_client.AsyncOpenAI")
+    @patch("app.llm.openai_client.SecureLLMPipeline")
+    async def test_create_multi_style_stream(self, mock_pipeline, mock_openai):
+        """Test that all styles share one upstream call and one preamble."""
+        mock_openai_instance = MagicMock()
+        mock_stream = MagicMock()
+        mock_openai_instance.responses.create = AsyncMock(
+            return_value=mock_stream
+        )
+        mock_openai.return_value = mock_openai_instance
+
+        mock_security = MagicMock()
+        mock_security.secure_input = AsyncMock(return_value="clean prompt")
+        mock_pipeline.return_value = mock_security
+
+        client = OpenAIClient()
+        styles = ["professional", "casual"]
+        stream, parser = await client.create_multi_style_stream(
+            "test-id", "test prompt", styles
+        )
+
+        assert stream.stream is mock_stream
+        assert parser.styles == set(styles)
+        mock_openai_instance.responses.create.assert_awaited_once()
+        content = mock_openai_instance.responses.create.call_args.kwargs[
+            "input"
+        ][0]["content"]
+        assert content.count("SECURITY RULES") == 1
+        for style in styles:
+            assert parser._prefix + style + ">>" in content
+        assert client.active_streams["test-id"]["*"].stream is mock_stream
+
+
+class TestPromptLayout:
+    """Test prompt assembly for provider prefix caching."""
+
+    async def run_styles(self, client, styles):
+        """Open and drain one stream per style for the same input."""
+        for index, style in enumerate(styles):
+            stream = await client.create_completion_stream(
+                f"req-{index}", f"Hello there number {index}", style
+            )
+            async for _ in stream:
+                pass
+            await client.close_stream(f"req-{index}")
+
+    @pytest.mark.asyncio
+    async def test_prefix_layout_shares_static_prefix(
+        self, fake_provider, sample_styles
+    ):
+        """Test every style sends a byte-identical system message first."""
+        client = OpenAIClient()
+        client.client = fake_provider
+        client.prompt_layout = "prefix"
+
+        await self.run_styles(client, sample_styles)
+
+        system_messages = {
+            call["input"][0]["content"] for call in fake_provider.calls
+        }
+        assert len(system_messages) == 1
+        assert [call["input"][0]["role"] for call in fake_provider.calls] == [
+            "system"
+        ] * len(sample_styles)
+        for call, style in zip(fake_provider.calls, sample_styles):
+            assert STYLE_PROMPTS[style] in call["input"][1]["content"]
+
+    @pytest.mark.asyncio
+    async def test_prefix_layout_raises_cached_tokens(
+        self, fake_provider, sample_styles
+    ):
+        """Test cached input tokens are counted and rise with the prefix."""
+        ratios = {}
+        for layout in ("structured", "prefix"):
+            provider = type(fake_provider)()
+            client = OpenAIClient()
+            client.client = provider
+            client.prompt_layout = layout
+
+            await self.run_styles(client, sample_styles)
+
+            stats = client.usage_stats()
+            assert stats["responses_total"] == len(sample_styles)
+            assert stats["input_tokens_total"] > 0
+            ratios[layout] = stats["cached_input_ratio"]
+
+        assert ratios["prefix"] > 0.5
+        assert ratios["prefix"] > 5 * ratios["structured"]
+
+    @patch("app.llm.openai_client.settings")
+    def test_unknown_layout_rejected(self, mock_settings):
+        """Test an unknown PROMPT_LAYOUT fails at startup."""
+        mock_settings.PROMPT_LAYOUT = "sideways"
+
+        with pytest.raises(ValueError, match="sideways"):
+            OpenAIClient()
+
+
+class TestOutputBudget:
+    """Test per-request output token caps."""
+
+    @pytest.mark.asyncio
+    async def test_cap_scales_with_input(self, fake_provider):
+        """Test longer inputs get a larger max_output_tokens."""
+        client = OpenAIClient()
+        client.client = fake_provider
+
+        for index, text in enumerate(["Hi", "Hello there. " * 200]):
+            await client.create_completion_stream(f"req-{index}", text, "casual")
+
+        short, long = (call["max_output_tokens"] for call in fake_provider.calls)
+        assert short == settings.OUTPUT_TOKEN_MIN
+        assert short < long <= settings.OUTPUT_TOKEN_MAX
+
+    @pytest.mark.asyncio
+    async def test_style_cap_and_expansion(self, fake_provider):
+        """Test a style's own cap and expansion factor are applied."""
+        client = OpenAIClient()
+        client.client = fake_provider
+        registry = StyleRegistry()
+        registry._styles["casual"] = build_style(
+            "casual", {"prompt": "Rewrite", "max_output_tokens": 200}
         )
-        mock_security.input_filter.sanitize_input.assert_called_once_with(
-            "test prompt"
+        registry._styles["polite"] = build_style(
+            "polite", {"prompt": "Rewrite", "expansion": 0.5}
         )
-        mock_openai_instance.responses.create.assert_called_once()
+        text = "word " * 400
+
+        with patch("app.llm.openai_client.style_registry", registry):
+            await client.create_completion_stream("req-1", text, "casual")
+            await client.create_completion_stream("req-2", text, "polite")
+            await client.create_multi_style_stream(
+                "req-3", text, ["casual", "polite"]
+            )
+
+        caps = [call["max_output_tokens"] for call in fake_provider.calls]
+        assert caps[0] == 200
+        assert caps[1] == estimate_tokens(text) // 2 + settings.OUTPUT_TOKEN_OVERHEAD
+        assert caps[2] == caps[0] + caps[1]
+
+    @pytest.mark.asyncio
+    @patch.object(settings, "OUTPUT_TOKEN_EXPANSION", 0)
+    async def test_no_cap_when_disabled(self, fake_provider):
+        """Test an expansion of 0 sends no max_output_tokens."""
+        client = OpenAIClient()
+        client.client = fake_provider
+
+        await client.create_completion_stream("req-1", "Hello there", "casual")
+
+        assert "max_output_tokens" not in fake_provider.calls[0]
+
+
+class TestUpstreamTimeouts:
+    """Test first-token, idle and deadline timeouts on upstream streams."""
+
+    def setup_method(self):
+        """Create a client."""
+        self.client = OpenAIClient()
+
+    async def drain(self, fake_provider, style="casual"):
+        """Open and drain one stream."""
+        self.client.client = fake_provider
+        stream = await self.client.create_completion_stream(
+            "req-1", "Hello there", style
+        )
+        try:
+            async for _ in stream:
+                pass
+        finally:
+            await self.client.close_stream("req-1")
+
+    @pytest.mark.asyncio
+    @patch.object(settings, "UPSTREAM_FIRST_TOKEN_TIMEOUT", 0.02)
+    async def test_first_token_timeout(self, fake_provider):
+        """Test a slow first token abandons the stream and is counted."""
+        fake_provider.first_token_delay = 1
+
+        with pytest.raises(UpstreamTimeout) as exc_info:
+            await self.drain(fake_provider)
+
+        assert exc_info.value.reason == "first_token"
+        assert fake_provider.streams[0].closed
+        assert self.client.admission.in_flight == 0
+        stats = self.client.timeout_stats()
+        assert stats["total"] == 1
+        assert stats["by_style"] == [
+            {
+                "style": "casual",
+                "model": "gpt-4o-mini",
+                "reason": "first_token",
+                "count": 1,
+            }
+        ]
+
+    @pytest.mark.asyncio
+    @patch.object(settings, "UPSTREAM_IDLE_TIMEOUT", 0.02)
+    async def test_idle_timeout(self, fake_provider):
+        """Test a stream that stalls after its first token is abandoned."""
+        fake_provider.deltas = ["Hello", " there", " world"]
+        fake_provider.token_delay = 1
+
+        with pytest.raises(UpstreamTimeout) as exc_info:
+            await self.drain(fake_provider)
+
+        assert exc_info.value.reason == "idle"
+
+    @pytest.mark.asyncio
+    async def test_steady_stream_is_not_timed_out(self, fake_provider):
+        """Test tokens arriving within the idle timeout are all read."""
+        fake_provider.token_delay = 0.01
+
+        with patch.object(settings, "UPSTREAM_IDLE_TIMEOUT", 0.5):
+            await self.drain(fake_provider)
+
+        assert self.client.timeout_stats()["total"] == 0
+
+    @pytest.mark.asyncio
+    async def test_deadline(self, fake_provider):
+        """Test the request deadline bounds the stream."""
+        fake_provider.first_token_delay = 1
+        token = request_deadline.set(time.time() + 0.02)
+        try:
+            with pytest.raises(UpstreamTimeout) as exc_info:
+                await self.drain(fake_provider)
+        finally:
+            request_deadline.reset(token)
+
+        assert exc_info.value.reason == "deadline"
+
+    @pytest.mark.asyncio
+    async def test_passed_deadline_never_calls_upstream(self, fake_provider):
+        """Test nothing is sent once the deadline has passed."""
+        token = request_deadline.set(time.time() - 1)
+        try:
+            with pytest.raises(UpstreamTimeout):
+                await self.drain(fake_provider)
+        finally:
+            request_deadline.reset(token)
+
+        assert fake_provider.calls == []
+        assert self.client.admission.in_flight == 0
@@ -5,7 +5,9 @@ This module will test output validation functionality,
 including content filtering, security checks, and validation rules.
 """
 
-from app.security.output_validator import OutputValidator
+import pytest
+
+from app.security.output_validator import OutputValidator, _prefix_pattern
 
 
 class TestOutputValidator:
@@ -54,3 +56,68 @@ class TestOutputValidator:
             filtered
             == "I cannot provide that information for security reasons."
         )
+
+
+class TestStreamValidator:
+    """Test class for StreamValidator."""
+
+    def setup_method(self):
+        """Set up OutputValidator instance."""
+        self.validator = OutputValidator()
+
+    def feed_all(self, stream, deltas):
+        """Feed deltas, returning the released pieces and the final tail."""
+        released = [stream.feed(delta) for delta in deltas]
+        return released, stream.finish()
+
+    def test_leak_split_across_deltas_is_blocked(self):
+        """Test that a match spanning several deltas is caught."""
+        stream = self.validator.stream()
+
+        released, tail = self.feed_all(
+            stream, ["Sure. SYS", "TEM", ":  You ", "are a bot"]
+        )
+
+        assert stream.blocked is True
+        assert "".join(released) + tail == "Sure. "
+
+    def test_only_possible_match_prefix_is_held_back(self):
+        """Test that text is released as soon as it cannot start a match."""
+        stream = self.validator.stream()
+
+        assert stream.feed("Read the instruction") == "Read the "
+        assert stream.feed("s carefully") == "instructions carefully"
+        assert stream.finish() == ""
+        assert stream.blocked is False
+
+    def test_finish_releases_held_text(self):
+        """Test that a harmless tail is emitted when the stream ends."""
+        stream = self.validator.stream()
+
+        released, tail = self.feed_all(stream, ["Hello. Say hi"])
+
+        assert released == ["Hello. Say h"]
+        assert tail == "i"
+
+    def test_length_cap_blocks_stream(self):
+        """Test that the filter_response length cap applies while streaming."""
+        stream = self.validator.stream(max_length=10)
+
+        assert stream.feed("abcdefgh ") == "abcdefgh "
+        assert stream.feed("ijk") == ""
+        assert stream.blocked is True
+        assert stream.finish() == ""
+
+    def test_hold_back_is_bounded_by_window(self):
+        """Test that padding cannot make the stream hold unbounded text."""
+        stream = self.validator.stream(window=8)
+
+        released = stream.feed("system:" + " " * 20)
+
+        assert len(released) == 19
+        assert len(stream.finish()) == 8
+
+    def test_unsupported_pattern_is_rejected(self):
+        """Test that patterns without a prefix form fail loudly."""
+        with pytest.raises(ValueError):
+            _prefix_pattern(r"(secret|token)")
@@ -0,0 +1,215 @@
+"""
+Unit tests for app.services.rate_limiter module.
+
+This module tests per-client token buckets, including request and style
+accounting, tier resolution, refill, and bounded memory.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from app.services.rate_limiter import (
+    RateLimiter,
+    RateLimitTier,
+    TokenBucket,
+    load_api_key_tiers,
+    load_tiers,
+)
+
+TIERS = {
+    "default": RateLimitTier(
+        requests_per_minute=60,
+        request_burst=2,
+        styles_per_minute=60,
+        style_burst=4,
+    ),
+    "partner": RateLimitTier(
+        requests_per_minute=600,
+        request_burst=10,
+        styles_per_minute=600,
+        style_burst=40,
+    ),
+}
+
+
+class TestTokenBucket:
+    """Test class for TokenBucket."""
+
+    def test_refill_is_capped(self):
+        """Test that refilling never exceeds capacity."""
+        bucket = TokenBucket(capacity=5, refill_per_second=1, now=0)
+        bucket.tokens = 0
+
+        bucket.refill(now=2)
+        assert bucket.tokens == 2
+
+        bucket.refill(now=100)
+        assert bucket.tokens == 5
+
+    def test_wait_time(self):
+        """Test time until enough tokens are available."""
+        bucket = TokenBucket(capacity=4, refill_per_second=2, now=0)
+        bucket.tokens = 1
+
+        assert bucket.wait_time(1) == 0
+        assert bucket.wait_time(3) == 1
+        assert bucket.wait_time(5) == float("inf")
+
+
+class TestRateLimiter:
+    """Test class for RateLimiter."""
+
+    def setup_method(self):
+        """Set up a limiter with small buckets."""
+        self.limiter = RateLimiter(TIERS, {"partner-key": "partner"})
+
+    def test_identify(self):
+        """Test that only known API keys escape IP-based limits."""
+        assert self.limiter.identify("partner-key", "1.2.3.4") == (
+            "key:partner-key",
+            "partner",
+        )
+        assert self.limiter.identify("made-up", "1.2.3.4") == (
+            "ip:1.2.3.4",
+            "default",
+        )
+        assert self.limiter.identify(None, None) == ("ip:unknown", "default")
+
+    @patch("app.services.rate_limiter.time.monotonic", return_value=0)
+    def test_request_burst_then_reject(self, mock_time):
+        """Test that the request bucket rejects after its burst."""
+        assert self.limiter.check("ip:a", "default", 1).allowed
+        assert self.limiter.check("ip:a", "default", 1).allowed
+
+        result = self.limiter.check("ip:a", "default", 1)
+        assert result.allowed is False
+        assert result.retry_after == 1
+
+        # Other clients are unaffected
+        assert self.limiter.check("ip:b", "default", 1).allowed
+
+    @patch("app.services.rate_limiter.time.monotonic", return_value=0)
+    def test_styles_are_counted(self, mock_time):
+        """Test that requested styles drain the style bucket."""
+        assert self.limiter.check("ip:a", "default", 4).allowed
+
+        result = self.limiter.check("ip:a", "default", 1)
+        assert result.allowed is False
+        # Rejected checks consume nothing
+        assert self.limiter._buckets["ip:a"][0].tokens == 1
+
+    @patch("app.services.rate_limiter.time.monotonic")
+    def test_refill_allows_again(self, mock_time):
+        """Test that tokens come back over time."""
+        mock_time.return_value = 0
+        self.limiter.check("ip:a", "default", 1)
+        self.limiter.check("ip:a", "default", 1)
+        assert not self.limiter.check("ip:a", "default", 1).allowed
+
+        mock_time.return_value = 1
+        assert self.limiter.check("ip:a", "default", 1).allowed
+
+    @patch("app.services.rate_limiter.time.monotonic")
+    def test_oversized_request_empties_bucket(self, mock_time):
+        """Test that a request larger than the burst waits for a full bucket."""
+        mock_time.return_value = 0
+        self.limiter.check("ip:a", "default", 1)
+
+        result = self.limiter.check("ip:a", "default", 5)
+        assert result.allowed is False
+        assert result.retry_after == 1
+
+        mock_time.return_value = 1
+        assert self.limiter.check("ip:a", "default", 5).allowed
+        assert self.limiter._buckets["ip:a"][1].tokens == 0
+
+    @patch("app.services.rate_limiter.time.monotonic")
+    def test_idle_clients_evicted(self, mock_time):
+        """Test that idle buckets are dropped after idle_ttl."""
+        limiter = RateLimiter(TIERS, idle_ttl=10)
+        mock_time.return_value = 0
+        limiter.check("ip:a", "default", 1)
+        mock_time.return_value = 5
+        limiter.check("ip:b", "default", 1)
+
+        mock_time.return_value = 12
+        limiter.check("ip:c", "default", 1)
+
+        assert list(limiter._buckets) == ["ip:b", "ip:c"]
+        assert limiter.stats()["evicted_total"] == 1
+
+    @patch("app.services.rate_limiter.time.monotonic", return_value=0)
+    def test_max_clients_bounds_memory(self, mock_time):
+        """Test that the least recently used client is evicted at the cap."""
+        limiter = RateLimiter(TIERS, max_clients=2)
+
+        limiter.check("ip:a", "default", 1)
+        limiter.check("ip:b", "default", 1)
+        limiter.check("ip:a", "default", 1)
+        limiter.check("ip:c", "default", 1)
+
+        assert list(limiter._buckets) == ["ip:a", "ip:c"]
+        assert limiter.stats()["tracked_clients"] == 2
+
+    @patch("app.services.rate_limiter.time.monotonic")
+    def test_limits_are_split_between_workers(self, mock_time):
+        """Test that each worker enforces its share of the tier."""
+        limiter = RateLimiter(TIERS, workers=2)
+        mock_time.return_value = 0
+
+        assert limiter.check("ip:a", "default", 2).allowed
+        assert not limiter.check("ip:a", "default", 1).allowed
+
+        # Half of 60 per minute refills one token every 2 seconds
+        mock_time.return_value = 1
+        assert not limiter.check("ip:a", "default", 1).allowed
+        mock_time.return_value = 2
+        assert limiter.check("ip:a", "default", 1).allowed
+        assert limiter.stats()["workers"] == 2
+
+    @patch("app.services.rate_limiter.time.monotonic", return_value=0)
+    def test_worker_share_holds_a_full_request(self, mock_time):
+        """Test that splitting a burst never drops below max_styles."""
+        limiter = RateLimiter(
+            {"default": RateLimitTier(30, 10, 120, 40)}, workers=16, max_styles=4
+        )
+
+        assert limiter.check("ip:a", "default", 4).allowed
+        assert limiter._buckets["ip:a"][1].capacity == 4
+
+    def test_default_tier_required(self):
+        """Test that a default tier must be configured."""
+        with pytest.raises(ValueError):
+            RateLimiter({"partner": TIERS["partner"]})
+
+
+class TestLoaders:
+    """Test class for configuration loaders."""
+
+    def test_load_tiers(self):
+        """Test parsing tiers from JSON."""
+        tiers = load_tiers(
+            '{"default": {"requests_per_minute": 1, "request_burst": 2, '
+            '"styles_per_minute": 3, "style_burst": 4}}'
+        )
+        assert tiers["default"] == RateLimitTier(1, 2, 3, 4)
+
+    def test_load_tiers_rejects_unusable_tiers(self):
+        """Test that every tier must admit a request with max_styles styles."""
+        raw = (
+            '{"default": {"requests_per_minute": 1, "request_burst": 2, '
+            '"styles_per_minute": 3, "style_burst": 4}}'
+        )
+        assert load_tiers(raw, max_styles=4)
+        with pytest.raises(ValueError, match="4 styles"):
+            load_tiers(raw.replace('"style_burst": 4', '"style_burst": 3'), 4)
+        with pytest.raises(ValueError, match="refill"):
+            load_tiers(raw.replace('"styles_per_minute": 3', '"styles_per_minute": 0'))
+
+    def test_load_api_key_tiers(self):
+        """Test parsing key:tier pairs."""
+        assert load_api_key_tiers("abc:partner, def:internal,") == {
+            "abc": "partner",
+            "def": "internal",
+        }
+        assert load_api_key_tiers("") == {}
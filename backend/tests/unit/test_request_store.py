@@ -0,0 +1,335 @@
+"""
+Unit tests for app.services.request_store module.
+
+This module tests the request store backends through their shared
+dict-like interface, plus sharing between store instances.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.services.request_store import (
+    InMemoryRequestStore,
+    RedisRequestStore,
+    RequestReaper,
+    SQLiteRequestStore,
+    create_request_store,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path, fake_redis):
+    """Each request store backend."""
+    if request.param == "memory":
+        return InMemoryRequestStore()
+    if request.param == "sqlite":
+        return SQLiteRequestStore(str(tmp_path / "requests.db"))
+    return RedisRequestStore(fake_redis)
+
+
+def make_record(text="Hello", status="created", created_at=None):
+    """Build a request record."""
+    record = {"text": text, "styles": ["professional"], "status": status}
+    if created_at is not None:
+        record["created_at"] = created_at
+    return record
+
+
+class TestRequestStoreBackends:
+    """Tests run against every backend."""
+
+    def test_set_get_contains(self, store):
+        """Test storing and reading back a request."""
+        store["req-1"] = make_record()
+
+        assert "req-1" in store
+        assert "req-2" not in store
+        assert store["req-1"] == make_record()
+        assert store.get("req-2") is None
+
+    def test_update_status(self, store):
+        """Test updating the status of a stored request."""
+        store["req-1"] = make_record()
+
+        assert store.update_status("req-1", "processing") is True
+        assert store["req-1"]["status"] == "processing"
+        assert store.update_status("missing", "processing") is False
+
+    def test_update_status_only_from_expected(self, store):
+        """Test that a conditional update claims a request only once."""
+        store["req-1"] = make_record()
+
+        assert store.update_status("req-1", "processing", expected="created")
+        assert not store.update_status("req-1", "processing", expected="created")
+        assert store["req-1"]["status"] == "processing"
+        assert store.usage()["processing"] == 1
+
+    @pytest.mark.asyncio
+    async def test_async_methods(self, store):
+        """Test the async interface used on the event loop."""
+        await store.aput("req-1", make_record())
+
+        assert await store.acount() == 1
+        assert await store.acontains("req-1")
+        assert (await store.aget("req-1"))["text"] == "Hello"
+        assert await store.aupdate_status("req-1", "processing", "created")
+        assert await store.adiscard("req-1", status="processing")
+        assert await store.aget("req-1") is None
+
+    def test_delete_and_discard(self, store):
+        """Test deleting requests."""
+        store["req-1"] = make_record()
+        store["req-2"] = make_record()
+
+        del store["req-1"]
+        assert "req-1" not in store
+        with pytest.raises(KeyError):
+            del store["req-1"]
+
+        assert store.discard("req-2") is True
+        assert store.discard("req-2") is False
+
+    def test_discard_only_in_status(self, store):
+        """Test that a status-checked discard leaves other statuses alone."""
+        store["req-1"] = make_record(status="processing")
+
+        assert store.discard("req-1", status="created") is False
+        assert "req-1" in store
+        assert store.discard("req-1", status="processing") is True
+        assert store.discard("req-1", status="processing") is False
+
+    def test_len_iter_clear(self, store):
+        """Test mapping helpers used by tests and housekeeping."""
+        store["req-1"] = make_record()
+        store["req-2"] = make_record()
+
+        assert len(store) == 2
+        assert sorted(store) == ["req-1", "req-2"]
+
+        store.clear()
+        assert len(store) == 0
+        assert store == {}
+
+    def test_reap_expired(self, store):
+        """Test that only old requests in the given status are deleted."""
+        store["old"] = make_record(created_at=100.0)
+        store["fresh"] = make_record(created_at=200.0)
+        store["streaming"] = make_record(status="processing", created_at=100.0)
+        store["legacy"] = make_record()
+
+        assert store.reap_expired("created", 150.0) == 1
+
+        assert sorted(store) == ["fresh", "legacy", "streaming"]
+
+    def test_usage(self, store):
+        """Test request counts and byte estimate."""
+        store["req-1"] = make_record("x" * 100)
+        store["req-2"] = make_record(status="processing")
+
+        usage = store.usage()
+
+        assert usage["total"] == 2
+        assert usage["created"] == 1
+        assert usage["processing"] == 1
+        assert usage["bytes"] > 100
+
+
+class TestRequestReaper:
+    """Tests for the background request reaper."""
+
+    def test_reap_once(self):
+        """Test that unclaimed requests past the TTL are expired."""
+        store = InMemoryRequestStore()
+        store["stale"] = make_record(created_at=0.0)
+        reaper = RequestReaper(store, ttl=60, interval=10)
+
+        assert reaper.reap_once() == 1
+
+        assert "stale" not in store
+        stats = reaper.stats()
+        assert stats["reaped_total"] == 1
+        assert stats["total"] == 0
+        assert stats["last_run_at"] is not None
+
+    def test_reap_orphaned_processing_requests(self):
+        """Test that streams abandoned by a dead worker eventually expire."""
+        store = InMemoryRequestStore()
+        now = time.time()
+        store["orphaned"] = make_record(status="processing", created_at=0.0)
+        store["streaming"] = make_record(status="processing", created_at=now)
+        reaper = RequestReaper(store, ttl=60, interval=10, processing_ttl=360)
+
+        assert reaper.reap_once() == 1
+
+        assert sorted(store) == ["streaming"]
+        assert RequestReaper(store, ttl=60, interval=10).reap_once() == 0
+
+    def test_stats_use_last_pass_for_blocking_stores(self, tmp_path):
+        """Test that metrics never query a shared store themselves."""
+        store = SQLiteRequestStore(str(tmp_path / "requests.db"))
+        reaper = RequestReaper(store, ttl=60, interval=10)
+        store["fresh"] = make_record(created_at=1e12)
+
+        assert reaper.stats()["total"] == 0
+        reaper.reap_once()
+        assert reaper.stats()["total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_start_stop(self):
+        """Test that the periodic task reaps and stops cleanly."""
+        store = InMemoryRequestStore()
+        store["stale"] = make_record(created_at=0.0)
+        reaper = RequestReaper(store, ttl=60, interval=0.01)
+
+        await reaper.start()
+        for _ in range(100):
+            if "stale" not in store:
+                break
+            await asyncio.sleep(0.01)
+        await reaper.stop()
+
+        assert "stale" not in store
+        assert reaper._task is None
+
+
+class TestSharedStores:
+    """Tests for stores shared between workers."""
+
+    def test_sqlite_shared_between_connections(self, tmp_path):
+        """Test that two workers see each other's requests."""
+        path = str(tmp_path / "requests.db")
+        worker_a = SQLiteRequestStore(path)
+        worker_b = SQLiteRequestStore(path)
+
+        worker_a["req-1"] = make_record("From A")
+        assert worker_b["req-1"]["text"] == "From A"
+
+        worker_b.update_status("req-1", "processing")
+        assert worker_a["req-1"]["status"] == "processing"
+
+        worker_a.discard("req-1")
+        assert "req-1" not in worker_b
+
+    def test_sqlite_uses_wal(self, tmp_path):
+        """Test that the SQLite store runs in WAL mode."""
+        store = SQLiteRequestStore(str(tmp_path / "requests.db"))
+
+        mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_redis_records_expire(self, fake_redis):
+        """Test that Redis records are written with a TTL."""
+        store = RedisRequestStore(fake_redis, ttl=60)
+
+        store["req-1"] = make_record()
+
+        assert fake_redis.expiry["rephrase:request:req-1"] == 60
+
+    def test_redis_counts_without_reading_records(self, fake_redis):
+        """Test that len, reaping and usage use the indexes, not a scan."""
+        store = RedisRequestStore(fake_redis, ttl=60)
+        store["old"] = make_record(created_at=100.0)
+        store["fresh"] = make_record("x" * 100, created_at=200.0)
+        store.update_status("fresh", "processing")
+        fake_redis.scan_iter = None
+        read = []
+        get = fake_redis.get
+        fake_redis.get = lambda key: read.append(key) or get(key)
+
+        assert len(store) == 2
+        assert store.reap_expired("created", 150.0) == 1
+        usage = store.usage()
+
+        assert usage["total"] == 1
+        assert usage["processing"] == 1
+        assert "created" not in usage
+        assert read == ["rephrase:request:index:bytes"]
+        assert usage["bytes"] == len(
+            json.dumps(make_record("x" * 100, "processing", 200.0)).encode()
+        )
+
+    def test_redis_prunes_records_expired_by_server(self, fake_redis):
+        """Test that records the server expired leave the indexes."""
+        store = RedisRequestStore(fake_redis, ttl=60)
+        with patch("app.services.request_store.time.time") as clock:
+            clock.return_value = 1000.0
+            store["req-1"] = make_record(created_at=1000.0)
+            store["req-2"] = make_record(created_at=1000.0)
+            clock.return_value = 1030.0
+            store["req-2"] = make_record(created_at=1000.0)
+            # The server drops req-1 once its TTL is up
+            clock.return_value = 1061.0
+            del fake_redis.data["rephrase:request:req-1"]
+
+            assert len(store) == 1
+            assert list(store) == ["req-2"]
+            assert store.usage()["total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_blocking_stores_run_off_the_event_loop(self, tmp_path):
+        """Test that shared stores are called in a thread, memory inline."""
+        sqlite_store = SQLiteRequestStore(str(tmp_path / "requests.db"))
+        memory_store = InMemoryRequestStore()
+        with patch(
+            "app.services.request_store.asyncio.to_thread",
+            wraps=asyncio.to_thread,
+        ) as to_thread:
+            await sqlite_store.acount()
+            assert to_thread.call_count == 1
+            await memory_store.acount()
+            assert to_thread.call_count == 1
+
+    def test_redis_update_retries_after_concurrent_change(self, fake_redis):
+        """Test that a claim racing another worker's claim does not win."""
+        store = RedisRequestStore(fake_redis)
+        store["req-1"] = make_record()
+        other_worker = RedisRequestStore(fake_redis)
+        get = fake_redis.get
+        raced = []
+
+        def racing_get(key):
+            value = get(key)
+            if not raced:
+                # Another worker claims the request between WATCH and EXEC
+                raced.append(key)
+                other_worker.update_status("req-1", "processing")
+            return value
+
+        with patch.object(fake_redis, "get", side_effect=racing_get):
+            claimed = store.update_status(
+                "req-1", "processing", expected="created"
+            )
+
+        assert claimed is False
+        assert store.usage()["processing"] == 1
+
+    def test_redis_discard_retries_after_concurrent_change(self, fake_redis):
+        """Test that a status-checked delete sees a concurrent claim."""
+        store = RedisRequestStore(fake_redis)
+        store["req-1"] = make_record()
+        get = fake_redis.get
+        raced = []
+
+        def racing_get(key):
+            value = get(key)
+            if not raced:
+                raced.append(key)
+                RedisRequestStore(fake_redis).update_status(
+                    "req-1", "processing"
+                )
+            return value
+
+        with patch.object(fake_redis, "get", side_effect=racing_get):
+            assert store.discard("req-1", status="created") is False
+
+        assert store["req-1"]["status"] == "processing"
+
+    def test_create_request_store(self):
+        """Test the backend factory."""
+        assert isinstance(create_request_store("memory"), InMemoryRequestStore)
+        with pytest.raises(ValueError):
+            create_request_store("carrier-pigeon")
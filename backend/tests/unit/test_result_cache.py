@@ -0,0 +1,84 @@
+"""
+Unit tests for app.services.result_cache module.
+
+This module tests cache keys, LRU eviction, TTL expiry and counters.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from app.services.result_cache import ResultCache, make_cache_key
+
+
+class TestMakeCacheKey:
+    """Test cases for make_cache_key."""
+
+    def test_every_component_changes_the_key(self):
+        """Test that text, style, model, template version and context are keyed."""
+        base = make_cache_key("Hello", "casual", "gpt-4o-mini", "1")
+
+        assert base == make_cache_key("Hello", "casual", "gpt-4o-mini", "1")
+        assert base != make_cache_key("Hello!", "casual", "gpt-4o-mini", "1")
+        assert base != make_cache_key("Hello", "polite", "gpt-4o-mini", "1")
+        assert base != make_cache_key("Hello", "casual", "gpt-4o", "1")
+        assert base != make_cache_key("Hello", "casual", "gpt-4o-mini", "2")
+        assert base != make_cache_key(
+            "Hello", "casual", "gpt-4o-mini", "1", context="After: Bye."
+        )
+
+
+class TestResultCache:
+    """Test cases for ResultCache."""
+
+    @pytest.mark.asyncio
+    async def test_hit_and_miss_counters(self):
+        """Test lookups before and after storing a result."""
+        cache = ResultCache(max_entries=10, ttl=60)
+
+        assert await cache.get("k") is None
+        await cache.put("k", "Hi there")
+        assert await cache.get("k") == "Hi there"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        cache = ResultCache(max_entries=2, ttl=60)
+        await cache.put("a", "A")
+        await cache.put("b", "B")
+        await cache.get("a")
+
+        await cache.put("c", "C")
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "A"
+        assert await cache.get("c") == "C"
+        assert cache.stats()["evictions"] == 1
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self):
+        """Test that entries older than the TTL are misses."""
+        cache = ResultCache(max_entries=10, ttl=60)
+        with patch("app.services.result_cache.time.monotonic") as clock:
+            clock.return_value = 100.0
+            await cache.put("k", "old")
+            clock.return_value = 161.0
+
+            assert await cache.get("k") is None
+
+        assert cache.stats()["expirations"] == 1
+        assert cache.stats()["entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_zero_entries_disables_cache(self):
+        """Test that a cache without capacity stores nothing."""
+        cache = ResultCache(max_entries=0)
+
+        await cache.put("k", "text")
+
+        assert not cache.enabled
+        assert await cache.get("k") is None
@@ -0,0 +1,177 @@
+"""
+Unit tests for app.services.result_store module.
+
+This module tests the host-wide SQLite result store, its snapshots, and its
+use as the cold tier behind ResultCache.
+"""
+
+import sqlite3
+import time
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.services.result_cache import ResultCache
+from app.services.result_store import SQLiteResultStore, create_result_store
+
+
+@pytest.fixture
+def path(tmp_path):
+    """Result store file path."""
+    return str(tmp_path / "results.db")
+
+
+class TestSQLiteResultStore:
+    """Test cases for SQLiteResultStore."""
+
+    def test_shared_between_workers(self, path):
+        """Test that results written by one worker are read by another."""
+        worker_a = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+        worker_b = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+
+        worker_a.put("k", "Hi there")
+
+        assert worker_b.get("k") == "Hi there"
+        assert worker_b.get("missing") is None
+
+    def test_expired_results_are_misses(self, path):
+        """Test that results older than the TTL are not returned."""
+        store = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+        with patch("app.services.result_store.time.time") as clock:
+            clock.return_value = 1000.0
+            store.put("k", "old")
+            clock.return_value = 1061.0
+
+            assert store.get("k") is None
+            assert store.compact() == 1
+
+        assert store.stats()["entries"] == 0
+
+    def test_size_based_lru_eviction(self, path):
+        """Test that least recently used results go once max_bytes is hit."""
+        store = SQLiteResultStore(path, max_bytes=10, ttl=60)
+        with patch("app.services.result_store.time.time") as clock:
+            clock.return_value = 1.0
+            store.put("a", "aaaa")
+            clock.return_value = 2.0
+            store.put("b", "bbbb")
+            clock.return_value = 3.0
+            store.get("a")
+            clock.return_value = 4.0
+            store.put("c", "cccc")
+
+            assert store.get("b") is None
+            assert store.get("a") == "aaaa"
+            assert store.get("c") == "cccc"
+        stats = store.stats()
+        assert stats["bytes"] == 8
+        assert stats["evictions"] == 1
+
+    def test_totals_are_shared_between_workers(self, path):
+        """Test that size totals include other workers' writes."""
+        worker_a = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+        worker_b = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+
+        worker_a.put("a", "aaaa")
+        worker_b.put("b", "bb")
+        worker_b.put("b", "bbb")
+
+        assert worker_b.stats()["entries"] == 2
+        assert worker_b.stats()["bytes"] == 7
+        worker_a.clear()
+        assert worker_a.stats()["bytes"] == 0
+
+    def test_one_worker_compacts_per_interval(self, path):
+        """Test that a compaction by one worker skips the others'."""
+        worker_a = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+        worker_b = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+
+        assert worker_a.compact(min_interval=60) == 0
+        assert worker_b.compact(min_interval=60) is None
+        assert worker_b.compactions == 0
+
+    def test_snapshot_export_import(self, path, tmp_path):
+        """Test pre-warming a fresh store from a snapshot."""
+        store = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+        store.put("a", "A")
+        store.put("b", "B")
+        snapshot = str(tmp_path / "snapshot.db")
+
+        store.export_snapshot(snapshot)
+        fresh = SQLiteResultStore(
+            str(tmp_path / "fresh.db"), max_bytes=1000, ttl=60
+        )
+        fresh.put("a", "kept")
+
+        assert fresh.import_snapshot(snapshot) == 1
+        assert fresh.get("a") == "kept"
+        assert fresh.get("b") == "B"
+
+    def test_create_result_store(self):
+        """Test the backend factory."""
+        assert create_result_store("memory") is None
+        with pytest.raises(ValueError):
+            create_result_store("floppy")
+
+
+class TestTieredResultCache:
+    """Test cases for ResultCache backed by a persistent store."""
+
+    @pytest.mark.asyncio
+    async def test_cold_hit_promotes_to_hot_tier(self, path):
+        """Test that a result from another worker is served and promoted."""
+        store = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+        SQLiteResultStore(path, max_bytes=1000, ttl=60).put("k", "Shared")
+        cache = ResultCache(max_entries=10, ttl=60, store=store)
+
+        assert await cache.get("k") == "Shared"
+        assert await cache.get("k") == "Shared"
+
+        stats = cache.stats()
+        assert stats["cold_hits"] == 1
+        assert stats["hot_hits"] == 1
+        assert stats["cold_latency_avg"] > 0
+        assert stats["store"]["entries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_promotion_keeps_stored_age(self, path):
+        """Test that a cold hit expires when the stored result would."""
+        store = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+        cache = ResultCache(max_entries=10, ttl=60, store=store)
+        with patch("app.services.result_store.time.time", return_value=1000.0):
+            store.put("k", "Shared")
+
+        with patch(
+            "app.services.result_store.time.time", return_value=1050.0
+        ), patch("app.services.result_cache.time.time", return_value=1050.0):
+            assert await cache.get("k") == "Shared"
+
+        # Promoted 50 seconds into a 60 second TTL
+        stored_at, _ = cache._entries["k"]
+        assert 49 < time.monotonic() - stored_at < 51
+
+    @pytest.mark.asyncio
+    async def test_put_writes_through(self, path):
+        """Test that new results reach the persistent store."""
+        store = SQLiteResultStore(path, max_bytes=1000, ttl=60)
+        cache = ResultCache(max_entries=10, ttl=60, store=store)
+
+        await cache.put("k", "Fresh")
+        cache.clear()
+
+        assert store.get("k") == "Fresh"
+        assert await cache.get("k") == "Fresh"
+
+    @pytest.mark.asyncio
+    async def test_store_errors_are_misses(self):
+        """Test that a busy store costs a miss instead of failing."""
+        store = MagicMock()
+        store.lookup.side_effect = sqlite3.OperationalError("database is locked")
+        store.put.side_effect = sqlite3.OperationalError("database is locked")
+        cache = ResultCache(max_entries=10, ttl=60, store=store)
+
+        assert await cache.get("k") is None
+        await cache.put("k", "Fresh")
+        assert await cache.get("k") == "Fresh"
+
+        assert cache.stats()["store_errors"] == 2
@@ -5,11 +5,14 @@ This module will test FastAPI route handlers,
 including request handling, response formatting, and error cases.
 """
 
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
 
+from app.routes.metrics import router as metrics_router
 from app.routes.rephrase import router
+from app.services.rate_limiter import RateLimitResult
+from app.services.rephrase import RequestCapacityExceeded, ServiceOverloaded
 
 
 class TestRephraseRoutes:
@@ -24,24 +27,91 @@ class TestRephraseRoutes:
     @patch("app.routes.rephrase.rephrase_service")
     def test_create_rephrase_success(self, mock_service):
         """Test successful rephrase request creation."""
-        mock_service.create_request.return_value = "test-request-id"
+        mock_service.create_request = AsyncMock(return_value="test-request-id")
+        mock_service.generations_per_style.return_value = 1
 
         response = self.client.post(
             "/v1/rephrase",
-            json={"text": "Hello world", "styles": ["formal", "casual"]},
+            json={"text": "Hello world", "styles": ["professional", "casual"]},
         )
 
         assert response.status_code == 200
         assert response.json() == {"request_id": "test-request-id"}
         mock_service.create_request.assert_called_once_with(
-            "Hello world", ["formal", "casual"]
+            "Hello world", ["professional", "casual"], bypass_cache=False, deadline=None
         )
 
+    @patch("app.routes.rephrase.rephrase_service")
+    def test_create_rephrase_bypass_cache(self, mock_service):
+        """Test that the bypass_cache flag reaches the service."""
+        mock_service.create_request = AsyncMock(return_value="test-request-123")
+        mock_service.generations_per_style.return_value = 1
+
+        response = self.client.post(
+            "/v1/rephrase",
+            json={"text": "Hello", "styles": ["professional"], "bypass_cache": True},
+        )
+
+        assert response.status_code == 200
+        mock_service.create_request.assert_called_once_with(
+            "Hello", ["professional"], bypass_cache=True, deadline=None
+        )
+
+    @patch("app.routes.rephrase.rephrase_service")
+    def test_create_rephrase_overloaded(self, mock_service):
+        """Test that load shedding returns 429 with Retry-After."""
+        mock_service.create_request = AsyncMock(side_effect=ServiceOverloaded(7))
+        mock_service.generations_per_style.return_value = 1
+
+        response = self.client.post(
+            "/v1/rephrase",
+            json={"text": "Hello world", "styles": ["professional"]},
+        )
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "7"
+
+    @patch("app.routes.rephrase.rephrase_service")
+    def test_create_rephrase_at_capacity(self, mock_service):
+        """Test that a full request registry returns 503."""
+        mock_service.create_request = AsyncMock(side_effect=RequestCapacityExceeded())
+        mock_service.generations_per_style.return_value = 1
+
+        response = self.client.post(
+            "/v1/rephrase",
+            json={"text": "Hello world", "styles": ["professional"]},
+        )
+
+        assert response.status_code == 503
+
+    @patch("app.routes.rephrase.rate_limiter")
+    @patch("app.routes.rephrase.rephrase_service")
+    def test_create_rephrase_rate_limited(self, mock_service, mock_limiter):
+        """Test that rate-limited clients get 429 before anything is stored."""
+        mock_limiter.identify.return_value = ("key:abc", "partner")
+        mock_service.generations_per_style.return_value = 3
+        mock_limiter.check.return_value = RateLimitResult(
+            allowed=False, retry_after=12
+        )
+
+        response = self.client.post(
+            "/v1/rephrase",
+            json={"text": "Hello world", "styles": ["professional", "casual"]},
+            headers={"X-API-Key": "abc"},
+        )
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "12"
+        mock_limiter.identify.assert_called_once_with("abc", "testclient")
+        # Two styles of a document in three chunks
+        mock_limiter.check.assert_called_once_with("key:abc", "partner", 6)
+        mock_service.create_request.assert_not_called()
+
     def test_create_rephrase_empty_text_allowed(self):
         """Test rephrase request with empty text - should be allowed by Pydantic."""
         response = self.client.post(
             "/v1/rephrase",
-            json={"text": "", "styles": ["formal"]},  # Empty text is allowed
+            json={"text": "", "styles": ["professional"]},  # Empty text is allowed
         )
 
         assert response.status_code == 200  # Should succeed
@@ -80,3 +150,24 @@ class TestRephraseRoutes:
         assert (
             response.status_code == 422
         )  # FastAPI returns 422 for missing query params
+
+
+class TestMetricsRoutes:
+    """Test class for metrics routes."""
+
+    def setup_method(self):
+        """Set up test client."""
+        self.app = FastAPI()
+        self.app.include_router(metrics_router)
+        self.client = TestClient(self.app)
+
+    @patch("app.routes.metrics.rephrase_service")
+    def test_get_metrics(self, mock_service):
+        """Test that metrics are returned from the service."""
+        mock_service.metrics.return_value = {"admission": {"in_flight": 3}}
+
+        response = self.client.get("/v1/metrics")
+
+        assert response.status_code == 200
+        assert response.json()["admission"] == {"in_flight": 3}
+        assert "tracked_clients" in response.json()["rate_limit"]
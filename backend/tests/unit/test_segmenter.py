@@ -0,0 +1,79 @@
+"""
+Unit tests for app.services.segmenter module.
+
+This module tests sentence/paragraph segmentation and segment contexts.
+"""
+
+from app.services.segmenter import segment_context, split_chunks, split_segments
+
+
+class TestSplitSegments:
+    """Test cases for split_segments."""
+
+    def test_sentences_and_paragraphs(self):
+        """Test splitting at sentence ends and blank lines."""
+        text = "Hi team. Quick update!\n\nShip it? Yes"
+
+        assert split_segments(text) == [
+            ("Hi team.", " "),
+            ("Quick update!", "\n\n"),
+            ("Ship it?", " "),
+            ("Yes", ""),
+        ]
+
+    def test_round_trip_preserves_layout(self):
+        """Test that joining segments reproduces the input exactly."""
+        text = "  One.  Two.\n \n\nThree.\n"
+
+        segments = split_segments(text)
+
+        assert "".join(s + sep for s, sep in segments) == text
+
+    def test_abbreviation_without_space_is_not_split(self):
+        """Test that punctuation inside tokens does not split."""
+        assert split_segments("Version 1.2 is out.") == [
+            ("Version 1.2 is out.", "")
+        ]
+
+
+class TestSplitChunks:
+    """Test cases for split_chunks."""
+
+    def test_paragraphs_are_packed_up_to_limit(self):
+        """Test that whole paragraphs share a chunk while they fit."""
+        text = "Aaa.\n\nBbb.\n\nCcc."
+
+        assert split_chunks(text, 10) == [
+            ("Aaa.\n\nBbb.", "\n\n"),
+            ("Ccc.", ""),
+        ]
+
+    def test_oversized_paragraph_splits_at_sentences(self):
+        """Test that long paragraphs fall back to sentences, then hard cuts."""
+        text = "Para one is here.\n\nPara two. Has two sentences.\n\n" + "x" * 25
+
+        chunks = split_chunks(text, 20)
+
+        assert chunks[:3] == [
+            ("Para one is here.", "\n\n"),
+            ("Para two.", " "),
+            ("Has two sentences.", "\n\n"),
+        ]
+        assert all(len(chunk) <= 20 for chunk, _ in chunks)
+        assert "".join(c + sep for c, sep in chunks) == text
+
+
+class TestSegmentContext:
+    """Test cases for segment_context."""
+
+    def test_context_is_neighbouring_segments(self):
+        """Test that the nearest non-blank segment on each side is used."""
+        segments = split_segments("A. B.\n\n\nC.")
+
+        assert segment_context(segments, 0) == "After: B."
+        assert segment_context(segments, 1) == "Before: A.\nAfter: C."
+        assert segment_context(segments, 2) == "Before: B."
+
+    def test_single_segment_has_no_context(self):
+        """Test that a lone segment has an empty context."""
+        assert segment_context(split_segments("Only."), 0) == ""
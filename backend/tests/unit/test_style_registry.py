@@ -0,0 +1,161 @@
+"""
+Unit tests for app.llm.style_registry module.
+
+This module will test loading and validating styles, precomputed system
+prompts, per-style upstream settings and hot reloading.
+"""
+
+import json
+import os
+
+import pytest
+
+from app.llm.style_registry import (
+    DEFAULT_MODEL,
+    STYLE_PROMPTS,
+    StyleRegistry,
+    UnknownStyleError,
+    build_style,
+    load_styles,
+)
+
+
+class TestBuildStyle:
+    """Test class for validating a single style."""
+
+    def test_defaults(self):
+        """Test only a prompt is required."""
+        style = build_style("plain", {"prompt": "Rewrite this text plainly"})
+
+        assert style.model == DEFAULT_MODEL
+        assert style.options == {}
+        assert "Rewrite this text plainly" in style.system_prompt
+
+    def test_options(self):
+        """Test temperature and output limits become request options."""
+        style = build_style(
+            "plain",
+            {"prompt": "Rewrite", "temperature": 0.2, "max_output_tokens": 300},
+        )
+
+        assert style.options == {"temperature": 0.2, "max_output_tokens": 300}
+        assert style.upstream == (DEFAULT_MODEL, 0.2, 300)
+
+    def test_version_follows_settings(self):
+        """Test the version changes with any setting."""
+        base = build_style("plain", {"prompt": "Rewrite"})
+
+        assert base.version == build_style("plain", {"prompt": "Rewrite"}).version
+        assert base.version != build_style("plain", {"prompt": "Redo"}).version
+        assert (
+            base.version
+            != build_style("plain", {"prompt": "Rewrite", "temperature": 1}).version
+        )
+
+    @pytest.mark.parametrize(
+        "raw",
+        [
+            "Rewrite",
+            {},
+            {"prompt": "  "},
+            {"prompt": "Rewrite", "colour": "blue"},
+            {"prompt": "Rewrite", "model": ""},
+            {"prompt": "Rewrite", "temperature": 3},
+            {"prompt": "Rewrite", "temperature": True},
+            {"prompt": "Rewrite", "max_output_tokens": 0},
+            {"prompt": "Rewrite", "max_output_tokens": 1.5},
+            {"prompt": "Rewrite", "expansion": 0},
+        ],
+    )
+    def test_invalid(self, raw):
+        """Test invalid settings are rejected."""
+        with pytest.raises(ValueError):
+            build_style("plain", raw)
+
+    def test_load_styles_requires_styles(self):
+        """Test an empty style file is rejected."""
+        with pytest.raises(ValueError):
+            load_styles({})
+
+
+class TestStyleRegistry:
+    """Test class for StyleRegistry."""
+
+    def write(self, path, styles):
+        """Write a style file and bump its mtime."""
+        path.write_text(json.dumps(styles))
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_builtin_styles(self):
+        """Test the built-in styles are used without a file."""
+        registry = StyleRegistry()
+
+        assert registry.names() == list(STYLE_PROMPTS)
+        assert "professional" in registry
+        assert registry.get("casual").prompt == STYLE_PROMPTS["casual"]
+        assert registry.reload() is False
+
+    def test_unknown_style(self):
+        """Test unknown styles raise on get and return None on find."""
+        registry = StyleRegistry()
+
+        assert registry.find("pirate") is None
+        with pytest.raises(UnknownStyleError):
+            registry.get("pirate")
+
+    def test_load_file(self, tmp_path):
+        """Test styles are loaded from a file."""
+        path = tmp_path / "styles.json"
+        self.write(path, {"pirate": {"prompt": "Talk like a pirate", "model": "m"}})
+
+        registry = StyleRegistry(str(path))
+
+        assert registry.names() == ["pirate"]
+        assert registry.get("pirate").model == "m"
+
+    def test_reload_on_change(self, tmp_path):
+        """Test edits to the file are picked up once."""
+        path = tmp_path / "styles.json"
+        self.write(path, {"pirate": {"prompt": "Talk like a pirate"}})
+        registry = StyleRegistry(str(path))
+        system_prompt = registry.get("pirate").system_prompt
+
+        assert registry.reload() is False
+
+        self.write(path, {"pirate": {"prompt": "Talk like a sailor"}})
+
+        assert registry.reload() is True
+        assert registry.get("pirate").system_prompt != system_prompt
+        assert registry.reload() is False
+        assert registry.stats()["reloads_total"] == 1
+
+    def test_invalid_reload_keeps_styles(self, tmp_path):
+        """Test an invalid edit is reported and the old styles kept."""
+        path = tmp_path / "styles.json"
+        self.write(path, {"pirate": {"prompt": "Talk like a pirate"}})
+        registry = StyleRegistry(str(path))
+
+        self.write(path, {"pirate": {"prompt": ""}})
+
+        assert registry.reload() is False
+        assert registry.get("pirate").prompt == "Talk like a pirate"
+        assert registry.stats()["reload_errors_total"] == 1
+
+    def test_invalid_file_at_startup(self, tmp_path):
+        """Test an invalid file fails loudly at startup."""
+        path = tmp_path / "styles.json"
+        path.write_text("{not json")
+
+        with pytest.raises(ValueError):
+            StyleRegistry(str(path))
+
+    @pytest.mark.asyncio
+    async def test_start_without_file_is_noop(self):
+        """Test nothing is watched without a style file."""
+        registry = StyleRegistry()
+
+        await registry.start(0.01)
+
+        assert registry._task is None
+        await registry.stop()
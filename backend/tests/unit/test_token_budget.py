@@ -0,0 +1,68 @@
+"""
+Unit tests for app.llm.token_budget module.
+
+This module will test the local token estimator, output budgets and
+detection of responses cut off by the output cap.
+"""
+
+from types import SimpleNamespace
+
+from app.llm.token_budget import estimate_tokens, is_truncated, output_token_budget
+
+
+class TestEstimateTokens:
+    """Test class for estimate_tokens."""
+
+    def test_empty(self):
+        """Test empty text has no tokens."""
+        assert estimate_tokens("") == 0
+
+    def test_words_and_punctuation(self):
+        """Test words and punctuation marks count as tokens."""
+        assert estimate_tokens("Hi, all!") == 4
+
+    def test_long_words_count_by_length(self):
+        """Test long words count as several tokens."""
+        assert estimate_tokens("antidisestablishmentarianism") == 7
+
+    def test_prose_counts_by_length(self):
+        """Test ordinary prose is estimated at four characters per token."""
+        text = "The quick brown fox jumps over the lazy dog. " * 100
+
+        assert estimate_tokens(text) == len(text) // 4
+
+
+class TestOutputTokenBudget:
+    """Test class for output_token_budget."""
+
+    def test_expansion_and_overhead(self):
+        """Test the budget scales with the input plus the allowance."""
+        assert output_token_budget(100, 1.5, 20, 0, 0) == 170
+
+    def test_clamped(self):
+        """Test the budget stays between the minimum and maximum."""
+        assert output_token_budget(1, 2.0, 0, 64, 1000) == 64
+        assert output_token_budget(10000, 2.0, 0, 64, 1000) == 1000
+
+
+class TestIsTruncated:
+    """Test class for is_truncated."""
+
+    def event(self, event_type, reason=None):
+        """Build a stream event."""
+        return SimpleNamespace(
+            type=event_type,
+            response=SimpleNamespace(
+                incomplete_details=SimpleNamespace(reason=reason)
+            ),
+        )
+
+    def test_output_cap(self):
+        """Test an incomplete response cut off by the cap is truncated."""
+        assert is_truncated(self.event("response.incomplete", "max_output_tokens"))
+
+    def test_other_events(self):
+        """Test other endings are not truncation."""
+        assert not is_truncated(self.event("response.completed"))
+        assert not is_truncated(self.event("response.incomplete", "content_filter"))
+        assert not is_truncated(SimpleNamespace(type="response.output_text.delta"))